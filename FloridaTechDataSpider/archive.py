@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# Reading and writing WARC files of crawled responses
+# Every record is its own gzip member, as in .warc.gz files written by other crawlers,
+# so a record can be read back on its own from its offset
+
+import gzip
+import os
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.response import response_status_message
+
+# Custom WARC header with the Scrapy request fingerprint, which is what replay looks records up by
+FINGERPRINT_HEADER = 'WARC-Scrapy-Fingerprint'
+
+# Twisted has already decoded the transfer encoding, so the header no longer applies to the stored body
+SKIPPED_HEADERS = {b'Transfer-Encoding'}
+
+
+def httpHeaders(headers: Headers) -> bytes:
+    return b''.join(
+        name + b': ' + value + b'\r\n'
+        for name, values in headers.items()
+        if name not in SKIPPED_HEADERS
+        for value in values
+    )
+
+
+# WARC headers are UTF-8, HTTP headers are ISO-8859-1
+def parseHeaders(lines: bytes, encoding: str = 'utf-8') -> List[Tuple[str, str]]:
+    return [
+        tuple(part.strip() for part in line.split(':', 1))
+        for line in lines.decode(encoding).split('\r\n')
+        if ':' in line
+    ]
+
+
+class WarcWriter:
+    # Appends request and response records to a .warc.gz file
+    # Each record is flushed at once, so an interrupted crawl keeps everything it fetched
+
+    def __init__(self, path: str, info: Dict[str, str]):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.file = open(path, 'ab')
+        self.writeRecord('warcinfo', None, {'Content-Type': 'application/warc-fields'}, ''.join(
+            f'{key}: {value}\r\n'
+            for key, value in info.items()
+        ).encode('utf-8'))
+
+    def writeRecord(self, recordType: str, url: Optional[str], headers: Dict[str, str], block: bytes) -> str:
+        recordId = f'<urn:uuid:{uuid.uuid4()}>'
+        warcHeaders = {
+            'WARC-Type': recordType,
+            'WARC-Record-ID': recordId,
+            'WARC-Date': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        }
+        if url is not None:
+            warcHeaders['WARC-Target-URI'] = url
+        warcHeaders.update(headers)
+        warcHeaders['Content-Length'] = str(len(block))
+
+        record = b'WARC/1.1\r\n' + ''.join(
+            f'{name}: {value}\r\n'
+            for name, value in warcHeaders.items()
+        ).encode('utf-8') + b'\r\n' + block + b'\r\n\r\n'
+
+        self.file.write(gzip.compress(record))
+        self.file.flush()
+        return recordId
+
+    def write(self, request, response, fingerprint: str) -> None:
+        url = urlparse_cached(request)
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+
+        requestId = self.writeRecord(
+            'request',
+            request.url,
+            {'Content-Type': 'application/http; msgtype=request'},
+            f'{request.method} {path} HTTP/1.1\r\nHost: {url.netloc}\r\n'.encode('utf-8')
+            + httpHeaders(request.headers) + b'\r\n' + request.body
+        )
+        self.writeRecord(
+            'response',
+            response.url,
+            {
+                'Content-Type': 'application/http; msgtype=response',
+                'WARC-Concurrent-To': requestId,
+                FINGERPRINT_HEADER: fingerprint,
+                # Body cut short by EarlyStopMiddleware
+                **({'WARC-Truncated': 'disconnect'} if 'download_stopped' in response.flags else {})
+            },
+            f'HTTP/1.1 {response_status_message(response.status)}\r\n'.encode('utf-8')
+            + httpHeaders(response.headers) + b'\r\n' + response.body
+        )
+
+    def close(self) -> None:
+        self.file.close()
+
+
+# Stream the gzip members of a file together with their byte offset and length
+# A member cut off by an interrupted crawl ends the stream
+def iterGzipMembers(f: BinaryIO, chunkSize: int = 1 << 20) -> Iterator[Tuple[int, int, bytes]]:
+    offset = 0
+    pending = b''
+
+    while True:
+        if pending == b'':
+            pending = f.read(chunkSize)
+            if pending == b'':
+                return
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = []
+        length = 0
+        while True:
+            try:
+                data.append(decompressor.decompress(pending))
+            except zlib.error:
+                return
+
+            if decompressor.eof:
+                length += len(pending) - len(decompressor.unused_data)
+                pending = decompressor.unused_data
+                break
+
+            length += len(pending)
+            pending = f.read(chunkSize)
+            if pending == b'':
+                return
+
+        yield offset, length, b''.join(data)
+        offset += length
+
+
+def parseRecord(record: bytes) -> Tuple[Dict[str, str], bytes]:
+    head, _, rest = record.partition(b'\r\n\r\n')
+    headers = dict(parseHeaders(head.split(b'\r\n', 1)[1]))
+    block = rest[:int(headers['Content-Length'])]
+    return headers, block
+
+
+class WarcArchive:
+    # Response records of one or more WARC files, indexed by request fingerprint
+    # Files are given oldest first and a later crawl of the same request wins
+    # They are indexed newest first and only as far as needed, a fingerprint missing from the newer files
+    # indexes the next older one, so replaying the last run only reads its own file
+    # Only offsets are kept, a response is read from disk again by get()
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.offsets: Dict[str, Tuple[str, int, int]] = {}
+        self.files: Dict[str, BinaryIO] = {}
+        # Files not indexed yet, the newest last
+        self.unindexed: List[str] = list(paths)
+
+    def index(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            for offset, length, record in iterGzipMembers(f):
+                headers, _ = parseRecord(record)
+                if headers.get('WARC-Type') == 'response' and FINGERPRINT_HEADER in headers:
+                    # Newer files were indexed first
+                    self.offsets.setdefault(headers[FINGERPRINT_HEADER], (path, offset, length))
+
+    def __contains__(self, fingerprint: str) -> bool:
+        while fingerprint not in self.offsets and self.unindexed != []:
+            self.index(self.unindexed.pop())
+
+        return fingerprint in self.offsets
+
+    # Files indexed so far
+    def indexedCount(self) -> int:
+        return len(self.paths) - len(self.unindexed)
+
+    def get(self, fingerprint: str):
+        if fingerprint not in self:
+            return None
+
+        path, offset, length = self.offsets[fingerprint]
+        if path not in self.files:
+            self.files[path] = open(path, 'rb')
+
+        f = self.files[path]
+        f.seek(offset)
+        headers, block = parseRecord(gzip.decompress(f.read(length)))
+
+        head, _, body = block.partition(b'\r\n\r\n')
+        statusLine, _, httpHead = head.partition(b'\r\n')
+        status = int(statusLine.split()[1])
+        responseHeaders = Headers()
+        for name, value in parseHeaders(httpHead, 'latin-1'):
+            responseHeaders.appendlist(name, value.encode('latin-1'))
+
+        url = headers['WARC-Target-URI']
+        responseClass = responsetypes.from_args(headers=responseHeaders, url=url, body=body)
+        return responseClass(url=url, status=status, headers=responseHeaders, body=body, flags=['replayed'])
+
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
@@ -0,0 +1 @@
+# Commands of this project, they replace Scrapy's commands of the same name, see COMMANDS_MODULE
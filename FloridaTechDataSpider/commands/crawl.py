@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+# 'scrapy crawl' that exits with 1 when the spider closes for any reason but 'finished', like crawl.py
+# Scrapy exits with 0 whatever the reason, so make and shardCrawl.py would go on with a truncated raw file
+# after CLOSESPIDER_ERRORCOUNT or FAILURE_RATIO_MAX closed the spider
+
+import sys
+
+from scrapy.commands.crawl import Command as ScrapyCrawlCommand
+
+
+class Command(ScrapyCrawlCommand):
+
+    def run(self, args, opts):
+        # The process forgets its crawlers once they are done, a crawler made here keeps its stats
+        if len(args) != 1:
+            return super().run(args, opts)
+
+        crawler = self.crawler_process.create_crawler(args[0])
+        super().run([crawler], opts)
+
+        reason = crawler.stats.get_value('finish_reason')
+        if self.exitcode == 0 and reason != 'finished':
+            print(f'Error: {crawler.spidercls.name} closed with {reason}', file=sys.stderr)
+            self.exitcode = 1
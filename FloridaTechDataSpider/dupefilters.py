@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Duplicate request filter backed by a scalable Bloom filter
+# Memory stays at about BLOOM_DUPEFILTER_ERROR_RATE's worth of bits per fingerprint instead of a set of strings,
+# and with JOBDIR the filter is saved there so that a resumed crawl keeps skipping what it already requested
+# Enable with DUPEFILTER_CLASS = 'FloridaTechDataSpider.dupefilters.BloomDupeFilter'
+
+import json
+import math
+import os
+import time
+from typing import List, Optional, Tuple
+
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.job import job_dir
+from twisted.internet import task
+
+
+class BloomFilter:
+    # Fixed size Bloom filter for a capacity and false positive rate
+    # Positions come from double hashing two integers of the fingerprint, which is already a hash
+    # The bit count is rounded up to a power of two, an odd second hash then never repeats a position
+
+    def __init__(self, capacity: int, errorRate: float):
+        self.capacity = capacity
+        self.errorRate = errorRate
+        self.bitCount = 1 << math.ceil(math.log2(-capacity * math.log(errorRate) / math.log(2) ** 2))
+        self.hashCount = max(1, round(self.bitCount / capacity * math.log(2)))
+        self.bits = bytearray((self.bitCount + 7) // 8)
+        self.count = 0
+        self.setBits = 0
+
+    def positions(self, hashes: Tuple[int, int]) -> List[int]:
+        h1, h2 = hashes
+        mask = self.bitCount - 1
+        return [(h1 + i * h2) & mask for i in range(self.hashCount)]
+
+    def __contains__(self, hashes: Tuple[int, int]) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(hashes))
+
+    def add(self, hashes: Tuple[int, int]) -> None:
+        for p in self.positions(hashes):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                self.setBits += 1
+        self.count += 1
+
+    def isFull(self) -> bool:
+        return self.count >= self.capacity
+
+    # Chance that a new fingerprint is taken for a seen one, from the share of set bits
+    def falsePositiveRate(self) -> float:
+        return (self.setBits / self.bitCount) ** self.hashCount
+
+    def header(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'errorRate': self.errorRate,
+            'count': self.count,
+            'setBits': self.setBits
+        }
+
+
+class ScalableBloomFilter:
+    # Bloom filters that are added as the previous one fills up (Almeida et al., 2007)
+    # Each new filter has twice the capacity and half the false positive rate,
+    # so the overall rate stays below errorRate however many fingerprints there are
+
+    growth = 2
+    tightening = 0.5
+
+    def __init__(self, capacity: int, errorRate: float):
+        self.filters = [BloomFilter(capacity, errorRate * (1 - self.tightening))]
+
+    def __contains__(self, hashes: Tuple[int, int]) -> bool:
+        return any(hashes in bloomFilter for bloomFilter in self.filters)
+
+    # Returns whether the fingerprint was already there
+    def add(self, hashes: Tuple[int, int]) -> bool:
+        if hashes in self:
+            return True
+
+        last = self.filters[-1]
+        if last.isFull():
+            last = BloomFilter(last.capacity * self.growth, last.errorRate * self.tightening)
+            self.filters.append(last)
+
+        last.add(hashes)
+        return False
+
+    def __len__(self) -> int:
+        return sum(bloomFilter.count for bloomFilter in self.filters)
+
+    def nbytes(self) -> int:
+        return sum(len(bloomFilter.bits) for bloomFilter in self.filters)
+
+    def falsePositiveRate(self) -> float:
+        return 1 - math.prod(1 - bloomFilter.falsePositiveRate() for bloomFilter in self.filters)
+
+    # A JSON line with the filters, then their bits
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(json.dumps([bloomFilter.header() for bloomFilter in self.filters]).encode('utf-8') + b'\n')
+            for bloomFilter in self.filters:
+                f.write(bloomFilter.bits)
+
+        # Never leave a half written filter behind
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ScalableBloomFilter':
+        scalable = cls.__new__(cls)
+        scalable.filters = []
+        with open(path, 'rb') as f:
+            for header in json.loads(f.readline()):
+                bloomFilter = BloomFilter(header['capacity'], header['errorRate'])
+                bloomFilter.count = header['count']
+                bloomFilter.setBits = header['setBits']
+                bloomFilter.bits = bytearray(f.read(len(bloomFilter.bits)))
+                scalable.filters.append(bloomFilter)
+
+        return scalable
+
+
+class BloomDupeFilter(RFPDupeFilter):
+    # The filter is saved every BLOOM_DUPEFILTER_SAVE_INTERVAL seconds and when the spider closes
+    # It is only saved with JOBDIR, next to the pending requests, so a paused crawl resumes exactly like with RFPDupeFilter
+    # Without JOBDIR nothing replays the items of the pages a filter skips, so every run starts with an empty one
+    # A saved filter is picked up by the next run if it is younger than BLOOM_DUPEFILTER_MAX_AGE
+    # It is removed when the crawl finishes, unless BLOOM_DUPEFILTER_KEEP_FINISHED is set,
+    # since the next complete crawl has to visit every page again
+
+    def __init__(self, path: Optional[str], capacity: int, errorRate: float, maxAge: float, keepFinished: bool,
+                 saveInterval: float, stats=None, debug: bool = False, *, fingerprinter=None):
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+        self.path = path
+        self.keepFinished = keepFinished
+        self.saveInterval = saveInterval
+        self.stats = stats
+        self.saver: Optional[task.LoopingCall] = None
+        # Sum of false positive rates at each lookup, it is the expected number of false positives
+        self.falsePositives = 0.0
+
+        self.bloom = ScalableBloomFilter(capacity, errorRate)
+        self.resumed = 0
+        if path is not None and os.path.exists(path) and time.time() - os.path.getmtime(path) < maxAge:
+            self.bloom = ScalableBloomFilter.load(path)
+            self.resumed = len(self.bloom)
+            self.logger.warning(f'Resuming with {self.resumed} request fingerprints from {path}')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        jobDir = job_dir(settings)
+        return cls(
+            os.path.join(jobDir, 'requests.bloom') if jobDir else None,
+            settings.getint('BLOOM_DUPEFILTER_CAPACITY'),
+            settings.getfloat('BLOOM_DUPEFILTER_ERROR_RATE'),
+            settings.getfloat('BLOOM_DUPEFILTER_MAX_AGE'),
+            settings.getbool('BLOOM_DUPEFILTER_KEEP_FINISHED'),
+            settings.getfloat('BLOOM_DUPEFILTER_SAVE_INTERVAL'),
+            crawler.stats,
+            settings.getbool('DUPEFILTER_DEBUG'),
+            fingerprinter=crawler.request_fingerprinter
+        )
+
+    def open(self):
+        if self.path is not None and self.saveInterval > 0:
+            self.saver = task.LoopingCall(self.bloom.save, self.path)
+            self.saver.start(self.saveInterval, now=False)
+
+    def request_seen(self, request) -> bool:
+        fingerprint: bytes = self.fingerprinter.fingerprint(request)
+        # The second hash is odd, see BloomFilter
+        hashes = (int.from_bytes(fingerprint[:8], 'little'), int.from_bytes(fingerprint[8:16], 'little') | 1)
+        self.falsePositives += self.bloom.falsePositiveRate()
+        return self.bloom.add(hashes)
+
+    def close(self, reason: str) -> None:
+        if self.saver is not None and self.saver.running:
+            self.saver.stop()
+
+        if self.path is not None:
+            if reason == 'finished' and not self.keepFinished:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                self.bloom.save(self.path)
+
+        if self.stats is not None:
+            self.stats.set_value('bloom/fingerprints', len(self.bloom))
+            self.stats.set_value('bloom/resumed', self.resumed)
+            self.stats.set_value('bloom/filters', len(self.bloom.filters))
+            self.stats.set_value('bloom/bytes', self.bloom.nbytes())
+            self.stats.set_value('bloom/false_positive_rate', self.bloom.falsePositiveRate())
+            self.stats.set_value('bloom/false_positives_expected', self.falsePositives)
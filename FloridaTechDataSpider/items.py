@@ -1,6 +1,166 @@
 # -*- coding: utf-8 -*-
 
-# Define here the models for your scraped items
-#
-# See documentation in:
-# https://docs.scrapy.org/en/latest/topics/items.html
+# Typed records of the raw files, see FloridaTechDataSpider.pipelines.TypedItems
+# Spiders yield dicts, the pipeline turns them into these slotted classes, which have no per-item dict of keys
+# Fields are in the order spiders fill the dicts, so feeds export the same JSON either way
+# Items still read like dicts, item['key'], 'key' in item and dict(item) work as before
+
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Tuple, Union, get_args, get_origin
+
+
+# Types isinstance() accepts for a field, only the outer type is checked
+# Sequences may be lists or tuples, sections read back from raw files have lists where spiders made tuples
+def checkedTypes(annotation) -> tuple:
+    if get_origin(annotation) is Union:
+        return tuple(t for arg in get_args(annotation) for t in checkedTypes(arg))
+
+    if annotation in (list, tuple) or get_origin(annotation) in (list, tuple):
+        return (list, tuple)
+
+    if annotation is float:
+        return (float, int)
+
+    return (annotation,)
+
+
+class SlottedItem:
+    __slots__ = ()
+
+    # Set by slottedItem()
+    fieldNames: Tuple[str, ...] = ()
+    fieldTypes: Tuple[tuple, ...] = ()
+
+    # Fields whose values repeat across items, interned by TypedItems
+    internFields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str):
+        if key not in self.fieldNames:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.fieldNames:
+            raise KeyError(key)
+
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.fieldNames
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.fieldNames
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.fieldNames else default
+
+
+def slottedItem(cls: type) -> type:
+    cls = dataclass(slots=True)(cls)
+    cls.fieldNames = tuple(field.name for field in fields(cls))
+    cls.fieldTypes = tuple(checkedTypes(field.type) for field in fields(cls))
+    return cls
+
+
+# A row of apps.fit.edu/schedule, see SectionSpider.sectionAttributes
+@slottedItem
+class SectionItem(SlottedItem):
+    location: str
+    semester: str
+    year: int
+    crn: int
+    course: Tuple[str, int]
+    section: str
+    creditHours: Tuple[float, float]
+    title: Union[Tuple[str, str], str]
+    notes: List[str]
+    session: Optional[str]
+    days: List[str]
+    times: List[Tuple[int, int]]
+    places: List[Tuple[Optional[str], str]]
+    instructor: Optional[Tuple[str, ...]]
+    cap: Tuple[int, int]
+    syllabus: Optional[str]
+
+    internFields = ('location', 'semester', 'course', 'section', 'title', 'notes', 'session', 'days', 'places', 'instructor')
+
+
+# A section with the fields of its PAWS page, see PawsSectionSpider.sectionAttributes
+@slottedItem
+class PawsSectionItem(SectionItem):
+    level: Optional[str]
+    waitListSeats: List[int]
+    crossListCourses: List[Tuple[str, int]]
+    restrictions: List[str]
+    prerequisite: Optional[str]
+    corequisites: List[Tuple[str, int]]
+
+    internFields = SectionItem.internFields + ('level', 'crossListCourses', 'restrictions', 'prerequisite', 'corequisites')
+
+
+# A course of course.json with the fields of its catalog page, see PawsCourseSpider.courseAttributes
+@slottedItem
+class PawsCourseItem(SlottedItem):
+    subject: str
+    course: int
+    campusId: int
+    semesterId: int
+    year: int
+    creditHours: Tuple[float, float]
+    sectionIds: List[int]
+    titleId: int
+    descriptionId: int
+    tagIds: List[int]
+    lectureHours: Optional[float]
+    labHours: Optional[float]
+    level: Optional[str]
+    scheduleTypes: List[str]
+    restrictions: List[str]
+    prerequisite: Optional[str]
+    courseAttributes: List[str]
+
+    internFields = ('subject', 'level', 'scheduleTypes', 'restrictions', 'prerequisite', 'courseAttributes')
+
+
+@slottedItem
+class BuildingItem(SlottedItem):
+    code: str
+    name: str
+
+    internFields = ('code', 'name')
+
+
+# See DirectorySpider.departmentAttributes
+@slottedItem
+class DepartmentItem(SlottedItem):
+    name: Optional[str]
+    code: Optional[str]
+    phone: Optional[str]
+    fax: Optional[str]
+    email: Optional[str]
+    website: Optional[str]
+    primaryLocation: Optional[str]
+
+    internFields = ('primaryLocation',)
+
+
+# See DirectorySpider.employeeAttributes
+@slottedItem
+class EmployeeItem(SlottedItem):
+    departmentCode: str
+    name: Optional[str]
+    title: Optional[str]
+    email: Optional[str]
+    phone: Optional[str]
+    building: Optional[str]
+    room: Optional[str]
+
+    internFields = ('departmentCode', 'title', 'building')
+
+
+# Item class of the keys of a dict item, in order
+ITEM_CLASSES: Dict[Tuple[str, ...], type] = {
+    itemClass.fieldNames: itemClass
+    for itemClass in (SectionItem, PawsSectionItem, PawsCourseItem, BuildingItem, DepartmentItem, EmployeeItem)
+}
@@ -5,7 +5,25 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import glob
+import json
+import logging
+import os
+import re
+import time
+import traceback
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from scrapy import Request, signals
+from scrapy.core.downloader import Slot
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured, StopDownload
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.internet import reactor
+
+from .archive import WarcArchive, WarcWriter
 
 
 class FloridatechdataspiderSpiderMiddleware:
@@ -56,48 +74,855 @@ class FloridatechdataspiderSpiderMiddleware:
         spider.logger.info('Spider opened: %s' % spider.name)
 
 
+class FloridatechdataspiderCachePolicy(RFC2616Policy):
+    # RFC2616 policy where each source has its own freshness lifetime
+    # Sources are URL prefixes, the longest matching prefix wins
+    # Unmatched URLs fall back to whatever the response headers say
+
+    def __init__(self, settings):
+        super().__init__(settings)
+
+        # Sort by length so that the first match is the longest one
+        self.sourceExpirationSecs: List[Tuple[str, int]] = sorted(
+            settings.getdict('HTTPCACHE_SOURCE_EXPIRATION_SECS').items(),
+            key=lambda source: len(source[0]),
+            reverse=True
+        )
+
+    def sourceExpiration(self, url: str) -> Optional[int]:
+        for prefix, expirationSecs in self.sourceExpirationSecs:
+            if url.startswith(prefix):
+                return int(expirationSecs)
+
+        return None
+
+    def should_cache_response(self, response, request):
+        # Never replace a good copy with an error page
+        if response.status >= 500:
+            return False
+
+        # A page cut by EarlyStopMiddleware would be served to requests that need the rest of it
+        if 'download_stopped' in response.flags:
+            return False
+
+        return super().should_cache_response(response, request)
+
+    def _compute_freshness_lifetime(self, response, request, now):
+        expirationSecs = self.sourceExpiration(request.url)
+        if expirationSecs is not None:
+            return expirationSecs
+
+        return super()._compute_freshness_lifetime(response, request, now)
+
+
 class FloridatechdataspiderDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    # Accounts for the work HttpCacheMiddleware saved us
+    # It sits in front of HttpCacheMiddleware, so every response served from
+    # the cache passes through here flagged as 'cached'. That covers both fresh
+    # hits and successful revalidations (304 Not Modified)
+
+    def __init__(self, stats):
+        self.stats = stats
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool('HTTPCACHE_ENABLED'):
+            raise NotConfigured
+
+        s = cls(crawler.stats)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        if 'cached' in response.flags:
+            self.stats.inc_value('httpcache/bytes_saved', len(response.body))
+
+        return response
+
+    def spider_opened(self, spider):
+        spider.logger.info('Spider opened: %s' % spider.name)
+
+    def spider_closed(self, spider):
+        hits = self.stats.get_value('httpcache/hit', 0)
+        revalidations = self.stats.get_value('httpcache/revalidate', 0)
+        misses = self.stats.get_value('httpcache/miss', 0)
+        invalidations = self.stats.get_value('httpcache/invalidate', 0)
+        bytesSaved = self.stats.get_value('httpcache/bytes_saved', 0)
+
+        spider.logger.info(
+            f'HTTP cache: {hits} hits, {revalidations} revalidated, '
+            f'{invalidations} changed, {misses} misses, {bytesSaved} bytes saved'
+        )
+
+
+@dataclass
+class HostConcurrency:
+    concurrency: int
+    baseDelay: float
+    # Fraction of a step earned by successful responses, one step per window
+    credit: float = 0
+    # Lowest latency seen, it is what the host does when it is not loaded
+    minLatency: Optional[float] = None
+    # Responses and exceptions seen, and the last of them that answers a request in flight at the last decrease
+    outcomes: int = 0
+    roundEnd: int = 0
+    # Time a Retry-After asked to wait until, the slot keeps its delay until then
+    pausedUntil: float = 0
+    responses: int = 0
+    firstResponse: Optional[float] = None
+    lastResponse: Optional[float] = None
+    trajectory: List[Tuple[float, int]] = field(default_factory=list)
+
+
+class AdaptiveConcurrencyMiddleware:
+    # Adjusts the concurrency of each host with AIMD
+    # A healthy response earns 1/concurrency of a step, so concurrency grows by
+    # one every window. A 5xx, a timeout, a Retry-After or a latency far above
+    # the host's unloaded latency cuts it by ADAPTIVE_CONCURRENCY_DECREASE,
+    # at most once per round: failures of requests that were in flight when it was cut
+    # belong to the same congestion event, so a burst of them counts once
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.minConcurrency: int = settings.getint('ADAPTIVE_CONCURRENCY_MIN')
+        self.maxConcurrency: int = settings.getint('ADAPTIVE_CONCURRENCY_MAX')
+        self.decrease: float = settings.getfloat('ADAPTIVE_CONCURRENCY_DECREASE')
+        self.latencyFactor: float = settings.getfloat('ADAPTIVE_CONCURRENCY_LATENCY_FACTOR')
+        self.maxRetryAfter: float = settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_RETRY_AFTER')
+        self.hosts: Dict[str, HostConcurrency] = {}
+        self.startTime = time.time()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def getSlot(self, request) -> Tuple[Optional[str], Optional[Slot]]:
+        key = request.meta.get('download_slot')
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def getHost(self, key: str, slot: Slot) -> HostConcurrency:
+        if key not in self.hosts:
+            host = HostConcurrency(concurrency=slot.concurrency, baseDelay=slot.delay)
+            host.trajectory.append((round(time.time() - self.startTime, 3), host.concurrency))
+            self.hosts[key] = host
+
+        return self.hosts[key]
+
+    def setConcurrency(self, key: str, slot: Slot, concurrency: int) -> None:
+        host = self.hosts[key]
+        concurrency = max(self.minConcurrency, min(self.maxConcurrency, concurrency))
+        if concurrency == host.concurrency:
+            return
+
+        host.concurrency = concurrency
+        host.trajectory.append((round(time.time() - self.startTime, 3), concurrency))
+        slot.concurrency = concurrency
+        self.crawler.stats.max_value(f'adaptive_concurrency/{key}/max', concurrency)
+
+    def increase(self, key: str, slot: Slot) -> None:
+        host = self.hosts[key]
+        host.credit += 1 / host.concurrency
+        if host.credit >= 1:
+            host.credit = 0
+            self.setConcurrency(key, slot, host.concurrency + 1)
+
+    def backOff(self, key: str, slot: Slot, reason: str) -> None:
+        host = self.hosts[key]
+        self.crawler.stats.inc_value(f'adaptive_concurrency/{key}/backoff/{reason}')
+
+        # Only back off once per round of requests, the one answered now has already left slot.active
+        if host.outcomes <= host.roundEnd:
+            return
+
+        host.roundEnd = host.outcomes + len(slot.active)
+        host.credit = 0
+        self.setConcurrency(key, slot, int(host.concurrency * self.decrease))
+
+    def process_response(self, request, response, spider):
+        # Responses served from the cache say nothing about the host
+        if 'cached' in response.flags:
+            return response
+
+        key, slot = self.getSlot(request)
+        latency: Optional[float] = request.meta.get('download_latency')
+        if slot is None or latency is None:
+            return response
+
+        host = self.getHost(key, slot)
+        host.outcomes += 1
+        host.responses += 1
+        host.lastResponse = time.time()
+        if host.firstResponse is None:
+            host.firstResponse = host.lastResponse
+
+        # Honor Retry-After by pausing the whole host
+        # Responses to requests already in flight come back during the pause, they must not end it
+        retryAfter: Optional[bytes] = response.headers.get('Retry-After')
+        if retryAfter is not None and retryAfter.strip().isdigit():
+            pause = min(float(retryAfter), self.maxRetryAfter)
+            host.pausedUntil = max(host.pausedUntil, host.lastResponse + pause)
+            slot.delay = host.pausedUntil - host.lastResponse
+            self.backOff(key, slot, 'retry_after')
+            return response
+
+        if host.lastResponse >= host.pausedUntil:
+            slot.delay = host.baseDelay
+
+        if response.status >= 500:
+            self.backOff(key, slot, f'http_{response.status}')
+            return response
+
+        # Let the minimum creep up by 1% per response, so that one lucky
+        # response does not hold the baseline down forever
+        if host.minLatency is None:
+            host.minLatency = latency
+        else:
+            host.minLatency = min(latency, host.minLatency * 1.01)
+
+        if latency > host.minLatency * self.latencyFactor:
+            self.backOff(key, slot, 'latency')
+        else:
+            self.increase(key, slot)
+
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key, slot = self.getSlot(request)
+        if slot is None:
+            return None
+
+        self.getHost(key, slot).outcomes += 1
+        self.backOff(key, slot, type(exception).__name__)
+        return None
+
+    def spider_closed(self, spider):
+        stats = self.crawler.stats
+        for key, host in self.hosts.items():
+            stats.set_value(f'adaptive_concurrency/{key}/final', host.concurrency)
+            stats.set_value(f'adaptive_concurrency/{key}/trajectory', host.trajectory)
+
+            elapsed = (host.lastResponse or 0) - (host.firstResponse or 0)
+            if elapsed > 0:
+                requestsPerSecond = round(host.responses / elapsed, 2)
+                stats.set_value(f'adaptive_concurrency/{key}/rps', requestsPerSecond)
+                spider.logger.info(
+                    f'{key}: {requestsPerSecond} requests/s, '
+                    f'concurrency {host.concurrency} (max {stats.get_value(f"adaptive_concurrency/{key}/max", host.concurrency)})'
+                )
+
+
+@dataclass
+class TableScan:
+    # Progress of a body towards the end of its table
+    summary: bytes
+    # Set once the headers show a body that can be scanned
+    active: bool = False
+    expectedLength: int = -1
+    headersTime: float = 0
+    decompressor: Optional[object] = None
+    body: bytearray = field(default_factory=bytearray)
+    received: int = 0
+    # Offset of the table, then of the next tag to look at, and the number of open tables
+    tableStart: Optional[int] = None
+    scanned: int = 0
+    depth: int = 0
+
+
+class EarlyStopMiddleware:
+    # Stops downloading a page once the table a spider reads has been received
+    # Requests opt in with the summary of that table as 'stop_after_table' in meta
+    # Banner pages put a header and a footer several times the size of that table around it
+    # A page where the table never closes is downloaded in full, as without this middleware
+    # Bytes saved need a Content-Length, time saved is extrapolated from the rate the body was arriving at
+    # The scan lives in meta rather than in a dict keyed by request, since download handlers may copy requests
+
+    tagPattern = re.compile(rb'<(/?)table\b', re.IGNORECASE)
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool('EARLY_STOP_ENABLED'):
+            raise NotConfigured
+
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(s.bytes_received, signal=signals.bytes_received)
+        return s
+
+    def process_request(self, request, spider):
+        summary: Optional[str] = request.meta.get('stop_after_table')
+        if summary is not None:
+            request.meta['early_stop_scan'] = TableScan(summary.encode('utf-8'))
+
+    def headers_received(self, headers, body_length, request, spider):
+        scan: Optional[TableScan] = request.meta.get('early_stop_scan')
+        if scan is None:
+            return
+
+        encoding = headers.get('Content-Encoding', b'identity').lower()
+        if encoding in (b'gzip', b'x-gzip', b'deflate'):
+            scan.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        elif encoding != b'identity':
+            self.stats.inc_value(f'earlystop/unsupported_encoding/{encoding.decode()}')
+            return
+
+        scan.active = True
+        scan.expectedLength = body_length
+        scan.headersTime = time.time()
+
+    def bytes_received(self, data, request, spider):
+        scan: Optional[TableScan] = request.meta.get('early_stop_scan')
+        if scan is None or not scan.active:
+            return
+
+        scan.received += len(data)
+        scan.body += data if scan.decompressor is None else scan.decompressor.decompress(data)
+
+        if scan.tableStart is None:
+            at = scan.body.find(scan.summary, max(0, scan.scanned - len(scan.summary)))
+            if at < 0:
+                scan.scanned = len(scan.body)
+                return
+            scan.tableStart = scan.scanned = scan.body.rfind(b'<table', 0, at)
+
+        for match in self.tagPattern.finditer(scan.body, scan.scanned):
+            scan.depth += -1 if match.group(1) else 1
+            scan.scanned = match.end()
+            if scan.depth == 0:
+                raise StopDownload(fail=False)
+
+        # A tag cut in half by the chunk boundary is looked at again with the next chunk
+        scan.scanned = max(scan.scanned, len(scan.body) - len(b'</table'))
+
+    def process_response(self, request, response, spider):
+        scan: Optional[TableScan] = request.meta.pop('early_stop_scan', None)
+        if scan is None or not scan.active:
+            return response
+
+        if 'download_stopped' not in response.flags:
+            self.stats.inc_value('earlystop/full' if scan.tableStart is None else 'earlystop/unclosed')
+            return response
+
+        self.stats.inc_value('earlystop/stopped')
+        if scan.expectedLength <= 0:
+            self.stats.inc_value('earlystop/length_unknown')
+            return response
+
+        bytesSaved = scan.expectedLength - scan.received
+        self.stats.inc_value('earlystop/bytes_saved', bytesSaved)
+        self.stats.inc_value('earlystop/bytes_received', scan.received)
+
+        elapsed = time.time() - scan.headersTime
+        if elapsed > 0:
+            self.stats.inc_value('earlystop/seconds_saved', bytesSaved / (scan.received / elapsed))
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+        request.meta.pop('early_stop_scan', None)
+        return None
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+
+class FailureReport:
+    # Failures of a crawl in tolerant mode, shared by the middlewares below
+    # Written to FAILURE_REPORT when the spider closes
+    # The spider is closed once failures exceed FAILURE_RATIO_MAX of the responses
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.path: str = settings.get('FAILURE_REPORT')
+        self.ratioMax: float = settings.getfloat('FAILURE_RATIO_MAX')
+        self.minResponses: int = settings.getint('FAILURE_RATIO_MIN_RESPONSES')
+        self.failures: List[dict] = []
+        self.responses = 0
+        self.aborted = False
+
+        crawler.signals.connect(self.response_received, signal=signals.response_received)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    # One report per crawler, whichever middleware asks first creates it
+    @classmethod
+    def of(cls, crawler) -> 'FailureReport':
+        if not crawler.settings.getbool('FAILURE_TOLERANCE_ENABLED'):
+            raise NotConfigured
+
+        if getattr(crawler, 'failureReport', None) is None:
+            crawler.failureReport = cls(crawler)
+
+        return crawler.failureReport
+
+    def add(self, kind: str, url: str, error: str, traceback: Optional[str] = None) -> None:
+        self.failures.append({
+            'kind': kind,
+            'url': url,
+            'error': error,
+            'traceback': traceback
+        })
+        self.crawler.stats.inc_value(f'failures/{kind}')
+        self.checkRatio()
+
+    def response_received(self, response, request, spider):
+        self.responses += 1
+
+    def checkRatio(self) -> None:
+        if self.aborted or self.responses < self.minResponses:
+            return
+
+        ratio = len(self.failures) / self.responses
+        if ratio > self.ratioMax:
+            self.aborted = True
+            self.crawler.spider.logger.error(
+                f'{len(self.failures)} failures in {self.responses} responses exceed {self.ratioMax:.0%}, aborting'
+            )
+            self.crawler.engine.close_spider(self.crawler.spider, 'failure_ratio')
+
+    def spider_closed(self, spider, reason):
+        if self.failures == []:
+            return
+
+        path = self.path % {'name': spider.name}
+        json.dump(
+            {
+                'reason': reason,
+                'responses': self.responses,
+                'failures': self.failures
+            },
+            open(path, 'w'),
+            indent=4
+        )
+        spider.logger.warning(f'{len(self.failures)} failures in {self.responses} responses, see {path}')
+
+
+class QuarantineMiddleware:
+    # Spider middleware that keeps the crawl going when a callback raises
+    # The response is quarantined in the failure report with its traceback
+
+    def __init__(self, report: FailureReport):
+        self.report = report
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(FailureReport.of(crawler))
+
+    def process_spider_exception(self, response, exception, spider):
+        # Left to HttpErrorMiddleware
+        if isinstance(exception, HttpError):
+            return None
+
+        self.report.add(
+            'parse',
+            response.url,
+            repr(exception),
+            ''.join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        )
+        return []
+
+
+class DeferredRetryMiddleware:
+    # Downloader middleware that parks requests RetryMiddleware gave up on
+    # Parked requests are sent again when the spider runs out of other work,
+    # waiting DEFERRED_RETRY_BACKOFF seconds before the first round, doubling each round
+    # Requests with an errback are left to it
+
+    def __init__(self, crawler, report: FailureReport):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.report = report
+        self.maxRounds: int = settings.getint('DEFERRED_RETRY_TIMES')
+        self.backoff: float = settings.getfloat('DEFERRED_RETRY_BACKOFF')
+        self.retryHttpCodes = {int(code) for code in settings.getlist('RETRY_HTTP_CODES')}
+        self.parked: List[Request] = []
+        self.waiting = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler, FailureReport.of(crawler))
+        crawler.signals.connect(s.spider_idle, signal=signals.spider_idle)
+        return s
+
+    def park(self, request, reason: str) -> bool:
+        if request.errback is not None:
+            return False
+
+        rounds = request.meta.get('deferred_retry_round', 0)
+        if rounds >= self.maxRounds:
+            self.report.add('download', request.url, reason)
+            return False
+
+        retry = request.replace(dont_filter=True)
+        retry.meta['deferred_retry_round'] = rounds + 1
+        retry.meta['retry_times'] = 0
+        self.parked.append(retry)
+        self.crawler.stats.inc_value('deferred_retry/parked')
+        return True
+
+    def process_response(self, request, response, spider):
+        if response.status in self.retryHttpCodes and self.park(request, f'HTTP {response.status}'):
+            raise IgnoreRequest(f'Deferred retry of {request.url}')
+
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, IgnoreRequest):
+            return None
+
+        if self.park(request, repr(exception)):
+            raise IgnoreRequest(f'Deferred retry of {request.url}')
+
+        return None
+
+    def spider_idle(self, spider):
+        if self.waiting:
+            raise DontCloseSpider
+
+        if self.parked == []:
+            return
+
+        # Everything parked in this round waits for the backoff of its next round
+        requests, self.parked = self.parked, []
+        delay = self.backoff * 2 ** (min(r.meta['deferred_retry_round'] for r in requests) - 1)
+        spider.logger.warning(f'Retrying {len(requests)} failed requests in {delay:.0f}s')
+
+        def resume():
+            self.waiting = False
+            for request in requests:
+                self.crawler.engine.crawl(request)
+
+        self.waiting = True
+        reactor.callLater(delay, resume)
+        raise DontCloseSpider
+
+
+class WarcArchiveMiddleware:
+    # Writes every response, as it comes from the network or the cache, to WARC_ARCHIVE_DIR
+    # One file per run, so a parser fix can be checked against exactly what an earlier run saw
+    # It sits next to the downloader, so responses are stored before redirects or decompression
+    # Only the latest WARC_ARCHIVE_KEEP files of a spider are kept
+
+    def __init__(self, crawler, directory: str, keep: int):
+        self.crawler = crawler
+        self.directory = directory
+        self.keep = keep
+        self.writer: Optional[WarcWriter] = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('WARC_ARCHIVE_ENABLED') or settings.get('WARC_REPLAY'):
+            raise NotConfigured
+
+        s = cls(crawler, settings.get('WARC_ARCHIVE_DIR'), settings.getint('WARC_ARCHIVE_KEEP'))
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
 
     def spider_opened(self, spider):
-        spider.logger.info('Spider opened: %s' % spider.name)
+        # The timestamp in the name sorts the files by age, this run's file makes one more
+        paths = sorted(glob.glob(os.path.join(self.directory, f'{spider.name}-*.warc.gz')))
+        for old in paths[:max(len(paths) - self.keep + 1, 0)]:
+            os.remove(old)
+            self.crawler.stats.inc_value('warc/pruned')
+
+        path = os.path.join(self.directory, f'{spider.name}-{time.strftime("%Y%m%d%H%M%S")}.warc.gz')
+        self.writer = WarcWriter(path, {
+            'software': self.crawler.settings.get('BOT_NAME'),
+            'spider': spider.name
+        })
+
+    def process_response(self, request, response, spider):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        self.writer.write(request, response, fingerprint)
+        self.crawler.stats.inc_value('warc/archived')
+        return response
+
+    def spider_closed(self, spider):
+        self.writer.close()
+        spider.logger.info(f'{self.crawler.stats.get_value("warc/archived", 0)} responses archived in {self.writer.path}')
+
+
+class WarcReplayMiddleware:
+    # Serves responses from archived WARC files instead of the network
+    # The spider makes its requests as usual, so callbacks get the same cb_kwargs as in the crawl
+    # WARC_REPLAY is either a file, or a directory whose files of this spider are all used, the latest winning
+    # Older files are only read for requests missing from the newer ones, see WarcArchive
+    # Requests missing from the archive are dropped
+
+    def __init__(self, crawler, archive: WarcArchive):
+        self.crawler = crawler
+        self.archive = archive
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('WARC_REPLAY')
+        if not path:
+            raise NotConfigured
+
+        if os.path.isdir(path):
+            paths = sorted(glob.glob(os.path.join(path, f'{crawler.spidercls.name}-*.warc.gz')))
+        else:
+            paths = [path]
+
+        s = cls(crawler, WarcArchive(paths))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request, spider):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        response = self.archive.get(fingerprint)
+        if response is None:
+            self.crawler.stats.inc_value('warc/replay_missing')
+            raise IgnoreRequest(f'Not archived: {request.url}')
+
+        self.crawler.stats.inc_value('warc/replayed')
+        return response
+
+    def spider_closed(self, spider):
+        self.archive.close()
+        missing = self.crawler.stats.get_value('warc/replay_missing', 0)
+        # Requests missing from the archive leave holes in the replayed files
+        spider.logger.log(
+            logging.WARNING if missing > 0 else logging.INFO,
+            f'{self.crawler.stats.get_value("warc/replayed", 0)} responses replayed from {self.archive.indexedCount()} of {len(self.archive.paths)} files, '
+            f'{missing} requests not archived'
+        )
+
+
+@dataclass
+class RequestSpan:
+    # Times of a request on its way through the crawl
+    id: int
+    url: str
+    callback: str
+    # Kept in the timeline, or only counted in the histograms
+    traced: bool
+    scheduled: float
+    reachedDownloader: Optional[float] = None
+    downloadStart: Optional[float] = None
+    headers: Optional[float] = None
+    callbackStart: Optional[float] = None
+
+
+# Nearest rank percentiles of a list of numbers
+def percentiles(values: list) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        **{
+            f'p{p}': values[min(len(values) - 1, int(len(values) * p / 100))]
+            for p in (50, 95, 99)
+        },
+        'max': values[-1]
+    }
+
+
+class CrawlTraceMiddleware:
+    # Spider middleware that records a timeline of the crawl in Chrome trace format, see TRACE_FILE
+    # Open it in https://ui.perfetto.dev or chrome://tracing, each request is a track with its time
+    #   queued:   in the scheduler
+    #   slot:     in the downloader, waiting for a free slot
+    #   latency:  until response headers, that is DNS, connect and server time
+    #   transfer: receiving the body
+    #   download: the three above for responses that did not come from the network, like cached ones
+    #   callback: from the call to the callback until its last yielded object
+    # Per callback percentiles of parse time and response size are written to TRACE_HISTOGRAMS
+    # Parse time only counts time spent running the callback, not what the engine does in between yielded objects,
+    # but includes what async callbacks await, like the parse pool
+    # Only the first TRACE_MAX_REQUESTS requests are in the timeline, the histograms cover all of them
+    # The span of a request lives in its meta, so copies made by download handlers share it
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('TRACE_ENABLED'):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.path: str = settings.get('TRACE_FILE')
+        self.histogramPath: str = settings.get('TRACE_HISTOGRAMS')
+        self.maxRequests: int = settings.getint('TRACE_MAX_REQUESTS')
+        self.startTime = time.time()
+        self.requests = 0
+        # (Name, span id, start, end, args)
+        self.slices: List[Tuple[str, int, float, float, dict]] = []
+        # (Time, downloads in progress, requests in the scheduler)
+        self.counters: List[Tuple[float, int, int]] = []
+        # Callback -> parse seconds and response bytes of each response
+        self.parseSeconds: Dict[str, List[float]] = {}
+        self.responseBytes: Dict[str, List[int]] = {}
+        self.items: Dict[str, int] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(s.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(s.request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def addSlice(self, span: RequestSpan, name: str, start: float, end: float, args: Optional[dict] = None) -> None:
+        if span.traced:
+            self.slices.append((name, span.id, start, end, args or {}))
+
+    def addCounters(self, now: float) -> None:
+        if self.requests > self.maxRequests:
+            return
+
+        engine = self.crawler.engine
+        self.counters.append((now, len(engine.downloader.active), len(engine.slot.scheduler)))
+
+    def request_scheduled(self, request, spider):
+        self.requests += 1
+        request.meta['trace_span'] = RequestSpan(
+            id=self.requests,
+            url=request.url,
+            callback=getattr(request.callback, '__name__', 'parse'),
+            traced=self.requests <= self.maxRequests,
+            scheduled=time.time()
+        )
+
+    def request_reached_downloader(self, request, spider):
+        span: Optional[RequestSpan] = request.meta.get('trace_span')
+        if span is None:
+            return
+
+        span.reachedDownloader = time.time()
+        self.addSlice(span, 'queued', span.scheduled, span.reachedDownloader, {'url': span.url})
+        self.addCounters(span.reachedDownloader)
+
+    def headers_received(self, headers, body_length, request, spider):
+        span: Optional[RequestSpan] = request.meta.get('trace_span')
+        if span is None:
+            return
+
+        # Latency is measured by the download handler from when it started the request
+        span.headers = time.time()
+        span.downloadStart = span.headers - request.meta.get('download_latency', 0)
+
+    def request_left_downloader(self, request, spider):
+        span: Optional[RequestSpan] = request.meta.get('trace_span')
+        if span is None or span.reachedDownloader is None:
+            return
+
+        now = time.time()
+        if span.headers is None:
+            self.addSlice(span, 'download', span.reachedDownloader, now)
+        else:
+            self.addSlice(span, 'slot', span.reachedDownloader, span.downloadStart)
+            self.addSlice(span, 'latency', span.downloadStart, span.headers)
+            self.addSlice(span, 'transfer', span.headers, now)
+        self.addCounters(now)
+
+    def process_spider_input(self, response, spider):
+        span: Optional[RequestSpan] = response.meta.get('trace_span')
+        if span is not None:
+            span.callbackStart = time.time()
+
+    def finishCallback(self, span: RequestSpan, response, seconds: float, items: int, requests: int) -> None:
+        self.parseSeconds.setdefault(span.callback, []).append(seconds)
+        self.responseBytes.setdefault(span.callback, []).append(len(response.body))
+        self.items[span.callback] = self.items.get(span.callback, 0) + items
+        self.addSlice(span, 'callback', span.callbackStart, time.time(), {
+            'callback': span.callback,
+            'parseMs': round(seconds * 1000, 3),
+            'bytes': len(response.body),
+            'items': items,
+            'requests': requests
+        })
+
+    def process_spider_output(self, response, result, spider):
+        span: Optional[RequestSpan] = response.meta.get('trace_span')
+        if span is None or span.callbackStart is None:
+            yield from result
+            return
+
+        seconds, items, requests = 0.0, 0, 0
+        iterator = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = next(iterator)
+                finally:
+                    seconds += time.perf_counter() - start
+
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        except StopIteration:
+            pass
+        finally:
+            self.finishCallback(span, response, seconds, items, requests)
+
+    async def process_spider_output_async(self, response, result, spider):
+        span: Optional[RequestSpan] = response.meta.get('trace_span')
+        if span is None or span.callbackStart is None:
+            async for output in result:
+                yield output
+            return
+
+        seconds, items, requests = 0.0, 0, 0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = await iterator.__anext__()
+                finally:
+                    seconds += time.perf_counter() - start
+
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        except StopAsyncIteration:
+            pass
+        finally:
+            self.finishCallback(span, response, seconds, items, requests)
+
+    def spider_closed(self, spider):
+        # Microseconds since the crawl started
+        ts = lambda t: round((t - self.startTime) * 1e6)
+
+        events = [{'ph': 'M', 'pid': 1, 'name': 'process_name', 'args': {'name': spider.name}}]
+        for name, spanId, start, end, args in self.slices:
+            events.append({'ph': 'b', 'cat': 'request', 'name': name, 'id': spanId, 'pid': 1, 'ts': ts(start), 'args': args})
+            events.append({'ph': 'e', 'cat': 'request', 'name': name, 'id': spanId, 'pid': 1, 'ts': ts(end)})
+        for now, downloads, queued in self.counters:
+            events.append({'ph': 'C', 'name': 'requests', 'pid': 1, 'ts': ts(now), 'args': {'downloading': downloads, 'queued': queued}})
+
+        path = self.path % {'name': spider.name}
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, open(path, 'w'))
+
+        histograms = {}
+        stats = self.crawler.stats
+        for callback, seconds in self.parseSeconds.items():
+            parseMs = {key: round(value * 1000, 3) for key, value in percentiles(seconds).items()}
+            histograms[callback] = {
+                'responses': len(seconds),
+                'items': self.items[callback],
+                'parseMs': parseMs,
+                'bytes': percentiles(self.responseBytes[callback])
+            }
+            stats.set_value(f'trace/{callback}/parse_ms_p95', parseMs['p95'])
+            spider.logger.info(
+                f'{callback}: {len(seconds)} responses, parse {parseMs["p50"]} ms median, {parseMs["p95"]} ms p95, {parseMs["p99"]} ms p99'
+            )
+
+        json.dump(histograms, open(self.histogramPath % {'name': spider.name}, 'w'), indent=4)
+        spider.logger.info(f'Timeline of {min(self.requests, self.maxRequests)} requests written to {path}')
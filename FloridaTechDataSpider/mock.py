@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+# Sends https requests to mockServer.py instead of the real sources, see benchmark.py
+# Enabled with
+#   DOWNLOAD_HANDLERS = {'https': 'FloridaTechDataSpider.mock.MockSourceDownloadHandler'}
+#   MOCK_SOURCE = 'http://127.0.0.1:8000'
+# The source host becomes the first path segment, for example
+# https://apps.fit.edu/schedule?page=2 -> http://127.0.0.1:8000/apps.fit.edu/schedule?page=2
+# Responses keep the original URL, so spiders, slots and the offsite filter see no difference
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+
+class MockSourceDownloadHandler(HTTP11DownloadHandler):
+    def __init__(self, settings, crawler=None):
+        super().__init__(settings, crawler)
+        self.source: str = settings.get('MOCK_SOURCE')
+        if not self.source:
+            raise NotConfigured('MOCK_SOURCE is not set')
+
+        self.source = self.source.rstrip('/')
+
+    def mockUrl(self, request) -> str:
+        url = urlparse_cached(request)
+        mockUrl = f'{self.source}/{url.netloc}{url.path or "/"}'
+        if url.query:
+            mockUrl += '?' + url.query
+
+        return mockUrl
+
+    def download_request(self, request, spider):
+        mockRequest = request.replace(url=self.mockUrl(request))
+        d = super().download_request(mockRequest, spider)
+        d.addCallback(lambda response: response.replace(url=request.url))
+        return d
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# Parsing off the reactor thread
+# Heavy callbacks send the body of their response to a pool of PARSE_POOL_SIZE processes and await plain data,
+# so downloads keep going while a page parses, and parsing can use more than one core
+# Results are handed back in the order pages were sent, so items come out in the same order as parsing in place
+# An exception raised by a page parser is raised again where its result is awaited
+# With PARSE_POOL_SIZE = 0 pages are parsed in the callback, on the reactor thread
+
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Optional, Tuple
+
+from scrapy import signals
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+
+# Runs in a pool process, the response is rebuilt from what can be pickled
+def parseInPool(parseFn: Callable, responseClass: type, url: str, body: bytes, encoding: str, args: tuple) -> Tuple[object, float]:
+    start = time.process_time()
+    result = parseFn(responseClass(url=url, body=body, encoding=encoding), *args)
+    return result, time.process_time() - start
+
+
+class ParsePool:
+    # One pool per crawler, shared by its callbacks
+
+    def __init__(self, crawler):
+        self.stats = crawler.stats
+        self.size: int = crawler.settings.getint('PARSE_POOL_SIZE')
+        self.executor: Optional[ProcessPoolExecutor] = None
+        if self.size > 0:
+            # Pool processes are forked from a clean server process rather than from the one running the reactor
+            self.executor = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context('forkserver'))
+
+        # Pages sent and not handed back yet, in the order they were sent
+        self.pending: Deque[Tuple[Future, defer.Deferred]] = deque()
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def of(cls, crawler) -> 'ParsePool':
+        if not hasattr(crawler, 'parsePool'):
+            crawler.parsePool = cls(crawler)
+
+        return crawler.parsePool
+
+    # parseFn(response, *args) as a Deferred
+    # parse_pool/reactor_seconds is the CPU time the reactor thread spends parsing, or sending pages to the pool
+    # parseFn and args must be picklable, so parseFn is a module level function that only looks at the page
+    def parse(self, parseFn: Callable, response, *args) -> defer.Deferred:
+        start = time.thread_time()
+        if self.executor is None:
+            try:
+                return defer.succeed(parseFn(response, *args))
+            finally:
+                self.stats.inc_value('parse_pool/reactor_seconds', time.thread_time() - start)
+
+        d = defer.Deferred()
+        future = self.executor.submit(parseInPool, parseFn, type(response), response.url, response.body, response.encoding, args)
+        self.pending.append((future, d))
+        # The reactor is imported once the crawler process has installed it, importing it with this module would install the default one
+        from twisted.internet import reactor
+        future.add_done_callback(lambda _: reactor.callFromThread(self.handBack))
+
+        # The first page starts the pool processes
+        seconds = time.thread_time() - start
+        self.stats.inc_value('parse_pool/startup_seconds' if self.stats.get_value('parse_pool/pages') is None else 'parse_pool/reactor_seconds', seconds)
+        self.stats.inc_value('parse_pool/pages')
+        self.stats.max_value('parse_pool/max_pending', len(self.pending))
+        return d
+
+    # A page parsed early waits for the pages sent before it
+    def handBack(self) -> None:
+        while self.pending and self.pending[0][0].done():
+            future, d = self.pending.popleft()
+
+            # Pages still queued when the spider closed, exception() would raise
+            if future.cancelled():
+                self.stats.inc_value('parse_pool/cancelled')
+                d.errback(Failure(defer.CancelledError()))
+                continue
+
+            exception = future.exception()
+            if exception is not None:
+                self.stats.inc_value('parse_pool/errors')
+                d.errback(exception)
+                continue
+
+            # CPU time of parsing in the pool process
+            result, seconds = future.result()
+            self.stats.inc_value('parse_pool/seconds', seconds)
+            d.callback(result)
+
+    def spider_closed(self, spider):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
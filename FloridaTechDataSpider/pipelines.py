@@ -1,6 +1,122 @@
 # -*- coding: utf-8 -*-
 
-# Define your item pipelines here
-#
-# Don't forget to add your pipeline to the ITEM_PIPELINES setting
-# See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+# Turns the dicts spiders yield into the slotted items of FloridaTechDataSpider.items
+#   Strings of fields that repeat across items, like locations, sessions, titles and restrictions,
+#   are shared through one table, so a buffered item only holds its own values
+#   Field types are checked on the outer value only, a mismatch is counted and logged once per field but kept
+#   A dict whose keys are not those of an item class, in order, is passed on untouched
+# Memory of one item in ITEM_SIZE_SAMPLE is measured before and after, and reported when the spider closes
+
+import sys
+from typing import Dict, Set
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .items import ITEM_CLASSES, SlottedItem
+
+
+# Bytes held by a value and what it contains
+# Strings in the shared table are left out, dict keys are the literals of the spiders and shared by every item
+def deepSize(value, shared: Dict[str, str]) -> int:
+    if isinstance(value, str):
+        return 0 if shared.get(value) is value else sys.getsizeof(value)
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deepSize(v, shared) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deepSize(v, shared) for v in value)
+    elif isinstance(value, SlottedItem):
+        size += sum(deepSize(getattr(value, name), shared) for name in value.fieldNames)
+
+    return size
+
+
+class TypedItems:
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.sampleEvery: int = crawler.settings.getint('ITEM_SIZE_SAMPLE')
+
+        # String -> the one copy items share
+        self.strings: Dict[str, str] = {}
+        # Class.field already logged as mistyped
+        self.mistyped: Set[str] = set()
+
+        self.typed = 0
+        self.sampled = 0
+        self.dictBytes = 0
+        self.typedBytes = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('ITEM_TYPING_ENABLED'):
+            raise NotConfigured
+
+        pipeline = cls(crawler)
+        crawler.signals.connect(pipeline.report, signal=signals.spider_closed)
+        return pipeline
+
+    def intern(self, value):
+        if isinstance(value, str):
+            return self.strings.setdefault(value, value)
+        if isinstance(value, list):
+            return [self.intern(v) for v in value]
+        if isinstance(value, tuple):
+            return tuple(self.intern(v) for v in value)
+
+        return value
+
+    def check(self, item: SlottedItem, spider) -> None:
+        for name, types in zip(item.fieldNames, item.fieldTypes):
+            value = getattr(item, name)
+            if isinstance(value, types):
+                continue
+
+            key = f'{type(item).__name__}.{name}'
+            self.stats.inc_value(f'items/mistyped/{key}')
+            if key not in self.mistyped:
+                self.mistyped.add(key)
+                spider.logger.warning(f'{key} is {type(value).__name__}, expected {" or ".join(t.__name__ for t in types)}: {value!r}')
+
+    def process_item(self, item, spider):
+        if not isinstance(item, dict):
+            return item
+
+        itemClass = ITEM_CLASSES.get(tuple(item))
+        if itemClass is None:
+            self.stats.inc_value('items/untyped')
+            return item
+
+        internFields = itemClass.internFields
+        typedItem = itemClass(*(
+            self.intern(value) if name in internFields else value
+            for name, value in item.items()
+        ))
+        self.check(typedItem, spider)
+
+        self.typed += 1
+        self.stats.inc_value('items/typed')
+        if self.sampleEvery > 0 and self.typed % self.sampleEvery == 1 % self.sampleEvery:
+            self.sampled += 1
+            self.dictBytes += deepSize(item, {})
+            self.typedBytes += deepSize(typedItem, self.strings)
+
+        return typedItem
+
+    def report(self, spider, reason):
+        if self.sampled == 0:
+            return
+
+        sharedBytes = sum(sys.getsizeof(string) for string in self.strings)
+        dictBytes = self.dictBytes / self.sampled
+        typedBytes = self.typedBytes / self.sampled
+        self.stats.set_value('items/dict_bytes_per_item', round(dictBytes))
+        self.stats.set_value('items/typed_bytes_per_item', round(typedBytes))
+        self.stats.set_value('items/shared_string_bytes', sharedBytes)
+        spider.logger.info(
+            f'{self.typed} typed items, {dictBytes:.0f} bytes per item as dicts, {typedBytes:.0f} slotted and interned, '
+            f'{len(self.strings)} shared strings of {sharedBytes / 1024:.1f} KB'
+        )
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+# Helpers for spiders whose start requests come from large raw files
+# Records are streamed from disk and looked up again by key when a response
+# arrives, so memory follows the requests in flight instead of the dataset
+
+import json
+import os
+import resource
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+
+from .scope import Scope
+from .shards import shardOf
+from .terms import Term, TermRecency
+
+
+# Stream records of a JSON array file together with their byte offset and length
+# Works with any formatting, both the feed exporter and json.dump(indent=4) are fine
+# An empty file, as left by '> file' in the Makefile, has no records
+def iterJsonArray(path: str, chunkSize: int = 1 << 20) -> Iterator[Tuple[int, int, Any]]:
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0    # Position in buffer
+        offset = 0      # Byte offset of buffer[position] in the file
+        eof = False
+
+        while True:
+            # Separators are ASCII, so they take one byte each
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+                position += 1
+                offset += 1
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                if position == len(buffer):
+                    raise ValueError('Buffer is empty')
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The record may be cut at the end of the buffer
+                if eof:
+                    if position == len(buffer):
+                        return
+                    raise
+
+                chunk = f.read(chunkSize)
+                eof = chunk == ''
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            length = len(buffer[position:end].encode('utf-8'))
+            yield offset, length, record
+
+            offset += length
+            position = end
+
+
+class RecordFile:
+    # Records of a JSON array file, indexed by key while they are streamed
+    # Only byte offsets are kept, a record is read from disk again by get()
+
+    def __init__(self, path: str, keyFn: Callable[[int, dict], Hashable]):
+        self.path = path
+        self.keyFn = keyFn
+        self.offsets: Dict[Hashable, Tuple[int, int]] = {}
+        self.file = None
+
+    # Stream (key, record) pairs, indexing them on the way
+    def __iter__(self) -> Iterator[Tuple[Hashable, dict]]:
+        for key, _, record in self.scan():
+            yield key, record
+
+    # Stream (key, (offset, length), record), indexing them on the way
+    def scan(self) -> Iterator[Tuple[Hashable, Tuple[int, int], dict]]:
+        for index, (offset, length, record) in enumerate(iterJsonArray(self.path)):
+            key = self.keyFn(index, record)
+            self.offsets[key] = (offset, length)
+            yield key, (offset, length), record
+
+    # Index the whole file without keeping records
+    def index(self) -> 'RecordFile':
+        for _ in self:
+            pass
+
+        return self
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        if key not in self.offsets:
+            return None
+
+        return self.read(self.offsets[key])
+
+    # Record at a (offset, length) of scan()
+    def read(self, span: Tuple[int, int]) -> dict:
+        if self.file is None:
+            self.file = open(self.path, 'rb')
+
+        offset, length = span
+        self.file.seek(offset)
+        return json.loads(self.file.read(length))
+
+
+class BoundedStartRequests:
+    # Spider mixin that takes requests from produceRequests() only while the
+    # scheduler holds fewer than START_REQUESTS_WATERMARK of them
+    # The producer is topped up as requests leave the downloader and when the spider is idle
+    # Spiders define produceRequests(self), a generator of their start requests,
+    # which skips records with inShard() and inScope()
+
+    # Sharded mode, see shardCrawl.py
+    # Producers only request records whose shard key falls in this shard
+    shard: Optional[int] = None
+    shardCount: int = 1
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.shard = None if spider.shard is None else int(spider.shard)
+        spider.shardCount = int(spider.shardCount)
+        spider.watermark = crawler.settings.getint('START_REQUESTS_WATERMARK')
+        spider.producer = None
+        spider.recordCounts = {}
+        spider.termRecency = TermRecency.of(crawler)
+        spider.scope = Scope.of(crawler)
+        crawler.signals.connect(spider.refillStartRequests, signal=signals.request_left_downloader)
+        crawler.signals.connect(spider.startRequestsIdle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.reportPeakRss, signal=signals.spider_closed)
+        return spider
+
+    def inShard(self, key) -> bool:
+        if self.shard is None:
+            return True
+
+        if shardOf(key, self.shardCount) == self.shard:
+            return True
+
+        self.crawler.stats.inc_value('shard/skipped')
+        return False
+
+    # Scoped mode, see FloridaTechDataSpider.scope
+    # Producers only request records in scope of the crawl
+    def isInScope(self, record: dict) -> bool:
+        return True
+
+    def inScope(self, record: dict) -> bool:
+        if self.isInScope(record):
+            return True
+
+        self.crawler.stats.inc_value('scope/skipped')
+        return False
+
+    # Items the crawl ends with, for the ETA of FloridaTechDataSpider.progress, None if unknown
+    def expectedItems(self) -> Optional[int]:
+        return None
+
+    # Records of a raw file in scope that fall in this shard, counted once
+    def countRecords(self, path: str, shardKeyFn: Callable[[dict], Hashable]) -> int:
+        if path not in self.recordCounts:
+            self.recordCounts[path] = sum(
+                1
+                for _, _, record in iterJsonArray(path)
+                if self.isInScope(record) and (self.shard is None or shardOf(shardKeyFn(record), self.shardCount) == self.shard)
+            )
+
+        return self.recordCounts[path]
+
+    # Records of a raw file, the most recent terms first, see FloridaTechDataSpider.terms
+    # The scheduler only holds a watermark of requests, so priorities alone would not reach past it
+    # One pass indexes the file and buckets record offsets by term, records are then read back term by term
+    def recentFirst(self, records: RecordFile, termFn: Callable[[dict], Term]) -> Iterator[Tuple[Hashable, dict]]:
+        if not self.termRecency.enabled:
+            yield from records
+            return
+
+        spansByTerm: Dict[Term, List[Tuple[Hashable, Tuple[int, int]]]] = {}
+        for key, span, record in records.scan():
+            spansByTerm.setdefault(termFn(record), []).append((key, span))
+
+        for term in sorted(spansByTerm, key=self.termRecency.rank):
+            for key, span in spansByTerm.pop(term):
+                yield key, records.read(span)
+
+    def start_requests(self):
+        self.producer = iter(self.produceRequests())
+        yield from self.takeStartRequests()
+
+    def takeStartRequests(self) -> list:
+        requests = []
+        if self.producer is None:
+            return requests
+
+        scheduled = len(self.crawler.engine.slot.scheduler)
+        while scheduled + len(requests) < self.watermark:
+            try:
+                requests.append(next(self.producer))
+            except StopIteration:
+                self.producer = None
+                break
+
+        return requests
+
+    def refillStartRequests(self, request=None, spider=None) -> int:
+        # Top up in batches, not on every single request
+        if self.producer is None or len(self.crawler.engine.slot.scheduler) > self.watermark // 2:
+            return 0
+
+        requests = self.takeStartRequests()
+        for startRequest in requests:
+            self.crawler.engine.crawl(startRequest)
+
+        return len(requests)
+
+    def startRequestsIdle(self, spider):
+        if self.refillStartRequests() > 0:
+            raise DontCloseSpider
+
+    def reportPeakRss(self, spider):
+        # ru_maxrss is in kilobytes on Linux
+        peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.crawler.stats.set_value('memory/peak_rss', peakRss)
+        self.logger.info(f'Peak RSS {peakRss / 1024 / 1024:.1f} MB')
+
+
+class Checkpoint:
+    # Items scraped so far, one JSON line each, so that a crashed run can resume
+    # The file is removed once the spider finishes cleanly
+    # On restart, producers skip keys in the checkpoint and replay() emits their items again,
+    # so the feed still ends up complete even though the Makefile truncates it
+
+    def __init__(self, crawler, path: str, keyFn: Callable[[dict], Hashable]):
+        self.crawler = crawler
+        self.path = path
+        self.keyFn = keyFn
+        self.doneKeys = set()
+
+        # Load what the last run completed, a crash may have cut the last line
+        goodBytes = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    self.doneKeys.add(keyFn(item))
+                    goodBytes += len(line)
+
+            os.truncate(path, goodBytes)
+
+        self.resumedBytes = goodBytes
+        crawler.stats.set_value('checkpoint/resumed', len(self.doneKeys))
+        if self.doneKeys:
+            crawler.spider.logger.warning(f'Resuming from {path}, {len(self.doneKeys)} items already done')
+
+        self.file = open(path, 'a')
+        crawler.signals.connect(self.record, signal=signals.item_scraped)
+        crawler.signals.connect(self.close, signal=signals.spider_closed)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.doneKeys
+
+    def __len__(self) -> int:
+        return len(self.doneKeys)
+
+    # Items of the last run, read back from disk
+    def replay(self) -> Iterator[dict]:
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if f.tell() > self.resumedBytes:
+                    break
+                yield json.loads(line)
+
+    def record(self, item, response, spider):
+        key = self.keyFn(item)
+        if key in self.doneKeys:
+            return
+
+        self.doneKeys.add(key)
+        self.file.write(json.dumps(dict(item)) + '\n')
+        self.file.flush()
+        self.crawler.stats.inc_value('checkpoint/recorded')
+
+    def close(self, spider, reason):
+        self.file.close()
+        if reason == 'finished':
+            os.remove(self.path)
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+# Live progress of each crawl: requests, items, errors, bytes, requests in flight, per host rates and an ETA
+# A line is logged every PROGRESS_INTERVAL seconds, and with PROGRESS_HTTP_ENABLED the same counters are served on
+# http://PROGRESS_HTTP_HOST:PROGRESS_HTTP_PORT/ as JSON and on /metrics in Prometheus text format
+# All crawlers of a process share one endpoint, so crawl.py shows every spider on the same page
+# The ETA needs the number of items a crawl ends with, which spiders reading a raw file know from its records,
+# see BoundedStartRequests.expectedItems
+
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.reactor import listen_tcp
+from twisted.internet import reactor, task
+from twisted.web import resource, server
+
+logger = logging.getLogger(__name__)
+
+# Seconds between samples of the counters rates are computed from
+SAMPLE_INTERVAL = 5
+
+# Prometheus metrics, from the keys of CrawlProgress.snapshot()
+METRICS = [
+    {
+        'name': 'scrapy_requests_scheduled_total',
+        'type': 'counter',
+        'help': 'Requests scheduled',
+        'key': 'scheduled'
+    }, {
+        'name': 'scrapy_responses_total',
+        'type': 'counter',
+        'help': 'Responses downloaded',
+        'key': 'completed'
+    }, {
+        'name': 'scrapy_requests_queued',
+        'type': 'gauge',
+        'help': 'Requests in the scheduler or waiting for a downloader slot',
+        'key': 'queued'
+    }, {
+        'name': 'scrapy_requests_in_flight',
+        'type': 'gauge',
+        'help': 'Requests being downloaded',
+        'key': 'inFlight'
+    }, {
+        'name': 'scrapy_items_total',
+        'type': 'counter',
+        'help': 'Items scraped',
+        'key': 'items'
+    }, {
+        'name': 'scrapy_items_expected',
+        'type': 'gauge',
+        'help': 'Items the crawl ends with, when known',
+        'key': 'expectedItems'
+    }, {
+        'name': 'scrapy_errors_total',
+        'type': 'counter',
+        'help': 'Errors logged',
+        'key': 'errors'
+    }, {
+        'name': 'scrapy_failures_total',
+        'type': 'counter',
+        'help': 'Pages quarantined or retried at the end of the run, see FAILURE_TOLERANCE_ENABLED',
+        'key': 'failures'
+    }, {
+        'name': 'scrapy_response_bytes_total',
+        'type': 'counter',
+        'help': 'Bytes of responses',
+        'key': 'bytes'
+    }, {
+        'name': 'scrapy_items_per_second',
+        'type': 'gauge',
+        'help': 'Items scraped per second over PROGRESS_RATE_WINDOW',
+        'key': 'itemsPerSecond'
+    }, {
+        'name': 'scrapy_responses_per_second',
+        'type': 'gauge',
+        'help': 'Responses per second over PROGRESS_RATE_WINDOW',
+        'key': 'responsesPerSecond'
+    }, {
+        'name': 'scrapy_eta_seconds',
+        'type': 'gauge',
+        'help': 'Seconds until every expected item is scraped at the current rate',
+        'key': 'eta'
+    }, {
+        'name': 'scrapy_spider_running',
+        'type': 'gauge',
+        'help': 'Whether the spider is still open',
+        'key': 'running'
+    }
+]
+
+# Prometheus metrics of each host, from the keys of CrawlProgress.snapshot()['hosts']
+HOST_METRICS = [
+    {
+        'name': 'scrapy_host_responses_total',
+        'type': 'counter',
+        'help': 'Responses downloaded from the host',
+        'key': 'responses'
+    }, {
+        'name': 'scrapy_host_response_bytes_total',
+        'type': 'counter',
+        'help': 'Bytes of responses from the host',
+        'key': 'bytes'
+    }, {
+        'name': 'scrapy_host_responses_per_second',
+        'type': 'gauge',
+        'help': 'Responses per second from the host over PROGRESS_RATE_WINDOW',
+        'key': 'responsesPerSecond'
+    }, {
+        'name': 'scrapy_host_requests_in_flight',
+        'type': 'gauge',
+        'help': 'Requests to the host being downloaded',
+        'key': 'inFlight'
+    }
+]
+
+
+def formatDuration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '?'
+
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f'{hours}h{minutes:02d}m'
+    return f'{minutes}m{seconds:02d}s'
+
+
+def labelValue(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Counters of every crawl in Prometheus text format
+# Metrics without a value, like the ETA of a crawl without known totals, are left out
+def prometheusText(snapshots: List[dict]) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric["name"]} {metric["help"]}')
+        lines.append(f'# TYPE {metric["name"]} {metric["type"]}')
+        for snapshot in snapshots:
+            value = snapshot[metric['key']]
+            if value is not None:
+                lines.append(f'{metric["name"]}{{spider="{labelValue(snapshot["spider"])}"}} {float(value)}')
+
+    for metric in HOST_METRICS:
+        lines.append(f'# HELP {metric["name"]} {metric["help"]}')
+        lines.append(f'# TYPE {metric["name"]} {metric["type"]}')
+        for snapshot in snapshots:
+            for host, hostSnapshot in snapshot['hosts'].items():
+                labels = f'spider="{labelValue(snapshot["spider"])}",host="{labelValue(host)}"'
+                lines.append(f'{metric["name"]}{{{labels}}} {float(hostSnapshot[metric["key"]])}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class ProgressResource(resource.Resource):
+    # / is JSON keyed by spider, /metrics is Prometheus text
+    isLeaf = True
+
+    def __init__(self, progressServer: 'ProgressServer'):
+        super().__init__()
+        self.progressServer = progressServer
+
+    def render_GET(self, request) -> bytes:
+        snapshots = [progress.snapshot() for progress in self.progressServer.crawls]
+
+        if request.path == b'/metrics':
+            request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+            return prometheusText(snapshots).encode('utf-8')
+
+        if request.path in (b'/', b'/progress.json'):
+            request.setHeader(b'Content-Type', b'application/json')
+            return json.dumps({snapshot['spider']: snapshot for snapshot in snapshots}, indent=4).encode('utf-8')
+
+        request.setResponseCode(404)
+        return b'Not found\n'
+
+
+class ProgressServer:
+    # One endpoint per process, it lists every crawl that registered, finished ones included,
+    # and listens until the reactor stops
+
+    instance: Optional['ProgressServer'] = None
+
+    def __init__(self, portRange: List[int], host: str):
+        self.crawls: List['CrawlProgress'] = []
+        site = server.Site(ProgressResource(self))
+        site.noisy = False
+        self.port = listen_tcp(portRange, host, site)
+        reactor.addSystemEventTrigger('before', 'shutdown', self.port.stopListening)
+
+        address = self.port.getHost()
+        logger.warning(f'Crawl progress on http://{address.host}:{address.port}/ and /metrics')
+
+    @classmethod
+    def of(cls, settings) -> 'ProgressServer':
+        if cls.instance is None:
+            portRange = [int(port) for port in settings.getlist('PROGRESS_HTTP_PORT')]
+            cls.instance = cls(portRange, settings.get('PROGRESS_HTTP_HOST'))
+
+        return cls.instance
+
+    def register(self, progress: 'CrawlProgress') -> None:
+        self.crawls.append(progress)
+
+
+class CrawlProgress:
+    # Extension that keeps the live counters of a crawl
+    # Totals come from the stats, per host counts from responses and the downloader slots
+    # Rates are taken over the last PROGRESS_RATE_WINDOW seconds
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PROGRESS_ENABLED'):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval: float = settings.getfloat('PROGRESS_INTERVAL')
+        self.httpEnabled: bool = settings.getbool('PROGRESS_HTTP_ENABLED')
+        self.spider = None
+        self.running = False
+        self.startTime: Optional[float] = None
+        self.finishReason: Optional[str] = None
+        self.countFailed = False
+
+        # Host -> responses, bytes
+        self.hostResponses: Dict[str, int] = {}
+        self.hostBytes: Dict[str, int] = {}
+
+        # (Time, items, responses, responses of each host)
+        sampleCount = max(2, int(settings.getfloat('PROGRESS_RATE_WINDOW') / SAMPLE_INTERVAL) + 1)
+        self.samples: Deque[Tuple[float, int, int, Dict[str, int]]] = deque(maxlen=sampleCount)
+        self.sampler: Optional[task.LoopingCall] = None
+        self.reporter: Optional[task.LoopingCall] = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.response_received, signal=signals.response_received)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.running = True
+        self.startTime = time.time()
+
+        self.sampler = task.LoopingCall(self.sample)
+        self.sampler.start(SAMPLE_INTERVAL)
+        if self.interval > 0:
+            self.reporter = task.LoopingCall(self.report)
+            self.reporter.start(self.interval, now=False)
+
+        if self.httpEnabled:
+            ProgressServer.of(self.crawler.settings).register(self)
+
+    def response_received(self, response, request, spider):
+        url = urlparse_cached(request)
+        host = url.hostname or url.scheme
+        self.hostResponses[host] = self.hostResponses.get(host, 0) + 1
+        self.hostBytes[host] = self.hostBytes.get(host, 0) + len(response.body)
+
+    def spider_closed(self, spider, reason):
+        for loop in (self.sampler, self.reporter):
+            if loop is not None and loop.running:
+                loop.stop()
+
+        # Counters of the downloader are gone once the spider closes
+        self.running = False
+        self.finishReason = reason
+        self.report()
+
+    def sample(self) -> None:
+        self.samples.append((
+            time.time(),
+            self.stats.get_value('item_scraped_count', 0),
+            self.stats.get_value('downloader/response_count', 0),
+            dict(self.hostResponses)
+        ))
+
+    def expectedItems(self) -> Optional[int]:
+        expectedItems = getattr(self.spider, 'expectedItems', None)
+        if expectedItems is None:
+            return None
+
+        if self.countFailed:
+            return None
+
+        try:
+            return expectedItems()
+        except (OSError, ValueError) as e:
+            self.spider.logger.warning(f'No ETA, cannot count expected items: {e}')
+            self.countFailed = True
+            return None
+
+    # Live counters, as served by the endpoint
+    def snapshot(self) -> dict:
+        now = time.time()
+        stats = self.stats
+        items = stats.get_value('item_scraped_count', 0)
+        completed = stats.get_value('downloader/response_count', 0)
+
+        # Rates since the oldest sample in the window
+        itemsPerSecond = responsesPerSecond = 0.0
+        hostRates: Dict[str, float] = {}
+        if self.samples:
+            sampleTime, sampleItems, sampleResponses, sampleHostResponses = self.samples[0]
+            elapsed = now - sampleTime
+            if elapsed > 0:
+                itemsPerSecond = (items - sampleItems) / elapsed
+                responsesPerSecond = (completed - sampleResponses) / elapsed
+                hostRates = {
+                    host: (responses - sampleHostResponses.get(host, 0)) / elapsed
+                    for host, responses in self.hostResponses.items()
+                }
+
+        queued = inFlight = 0
+        hostsInFlight: Dict[str, int] = {}
+        if self.running:
+            # Requests waiting for a downloader slot count as queued
+            engine = self.crawler.engine
+            slots = engine.downloader.slots
+            queued = len(engine.slot.scheduler) + sum(len(slot.queue) for slot in slots.values())
+            hostsInFlight = {
+                key: len(slot.transferring)
+                for key, slot in slots.items()
+            }
+            inFlight = sum(hostsInFlight.values())
+
+        expectedItems = None if self.spider is None else self.expectedItems()
+        eta = None
+        if expectedItems is not None:
+            if items >= expectedItems or not self.running:
+                eta = 0.0
+            elif itemsPerSecond > 0:
+                eta = (expectedItems - items) / itemsPerSecond
+
+        return {
+            'spider': self.crawler.spidercls.name,
+            'running': self.running,
+            'finishReason': self.finishReason,
+            'elapsed': 0.0 if self.startTime is None else now - self.startTime,
+            'scheduled': stats.get_value('scheduler/enqueued', 0),
+            'completed': completed,
+            'queued': queued,
+            'inFlight': inFlight,
+            'items': items,
+            'expectedItems': expectedItems,
+            'errors': stats.get_value('log_count/ERROR', 0),
+            'failures': sum(value for key, value in stats.get_stats().items() if key.startswith('failures/')),
+            'bytes': stats.get_value('downloader/response_bytes', 0),
+            'itemsPerSecond': itemsPerSecond,
+            'responsesPerSecond': responsesPerSecond,
+            'eta': eta,
+            'hosts': {
+                host: {
+                    'responses': self.hostResponses.get(host, 0),
+                    'bytes': self.hostBytes.get(host, 0),
+                    'responsesPerSecond': hostRates.get(host, 0.0),
+                    'inFlight': hostsInFlight.get(host, 0)
+                }
+                for host in sorted(set(self.hostResponses) | set(hostsInFlight))
+            }
+        }
+
+    def report(self) -> None:
+        snapshot = self.snapshot()
+
+        items = f'{snapshot["items"]} items'
+        if snapshot['expectedItems']:
+            items = f'{snapshot["items"]}/{snapshot["expectedItems"]} items ({snapshot["items"] / snapshot["expectedItems"]:.0%})'
+
+        hosts = ', '.join(
+            f'{host} {hostSnapshot["responsesPerSecond"]:.1f}/s'
+            for host, hostSnapshot in snapshot['hosts'].items()
+            if hostSnapshot['responsesPerSecond'] > 0
+        )
+
+        self.spider.logger.warning(
+            f'{items}, {snapshot["completed"]} responses, {snapshot["scheduled"]} requests scheduled, '
+            f'{snapshot["inFlight"]} in flight, {snapshot["queued"]} queued, '
+            f'{snapshot["errors"]} errors, {snapshot["bytes"] / 1024 / 1024:.1f} MB, '
+            f'{snapshot["itemsPerSecond"]:.1f} items/s{f" ({hosts})" if hosts else ""}, '
+            f'ETA {formatDuration(snapshot["eta"])}'
+        )
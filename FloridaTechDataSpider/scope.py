@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# Scope of a partial crawl and build: some subjects, terms and campuses, see 'make scope'
+# CRAWL_SUBJECTS, CRAWL_TERMS and CRAWL_CAMPUSES are settings of the spiders and environment variables of the
+# post-processing scripts, an empty list is every subject, term or campus
+# SectionSpider only follows campus and semester links in scope, the PAWS spiders only request sections and courses
+# in scope, and scripts leave out raw records outside of it, so every file of a scoped build agrees with the others
+# Terms are codes like 202608, 'current' or 'upcoming', campuses are slugs of their name like 'fort-lee-va'
+
+import os
+import re
+from typing import List, Optional
+
+from .terms import SEMESTERS, Term, currentTerm, parseTermIn, termOffset
+
+
+def slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def splitList(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip() != '']
+
+
+class Scope:
+
+    def __init__(self, subjects: List[str], terms: List[str], campuses: List[str], current: Term):
+        self.subjects = {subject.upper() for subject in subjects}
+        self.terms = terms
+        self.campuses = {slug(campus) for campus in campuses}
+        self.current = current
+
+    @classmethod
+    def fromSettings(cls, settings) -> 'Scope':
+        return cls(
+            [subject for subject in settings.getlist('CRAWL_SUBJECTS') if subject != ''],
+            [term for term in settings.getlist('CRAWL_TERMS') if term != ''],
+            [campus for campus in settings.getlist('CRAWL_CAMPUSES') if campus != ''],
+            currentTerm(settings.get('CURRENT_TERM'))
+        )
+
+    # One per crawler
+    @classmethod
+    def of(cls, crawler) -> 'Scope':
+        if not hasattr(crawler, 'scope'):
+            crawler.scope = cls.fromSettings(crawler.settings)
+
+        return crawler.scope
+
+    # Post-processing scripts get the scope from make
+    @classmethod
+    def fromEnvironment(cls) -> 'Scope':
+        return cls(
+            splitList(os.environ.get('CRAWL_SUBJECTS', '')),
+            splitList(os.environ.get('CRAWL_TERMS', '')),
+            splitList(os.environ.get('CRAWL_CAMPUSES', '')),
+            currentTerm(os.environ.get('CURRENT_TERM'))
+        )
+
+    def isEmpty(self) -> bool:
+        return self.subjects == set() and self.terms == [] and self.campuses == set()
+
+    def hasSubject(self, subject: str) -> bool:
+        return self.subjects == set() or subject.upper() in self.subjects
+
+    # A term or campus that cannot be told is in scope, pages further down say which it is
+    def hasTerm(self, term: Optional[Term]) -> bool:
+        if self.terms == [] or term is None:
+            return True
+
+        offset = termOffset(term, self.current)
+        return any(
+            (selected == 'current' and offset == 0)
+            or (selected == 'upcoming' and offset > 0)
+            or (selected not in ('current', 'upcoming') and parseTermIn(selected) == term)
+            for selected in self.terms
+        )
+
+    def hasTermIn(self, termIn: str) -> bool:
+        return self.hasTerm(parseTermIn(termIn))
+
+    def hasCampus(self, location: Optional[str]) -> bool:
+        return self.campuses == set() or location is None or slug(location) in self.campuses
+
+    # A section of _section.raw.json or _pawsSection.raw.json
+    def hasSection(self, section: dict) -> bool:
+        return (
+            self.hasSubject(section['course'][0])
+            and self.hasTerm((section['year'], SEMESTERS.index(section['semester'])))
+            and self.hasCampus(section['location'])
+        )
+
+    # A course of course.json or _pawsCourse.raw.json
+    # Their campus is an index into campus.json, which only lists campuses in scope when sections were
+    def hasCourse(self, course: dict) -> bool:
+        return self.hasSubject(course['subject']) and self.hasTerm((course['year'], course['semesterId']))
+
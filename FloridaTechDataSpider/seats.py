@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Append-only store of seat availability samples, one file per term, see SeatSpider
+# A sample is (crn, time, enrolled, cap, waitlisted, waitlist cap) packed in 16 bytes,
+# -1 is a value the sample did not measure, like the waitlist on apps.fit.edu
+# A sample is only written when its values changed, or SEATS_HEARTBEAT seconds after the last one of the section,
+# so a section nobody registers for costs a few samples a day
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+RECORD = struct.Struct('<IIhhhh')
+
+
+@dataclass
+class Sample:
+    crn: int
+    time: int
+    enrolled: int
+    cap: int
+    waitlisted: int = -1
+    waitlistCap: int = -1
+
+    # Values measured by this sample, keyed like the fields
+    def measured(self) -> Dict[str, int]:
+        return {
+            key: value
+            for key, value in (
+                ('enrolled', self.enrolled),
+                ('cap', self.cap),
+                ('waitlisted', self.waitlisted),
+                ('waitlistCap', self.waitlistCap)
+            )
+            if value != -1
+        }
+
+    # Share of seats taken, None while the cap is unknown
+    def fillRate(self) -> Optional[float]:
+        if self.cap <= 0 or self.enrolled < 0:
+            return None
+
+        return self.enrolled / self.cap
+
+
+def readSamples(path: str) -> Iterator[Sample]:
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # A crash may have cut the last record
+    data = data[:len(data) - len(data) % RECORD.size]
+    for values in RECORD.iter_unpack(data):
+        yield Sample(*values)
+
+
+class SeatStore:
+
+    def __init__(self, path: str, heartbeat: float):
+        self.path = path
+        self.heartbeat = heartbeat
+
+        # Crn -> last known value of each field, and time of the last written sample
+        self.latest: Dict[int, Sample] = {}
+        self.written: Dict[int, int] = {}
+
+        goodBytes = 0
+        if os.path.exists(path):
+            for sample in readSamples(path):
+                self.update(sample)
+                self.written[sample.crn] = sample.time
+                goodBytes += RECORD.size
+
+            os.truncate(path, goodBytes)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self.file = open(path, 'ab')
+
+    def update(self, sample: Sample) -> None:
+        latest = self.latest.setdefault(sample.crn, Sample(sample.crn, sample.time, -1, -1))
+        latest.time = sample.time
+        for key, value in sample.measured().items():
+            setattr(latest, key, value)
+
+    # Returns whether the sample was written
+    def add(self, sample: Sample) -> bool:
+        latest = self.latest.get(sample.crn)
+        changed = latest is None or any(getattr(latest, key) != value for key, value in sample.measured().items())
+        due = sample.time - self.written.get(sample.crn, 0) >= self.heartbeat
+
+        self.update(sample)
+        if not changed and not due:
+            return False
+
+        self.file.write(RECORD.pack(sample.crn, sample.time, sample.enrolled, sample.cap, sample.waitlisted, sample.waitlistCap))
+        self.written[sample.crn] = sample.time
+        return True
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
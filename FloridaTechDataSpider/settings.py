@@ -14,6 +14,9 @@ BOT_NAME = 'FloridaTechDataSpider'
 SPIDER_MODULES = ['FloridaTechDataSpider.spiders']
 NEWSPIDER_MODULE = 'FloridaTechDataSpider.spiders'
 
+# 'scrapy crawl' fails unless the spider finished, see FloridaTechDataSpider/commands/crawl.py
+COMMANDS_MODULE = 'FloridaTechDataSpider.commands'
+
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = 'FloridaTechDataSpider (+http://www.yourdomain.com)'
@@ -22,14 +25,37 @@ NEWSPIDER_MODULE = 'FloridaTechDataSpider.spiders'
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# Per-host concurrency is managed by AdaptiveConcurrencyMiddleware, this is the ceiling for all hosts together
+CONCURRENT_REQUESTS = 64
+
+# Rows per apps.fit.edu schedule page SectionSpider asks for, 0 keeps the site's default
+# Fewer pages per term if the site honors it, nothing changes if it does not
+SECTION_PAGE_SIZE = 200
+
+# PAWS spiders stop taking start requests from their raw files while the scheduler holds this many
+START_REQUESTS_WATERMARK = 1000
+
+# Requests of the current term go first, then those of the terms closest to it, see FloridaTechDataSpider/terms.py
+TERM_PRIORITY_ENABLED = True
+# Term code like '202608', taken from today's date if not set
+CURRENT_TERM = None
+# Scope of the crawl, see FloridaTechDataSpider/scope.py and 'make scope'. Everything if empty
+# Only crawl these subjects, like 'CSE'
+CRAWL_SUBJECTS = []
+# Only crawl these terms, as term codes, 'current' or 'upcoming', see 'make current'
+CRAWL_TERMS = []
+# Only crawl these campuses, as slugs of their name like 'melbourne' or 'fort-lee-va'
+CRAWL_CAMPUSES = []
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+# Starting concurrency of each host
+CONCURRENT_REQUESTS_PER_DOMAIN = 4
+# Requests per domain of all workers of a sharded crawl together, see shardCrawl.py
+SHARDED_CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -46,27 +72,126 @@ TELNETCONSOLE_ENABLED = False
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    'FloridaTechDataSpider.middlewares.FloridatechdataspiderSpiderMiddleware': 543,
-#}
+SPIDER_MIDDLEWARES = {
+    'FloridaTechDataSpider.middlewares.QuarantineMiddleware': 560,
+    # Closest to the spider, so it times callbacks alone
+    'FloridaTechDataSpider.middlewares.CrawlTraceMiddleware': 990,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    'FloridaTechDataSpider.middlewares.FloridatechdataspiderDownloaderMiddleware': 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    'FloridaTechDataSpider.middlewares.FloridatechdataspiderDownloaderMiddleware': 543,
+    # Before RetryMiddleware (550), so it sees the failures that get retried
+    'FloridaTechDataSpider.middlewares.AdaptiveConcurrencyMiddleware': 560,
+    # After RetryMiddleware, so it only sees requests that ran out of retries
+    'FloridaTechDataSpider.middlewares.DeferredRetryMiddleware': 540,
+    # Closest to the downloader, so archived responses are raw and replayed ones go through every middleware
+    # Replay answers before archiving would see a request, though the two are never enabled together
+    'FloridaTechDataSpider.middlewares.WarcArchiveMiddleware': 950,
+    'FloridaTechDataSpider.middlewares.WarcReplayMiddleware': 960,
+    # Closer to the downloader than HttpCacheMiddleware (900), so pages served from the cache are not scanned
+    'FloridaTechDataSpider.middlewares.EarlyStopMiddleware': 910,
+}
+
+# Stop downloading PAWS pages once the table the spider reads has arrived
+EARLY_STOP_ENABLED = True
+
+# Every response is archived to a compressed WARC file per spider and run, see ARCHIVE in the Makefile
+WARC_ARCHIVE_ENABLED = False
+WARC_ARCHIVE_DIR = 'archive'
+# Files kept per spider, older ones are deleted when a crawl starts
+WARC_ARCHIVE_KEEP = 5
+# A WARC file or directory to re-parse responses from instead of crawling, see 'make replay'
+WARC_REPLAY = None
+
+# Base URL of mockServer.py for FloridaTechDataSpider.mock.MockSourceDownloadHandler, see benchmark.py
+MOCK_SOURCE = None
+
+# Tolerant mode: parser exceptions are quarantined and failed downloads are retried at the end of the run,
+# instead of stopping the crawl. Both end up in FAILURE_REPORT
+FAILURE_TOLERANCE_ENABLED = False
+FAILURE_REPORT = '_%(name)s.failures.json'
+# Abort once failures exceed this share of responses, counted after FAILURE_RATIO_MIN_RESPONSES responses
+FAILURE_RATIO_MAX = 0.05
+FAILURE_RATIO_MIN_RESPONSES = 100
+# Rounds of deferred retries, and the wait before the first one in seconds (doubled each round)
+DEFERRED_RETRY_TIMES = 3
+DEFERRED_RETRY_BACKOFF = 30
+
+# Timeline of each crawl in Chrome trace format and per callback percentiles of parse time and response size
+TRACE_ENABLED = True
+TRACE_FILE = '_%(name)s.trace.json'
+TRACE_HISTOGRAMS = '_%(name)s.callbacks.json'
+# Requests kept in the timeline, about 1 KB each
+TRACE_MAX_REQUESTS = 50000
+
+# Progress of each crawl, logged every PROGRESS_INTERVAL seconds with an ETA for spiders that know their item count
+PROGRESS_ENABLED = True
+PROGRESS_INTERVAL = 60
+# Rates and the ETA are taken over this many seconds
+PROGRESS_RATE_WINDOW = 60
+# Serve the counters as JSON on / and in Prometheus text format on /metrics, see FloridaTechDataSpider/progress.py
+# The first free port of the range is used, so shard workers each get their own
+PROGRESS_HTTP_ENABLED = False
+PROGRESS_HTTP_PORT = [6080, 6099]
+PROGRESS_HTTP_HOST = '127.0.0.1'
+
+# Seat availability polling, see 'make seats' and FloridaTechDataSpider/spiders/seats_spider.py
+SEATS_DIR = 'seats'
+# Seconds from the start of a poll cycle to the start of the next
+SEATS_POLL_INTERVAL = 60
+# PAWS pages of sections at least this full, or with a waitlist, are fetched in every cycle,
+# the others every SEATS_COLD_CYCLES cycles
+SEATS_HOT_FILL = 0.9
+SEATS_COLD_CYCLES = 10
+# An unchanged section still gets a sample this many seconds after its last one
+SEATS_HEARTBEAT = 3600
+
+# Processes that parse schedule and PAWS pages off the reactor thread, see FloridaTechDataSpider/parsing.py
+# 0 parses in the callbacks, more pays off for CPU-bound crawls on a machine with cores to spare
+PARSE_POOL_SIZE = 0
+
+# Duplicate request filter backed by a scalable Bloom filter, saved to JOBDIR if there is one,
+# so a resumed run skips pages it already requested
+# Enable with DUPEFILTER_CLASS = 'FloridaTechDataSpider.dupefilters.BloomDupeFilter'
+# Fingerprints of the first filter, each filter added once it is full holds twice as many
+BLOOM_DUPEFILTER_CAPACITY = 100000
+# Chance that a new request is dropped as a duplicate, for any number of fingerprints
+BLOOM_DUPEFILTER_ERROR_RATE = 0.001
+# A saved filter older than this many seconds is ignored
+BLOOM_DUPEFILTER_MAX_AGE = 24 * 60 * 60
+# The filter is removed from JOBDIR when a crawl finishes unless this is set, for incremental crawls
+BLOOM_DUPEFILTER_KEEP_FINISHED = False
+BLOOM_DUPEFILTER_SAVE_INTERVAL = 60
+
+# Adjust concurrency of each host with AIMD (additive increase, multiplicative decrease)
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 32
+# Concurrency is multiplied by this on 5xx, timeouts, Retry-After and high latency
+ADAPTIVE_CONCURRENCY_DECREASE = 0.5
+# Latency above this multiple of the unloaded latency means the host is overloaded
+ADAPTIVE_CONCURRENCY_LATENCY_FACTOR = 3.0
+# Longest pause a Retry-After header can put on a host, in seconds
+ADAPTIVE_CONCURRENCY_MAX_RETRY_AFTER = 60
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    'scrapy.extensions.telnet.TelnetConsole': None,
-#}
+EXTENSIONS = {
+    'FloridaTechDataSpider.progress.CrawlProgress': 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-# ITEM_PIPELINES = {
-#    'FloridaTechDataSpider.pipelines.FloridatechdataspiderPipeline': 300,
-# }
+ITEM_PIPELINES = {
+    'FloridaTechDataSpider.pipelines.TypedItems': 300,
+}
+
+# Scraped dicts become the slotted items of FloridaTechDataSpider.items, with repeated strings shared
+ITEM_TYPING_ENABLED = True
+# Measure memory of one item in this many, reported when the spider closes. 0 never measures
+ITEM_SIZE_SAMPLE = 10
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -83,8 +208,25 @@ TELNETCONSOLE_ENABLED = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = 'httpcache'
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+HTTPCACHE_ENABLED = True
+# Entries never expire from storage, freshness is decided by the policy below
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = 'httpcache'
+HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+HTTPCACHE_POLICY = 'FloridaTechDataSpider.middlewares.FloridatechdataspiderCachePolicy'
+# The servers send no expiration hints, so store everything and let the
+# per-source lifetimes decide. Stale entries are revalidated with
+# If-None-Match/If-Modified-Since when the stored copy has ETag/Last-Modified
+HTTPCACHE_ALWAYS_STORE = True
+HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS = ['no-cache', 'no-store', 'must-revalidate']
+# Freshness lifetime in seconds, keyed by URL prefix (longest prefix wins)
+HTTPCACHE_SOURCE_EXPIRATION_SECS = {
+    # Departments and employees rarely change
+    'https://directory.fit.edu/': 3 * 24 * 3600,
+    # PAWS catalog and course listing pages
+    'https://nssb-p.adm.fit.edu/prod/bwckctlg.': 6 * 3600,
+    # PAWS section detail pages carry waitlist seats
+    'https://nssb-p.adm.fit.edu/prod/bwckschd.': 15 * 60,
+    # Schedule pages carry seat counts
+    'https://apps.fit.edu/schedule': 15 * 60,
+}
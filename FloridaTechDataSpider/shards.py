@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# Work queue of a sharded crawl, see shardCrawl.py
+# Shards live in a SQLite file, so workers on one host, or on several hosts sharing
+# the directory, can claim them without a server
+# A claim is a lease: a shard whose worker died is handed out again once the lease expires
+
+import json
+import sqlite3
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+# Shard of a record, the same in every process unlike hash()
+def shardOf(key, shardCount: int) -> int:
+    return zlib.crc32(json.dumps(key).encode('utf-8')) % shardCount
+
+
+class ShardQueue:
+    def __init__(self, path: str):
+        self.path = path
+        # Transactions are explicit, a busy queue is waited for
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+
+    def create(self, spider: str, shardCount: int, spiderArgs: Dict[str, str], settings: List[str]) -> None:
+        self.db.executescript('''
+            DROP TABLE IF EXISTS meta;
+            DROP TABLE IF EXISTS shards;
+            CREATE TABLE meta (spider TEXT, shardCount INTEGER, spiderArgs TEXT, settings TEXT);
+            CREATE TABLE shards (
+                id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                claimedAt REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output TEXT
+            );
+        ''')
+        self.db.execute('INSERT INTO meta VALUES (?, ?, ?, ?)', (spider, shardCount, json.dumps(spiderArgs), json.dumps(settings)))
+        self.db.executemany('INSERT INTO shards (id) VALUES (?)', [(shard,) for shard in range(shardCount)])
+
+    # Spider name, shard count, spider arguments and settings the queue was created with
+    def meta(self) -> Tuple[str, int, Dict[str, str], List[str]]:
+        spider, shardCount, spiderArgs, settings = self.db.execute('SELECT * FROM meta').fetchone()
+        return spider, shardCount, json.loads(spiderArgs), json.loads(settings)
+
+    # Claim a pending shard, or one whose lease expired
+    def claim(self, worker: str, lease: float) -> Optional[int]:
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.db.execute('''
+                SELECT id FROM shards
+                WHERE state = 'pending' OR (state = 'claimed' AND claimedAt < ?)
+                ORDER BY id LIMIT 1
+            ''', (now - lease,)).fetchone()
+            if row is None:
+                return None
+
+            self.db.execute('''
+                UPDATE shards SET state = 'claimed', worker = ?, claimedAt = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker, now, row[0]))
+            return row[0]
+        finally:
+            self.db.execute('COMMIT')
+
+    # Record the output of a shard, unless the lease went to another worker meanwhile
+    def complete(self, shard: int, worker: str, output: str) -> bool:
+        cursor = self.db.execute('''
+            UPDATE shards SET state = 'done', output = ?
+            WHERE id = ? AND state = 'claimed' AND worker = ?
+        ''', (output, shard, worker))
+        return cursor.rowcount == 1
+
+    # Hand a shard back after a failed attempt, it fails for good after maxAttempts
+    def release(self, shard: int, worker: str, maxAttempts: int) -> None:
+        self.db.execute('''
+            UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL
+            WHERE id = ? AND state = 'claimed' AND worker = ?
+        ''', (maxAttempts, shard, worker))
+
+    # Number of shards by state
+    def counts(self) -> Dict[str, int]:
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM shards GROUP BY state').fetchall())
+
+    def outputs(self) -> List[str]:
+        return [
+            output
+            for output, in self.db.execute("SELECT output FROM shards WHERE state = 'done' ORDER BY id")
+        ]
+
+    def close(self) -> None:
+        self.db.close()
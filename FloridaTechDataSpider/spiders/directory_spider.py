@@ -0,0 +1,176 @@
+from typing import Optional
+
+import scrapy
+from scrapy.extensions.feedexport import ItemFilter
+
+
+# Route items to their feed, employees are the ones with a department code
+class DepartmentFilter(ItemFilter):
+    def accepts(self, item) -> bool:
+        return 'departmentCode' not in item
+
+
+class EmployeeFilter(ItemFilter):
+    def accepts(self, item) -> bool:
+        return 'departmentCode' in item
+
+
+class DirectorySpider(scrapy.Spider):
+    name = 'directory'
+    allowed_domains = ['directory.fit.edu']
+    start_urls = ['https://directory.fit.edu/department']
+
+    custom_settings = {
+        'FEEDS': {
+            '_department.raw.json': {
+                'format': 'json',
+                'overwrite': True,
+                'item_filter': DepartmentFilter
+            },
+            '_employee.raw.json': {
+                'format': 'json',
+                'overwrite': True,
+                'item_filter': EmployeeFilter
+            }
+        }
+    }
+
+    departmentAttributes = [
+        {
+            'header': 'Phone',
+            'xpath': 'a/text()',
+            'key': 'phone'
+        }, {
+            'header': 'Fax',
+            'xpath': 'text()',
+            'key': 'fax'
+        }, {
+            'header': 'Email',
+            'xpath': 'a/text()',
+            'key': 'email'
+        }, {
+            'header': 'Website',
+            'xpath': 'a/text()',
+            'key': 'website'
+        }, {
+            'header': 'Primary Location',
+            'xpath': 'text()',
+            'key': 'primaryLocation'
+        }
+    ]
+
+    employeeAttributes = [
+        {
+            'key': 'name',
+            'xpath': 'td[1]/div[@class="name"]/b/text()'
+        }, {
+            'key': 'title',
+            'xpath': 'td[1]/div[@class="title"]/text()'
+        }, {
+            'key': 'email',
+            'xpath': 'td[2]/div[@class="email"]/a/text()'
+        }, {
+            'key': 'phone',
+            'xpath': 'td[2]/div[@class="phone"]/a/text()'
+        }, {
+            'key': 'building',
+            'xpath': 'td[3]/div[@class="building"]/text()'
+        }, {
+            'key': 'room',
+            'xpath': 'td[3]/div[@class="room"]/text()'
+        }
+    ]
+
+    # Goto each department page
+    def parse(self, response: scrapy.http.TextResponse):
+        departmentUrls = response.xpath('''
+            //div[@class="twelve wide column"]
+            /div[@class="ui list"]
+            /a[@class="item"]
+            /@href
+        ''').getall()
+        # print(departmentUrls)
+
+        yield from response.follow_all(departmentUrls, callback=self.parseDepartment)
+
+    # A department page has the department in the first table and its employees in the second
+    def parseDepartment(self, response: scrapy.http.TextResponse):
+        departmentCode = response.url[
+            len('https://directory.fit.edu/department/'):
+        ]
+
+        yield self.parseDepartmentTable(response, departmentCode)
+        yield from self.parseEmployeeTable(response, departmentCode)
+
+    def parseDepartmentTable(self, response: scrapy.http.TextResponse, departmentCode: str) -> dict:
+        # It's not guaranteed all fields are present on the page
+        headers = response.xpath('''
+            //div[@class="twelve wide column"]
+            /table[@class="ui celled table" and position()=1]
+            //th
+            /text()
+        ''').getall()
+        # print(headers)
+
+        tdTags = response.xpath('''
+            //div[@class="twelve wide column"]
+            /table[@class="ui celled table" and position()=1]
+            //td
+        ''')
+        # print(data)
+
+        name: str = response.xpath('''
+            //div[@class="twelve wide column"]
+            /h2
+            /text()
+        ''').get()
+
+        department = {
+            'name': name,
+            'code': departmentCode
+        }
+
+        for attribute in self.departmentAttributes:
+            header: str = attribute['header']
+            xpath: str = attribute['xpath']
+            key: str = attribute['key']
+
+            # If we don't see the header, set field to default value
+            if header not in headers:
+                department[key] = None
+                continue
+
+            # Otherwise extract the string
+            index = headers.index(header)
+            value = tdTags[index].xpath(xpath).get()
+            department[key] = value
+
+        # print(department)
+        return department
+
+    def parseEmployeeTable(self, response: scrapy.http.TextResponse, departmentCode: str):
+        employeeRows = response.xpath('''
+            //div[@class="twelve wide column"]
+            /table[@class="ui celled table" and position()=2]
+            /tr
+        ''')
+
+        for employeeRow in employeeRows:
+            employee = {
+                'departmentCode': departmentCode
+            }
+
+            for attribute in self.employeeAttributes:
+                key: str = attribute['key']
+                xpath: str = attribute['xpath']
+
+                value: Optional[str] = employeeRow.xpath(xpath).get()
+                employee[key] = value
+
+            # If room starts with 'Room: ', trim it
+            room: Optional[str] = employee['room']
+            if room is not None and room.startswith('Room: '):
+                employee['room'] = room[len('Room: '):]
+
+            # print(employee)
+            yield employee
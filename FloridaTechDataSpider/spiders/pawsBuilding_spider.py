@@ -1,95 +1,140 @@
-import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 import scrapy
 
+from ..producers import BoundedStartRequests, RecordFile, iterJsonArray
+from ..terms import parseTermIn
+from .pawsSection_spider import SEARCH_TABLE
 
-class PawsBuildingSpider(scrapy.Spider):
+
+class PawsBuildingSpider(BoundedStartRequests, scrapy.Spider):
     name = 'pawsBuilding'
     allowed_domains = ['nssb-p.adm.fit.edu']
 
-    def start_requests(self):
-        courses: list = json.load(open('course.json', 'r'))
-        sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    # A listing is skipped once responses to earlier ones confirm its buildings, so listings are only taken
+    # as many at a time as CONCURRENT_REQUESTS_PER_DOMAIN, the default watermark schedules them all before any response
+    custom_settings = {
+        'START_REQUESTS_WATERMARK': 4
+    }
+
+    # A building name is trusted once this many rows agree on it
+    # Subjects whose buildings are all trusted are not requested
+    confirmations: int = 3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.confirmations = int(self.confirmations)
+
+        # Building code -> building name -> number of rows with that name
+        self.buildingNames: Dict[str, Dict[str, int]] = {}
+
+    def isConfirmed(self, buildingCode: str) -> bool:
+        return max(self.buildingNames.get(buildingCode, {}).values(), default=0) >= self.confirmations
+
+    def produceRequests(self):
+        # Requests only carry section indices, sections are read again on response
+        # Section ids of course.json are positions among the sections in scope, like in util.loadSections
+        self.sections = RecordFile('_pawsSection.raw.json', lambda index, section: index)
+        # Section id -> (offset, length) of the section in the file
+        self.sectionSpans: List[Tuple[int, int]] = []
+        for _, span, section in self.sections.scan():
+            if self.scope.hasSection(section):
+                self.sectionSpans.append(span)
+
+        # Listing of a whole subject in a term, with the indices of its sections
+        subjectSectionIds: Dict[Tuple[str, str], List[int]] = {}
+        for _, _, course in iterJsonArray('course.json'):
+            if not self.inScope(course):
+                continue
 
-        for course in courses:
             subject: str = course['subject']
-            courseNumber: int = course['course']
             semesterId: int = course['semesterId']
             year: int = course['year']
             sectionIds: list = course['sectionIds']
 
             termIn = f'{year}{["01", "05", "08"][semesterId]}'
-            pawsUrl = f'https://nssb-p.adm.fit.edu/prod/bwckctlg.p_disp_listcrse?term_in={termIn}&subj_in={subject}&crse_in={courseNumber}&schd_in='
+            subjectSectionIds.setdefault((termIn, subject), []).extend(sectionIds)
+
+        # Listings of the most recent terms first
+        for (termIn, subject), sectionIds in sorted(subjectSectionIds.items(), key=lambda item: -self.termRecency.priority(parseTermIn(item[0][0]))):
+            # Skip the subject if every building it uses is already known
+            # Start requests are taken a few at a time, see custom_settings, so this sees responses of earlier subjects
+            buildingCodes: Set[str] = {
+                place[0]
+                for crnPlaces in self.getPlaces(sectionIds).values()
+                for place in crnPlaces
+                if place[1] is not None
+            }
+            if all(self.isConfirmed(buildingCode) for buildingCode in buildingCodes):
+                self.crawler.stats.inc_value('pawsBuilding/skipped')
+                continue
+
+            pawsUrl = f'https://nssb-p.adm.fit.edu/prod/bwckctlg.p_disp_listcrse?term_in={termIn}&subj_in={subject}&crse_in=&schd_in='
 
             yield scrapy.Request(
                 pawsUrl,
                 callback=self.parseBuilding,
                 cb_kwargs={
-                    'sections': [sections[index] for index in sectionIds],
-                    'course': course
-                }
+                    'sectionIds': sectionIds
+                },
+                meta={'stop_after_table': SEARCH_TABLE},
+                priority=self.termRecency.priority(parseTermIn(termIn))
             )
 
-    def parseBuilding(self, response: scrapy.http.TextResponse, sections: List[dict], course: dict):
-        # print(response.url)
+    def isInScope(self, course: dict) -> bool:
+        return self.scope.hasCourse(course)
 
-        tableData = response.xpath('''
-            //table[@class="datadisplaytable" and @summary="This layout table is used to present the sections found"]
-            //td[@class="dddefault"]
-            /table[@class="datadisplaytable" and @summary="This table lists the scheduled meeting times and assigned instructors for this class.."]
-        ''')
-        # print(tableData)
+    # Places of the sections keyed by crn
+    def getPlaces(self, sectionIds: List[int]) -> Dict[int, list]:
+        places = {}
+        for sectionId in sectionIds:
+            section = self.sections.read(self.sectionSpans[sectionId])
+            places[section['crn']] = section['places']
+
+        return places
 
-        # Using the reverse & pop method
-        tableData.reverse()
+    def parseBuilding(self, response: scrapy.http.TextResponse, sectionIds: List[int]):
+        # print(response.url)
+
+        places = self.getPlaces(sectionIds)
 
         titles = response.xpath('''
             //table[@class="datadisplaytable" and @summary="This layout table is used to present the sections found"]
             //th[@class="ddtitle" and @scope="colgroup"]
-            /a
-            /text()
-        ''').getall()
-        # print(titles)
-
-        # Some titles have '-' in them, so it's only possible to count backwards to get crn
-        # For example:
-        # 'Spc Topics in Chem Engr 1 - TOPIC: Biomaterials - 26537 - CHE 4591 - 01'
-        # 'Flight 4 CP-AMEL - 26920 - AVF 2102 - 29
-        # 'Flt Instructor-Airplane - 53802 - AVF 3001 - 05'
-        # 'Human Fact in Man-Mach Systems - 80507 - AHF 5101 - 01'
-        crns = [
-            int(title.split('-')[-3].strip())
-            for title in titles
-        ]
-        # print(crns)
-
-        # Abort operation if some sections do not have table
-        if len(tableData) != len(crns):
-            print(f'Warning: {course["subject"]} {course["course"]} skipped because some sections do not have schedule table. Expected {len(crns)} tables, got {len(tableData)}.')
-            return
-
-        for crn in crns:
-            locations: list = tableData.pop().xpath('''
+        ''')
+
+        for title in titles:
+            # Some titles have '-' in them, so it's only possible to count backwards to get crn
+            # For example:
+            # 'Spc Topics in Chem Engr 1 - TOPIC: Biomaterials - 26537 - CHE 4591 - 01'
+            # 'Flight 4 CP-AMEL - 26920 - AVF 2102 - 29
+            # 'Flt Instructor-Airplane - 53802 - AVF 3001 - 05'
+            # 'Human Fact in Man-Mach Systems - 80507 - AHF 5101 - 01'
+            crn = int(title.xpath('a/text()').get().split('-')[-3].strip())
+
+            # Skip if the section is unknown or there is no places
+            crnPlaces: Optional[list] = places.get(crn)
+            if crnPlaces is None:
+                continue
+
+            # The schedule table is in the row right below the title
+            tableData = title.xpath('''
+                ../following-sibling::tr[1]
+                /td[@class="dddefault"]
+                /table[@class="datadisplaytable" and @summary="This table lists the scheduled meeting times and assigned instructors for this class.."]
+            ''')
+            if len(tableData) == 0:
+                print(f'Warning: {crn} skipped because it does not have schedule table.')
+                continue
+
+            locations: List[str] = tableData[0].xpath('''
                 ./tr[position()>1]
                 /td[@class="dddefault" and position()=4]
                 /text()
             ''').getall()
 
-            # Find places of the section
-            # The order showed on the page may be different from the order in the data file
-            places = None
-            for section in sections:
-                if section['crn'] == crn:
-                    places: list = section['places']
-                    break
-
-            # Skip if there is no places
-            if places is None:
-                continue
-
             # Enumerate place and location to find matches
-            for place in places:
+            for place in crnPlaces:
                 buildingCode: str = place[0]
                 room: Optional[str] = place[1]
 
@@ -106,12 +151,17 @@ class PawsBuildingSpider(scrapy.Spider):
                     else:
                         buildingName = location
 
-                    yield {
-                        'code': buildingCode,
-                        'name': buildingName
-                    }
+                    # Each pair is yielded once, repeats only count towards confirmation
+                    names = self.buildingNames.setdefault(buildingCode, {})
+                    if buildingName not in names:
+                        yield {
+                            'code': buildingCode,
+                            'name': buildingName
+                        }
+                    names[buildingName] = names.get(buildingName, 0) + 1
+
                     yielded = True
                     break
 
                 if not yielded:
-                    print(f'Warning: {crn} did not yield because {locations} and {places} do not match.')
+                    print(f'Warning: {crn} did not yield because {locations} and {crnPlaces} do not match.')
@@ -1,8 +1,15 @@
-import json
+import copy
 import re
-from typing import List, Callable
+from typing import Callable, Dict, List, Optional
+
 import scrapy
 
+from ..parsing import ParsePool
+from ..producers import BoundedStartRequests, Checkpoint, RecordFile
+
+
+# Summary of the table parsed on catalog pages, their download stops after it
+CATALOG_TABLE = 'This table lists the course detail for the selected term.'
 
 LECTURE_HOURS_RE = re.compile(
     pattern=r'([\d.]+)\s+Lecture hours',
@@ -125,7 +132,60 @@ def parseCourseAttributes(line: str, lines: list, course: dict) -> None:
     course['courseAttributes'] = courseAttributes
 
 
-class PawsCourseSpider(scrapy.Spider):
+# Courses are identified by subject, number, campus and term
+def courseKey(course: dict) -> tuple:
+    return (course['subject'], course['course'], course['campusId'], course['semesterId'], course['year'])
+
+
+# Catalog data of a course from its catalog page
+# Runs in the parse pool, so it only looks at the page, see FloridaTechDataSpider.parsing
+def parseCatalogPage(response: scrapy.http.TextResponse, courseAttributes: List[dict]) -> dict:
+    # Get all lines of texts on the page
+    lines: List[str] = response.xpath('''
+        //table[@class="datadisplaytable" and @summary="This table lists the course detail for the selected term."]
+        //td[@class="ntdefault"]
+        //text()
+    ''').getall()
+
+    # Strip all lines
+    lines = [
+        line.strip()
+        for line in lines
+    ]
+
+    # Using the 'Reverse & Pop' mechanism to process data
+    lines.reverse()
+
+    # Fill catalog data with default data
+    catalog = {
+        attribute['key']: attribute['default']
+        for attribute in courseAttributes
+    }
+
+    # Process lines
+    while lines != []:
+        line: str = lines.pop()
+
+        # Skip empty lines
+        if line == '':
+            continue
+
+        # Call parse functions on the line
+        for attribute in courseAttributes:
+            key: str = attribute['key']
+            parseFn: Callable[[str, List[str], dict], None] = attribute['parseFn']
+            default = attribute['default']
+
+            # If the value is still default, call parse function to update the catalog data
+            # Parse function will change the catalog data if the line is for the function
+            # Otherwise it does nothing
+            if catalog[key] == default:
+                parseFn(line, lines, catalog)
+
+    return catalog
+
+
+class PawsCourseSpider(BoundedStartRequests, scrapy.Spider):
     name = 'pawsCourse'
     allowed_domains = ['nssb-p.adm.fit.edu']
 
@@ -161,9 +221,57 @@ class PawsCourseSpider(scrapy.Spider):
         }
     ]
 
-    def start_requests(self):
-        courses: list = json.load(open('course.json', 'r'))
-        for course in courses:
+    # Checkpoint file of scraped courses, a crashed run resumes from it
+    checkpoint: Optional[str] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Requests only carry course indices, courses are read again on response
+        self.courses = RecordFile('course.json', lambda index, course: index)
+        self.completed: Optional[Checkpoint] = None
+
+    # One item per course of course.json
+    def expectedItems(self) -> Optional[int]:
+        return self.countRecords(self.courses.path, self.shardKey)
+
+    def isInScope(self, course: dict) -> bool:
+        return self.scope.hasCourse(course)
+
+    # Courses sharing a catalog page stay in the same shard
+    def shardKey(self, course: dict) -> tuple:
+        return (course['subject'], course['course'], course['semesterId'], course['year'])
+
+    def isCompleted(self, course: dict) -> bool:
+        return self.completed is not None and courseKey(course) in self.completed
+
+    def produceRequests(self):
+        # Courses of a crashed run are emitted again from the checkpoint
+        if self.checkpoint is not None:
+            self.completed = Checkpoint(self.crawler, self.checkpoint, courseKey)
+            if len(self.completed) > 0:
+                yield scrapy.Request(
+                    'data:,',
+                    callback=self.parseCheckpoint,
+                    meta={'dont_cache': True},
+                    dont_filter=True
+                )
+
+        # The catalog page does not depend on campus, so courses offered on
+        # several campuses share one request
+        courseIdsByUrl: Dict[str, List[int]] = {}
+        priorities: Dict[str, int] = {}
+        for courseId, course in self.courses:
+            if not self.inScope(course):
+                continue
+
+            if not self.inShard(self.shardKey(course)):
+                continue
+
+            if self.isCompleted(course):
+                self.crawler.stats.inc_value('checkpoint/skipped')
+                continue
+
             subject: str = course['subject']
             courseNumber: int = course['course']
             semesterId: int = course['semesterId']
@@ -173,59 +281,38 @@ class PawsCourseSpider(scrapy.Spider):
             pawsUrl = f'https://nssb-p.adm.fit.edu/prod/bwckctlg.p_disp_course_detail?cat_term_in={catTermIn}&subj_code_in={subject}&crse_numb_in={courseNumber}'
             # print(pawsUrl)
 
+            courseIdsByUrl.setdefault(pawsUrl, []).append(courseId)
+            priorities[pawsUrl] = self.termRecency.priority((year, semesterId))
+
+        courseCount = sum(len(courseIds) for courseIds in courseIdsByUrl.values())
+        self.crawler.stats.set_value('pawsCourse/requests_saved', courseCount - len(courseIdsByUrl))
+        self.logger.info(f'{len(courseIdsByUrl)} catalog requests for {courseCount} courses, {courseCount - len(courseIdsByUrl)} saved')
+
+        # Catalog pages of the most recent terms first
+        for pawsUrl, courseIds in sorted(courseIdsByUrl.items(), key=lambda item: -priorities[item[0]]):
             yield scrapy.Request(
                 pawsUrl,
                 callback=self.parsePawsCourse,
                 cb_kwargs={
-                    'course': course
+                    'courseIds': courseIds
                 },
+                meta={'stop_after_table': CATALOG_TABLE},
+                priority=priorities[pawsUrl],
                 dont_filter=True
             )
 
-    def parsePawsCourse(self, response: scrapy.http.TextResponse, course: dict) -> None:
-        # print(response.url)
+    def parseCheckpoint(self, response: scrapy.http.Response):
+        yield from self.completed.replay()
 
-        # Get all lines of texts on the page
-        lines: List[str] = response.xpath('''
-            //table[@class="datadisplaytable" and @summary="This table lists the course detail for the selected term."]
-            //td[@class="ntdefault"]
-            //text()
-        ''').getall()
-
-        # Strip all lines
-        lines = [
-            line.strip()
-            for line in lines
-        ]
-
-        # Using the 'Reverse & Pop' mechanism to process data
-        lines.reverse()
-
-        # Fill course with default data
-        course.update({
-            attribute['key']: attribute['default']
-            for attribute in self.courseAttributes
-        })
-
-        # Process lines
-        while lines != []:
-            line: str = lines.pop()
-
-            # Skip empty lines
-            if line == '':
-                continue
+    async def parsePawsCourse(self, response: scrapy.http.TextResponse, courseIds: List[int]) -> None:
+        # print(response.url)
 
-            # Call parse functions on the line
-            for attribute in self.courseAttributes:
-                key: str = attribute['key']
-                parseFn: Callable[[str, List[str], dict], None] = attribute['parseFn']
-                default = attribute['default']
+        catalog = await ParsePool.of(self.crawler).parse(parseCatalogPage, response, self.courseAttributes)
 
-                # If the value is still default, call parse function to update the course
-                # Parse function will change the course if the line is for the function
-                # Otherwise it does nothing
-                if course[key] == default:
-                    parseFn(line, lines, course)
+        # Fan out to every campus offering the course
+        for courseId in courseIds:
+            course = self.courses.get(courseId)
+            course.update(copy.deepcopy(catalog))
 
-        # print(course)
-        yield course
+            # print(course)
+            yield course
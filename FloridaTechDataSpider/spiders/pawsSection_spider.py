@@ -1,8 +1,17 @@
+import hashlib
 import json
+import random
 import re
-from typing import Callable, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+
+from ..parsing import ParsePool
+from ..producers import BoundedStartRequests, Checkpoint, RecordFile
+from ..terms import SEMESTERS, Term
+from .section_spider import SectionSpider
 
 
 def parseLevels(lines: List[str], section: dict) -> None:
@@ -110,7 +119,70 @@ def parseCorequisites(lines: List[str], section: dict) -> None:
     section['corequisites'] = corequisites
 
 
-class PawsSectionSpider(scrapy.Spider):
+# Fill section from the text lines of its PAWS table
+def fillSection(lines: List[str], sectionAttributes: List[dict], section: dict) -> None:
+    # Strip all lines
+    lines = [
+        line.strip()
+        for line in lines
+    ]
+
+    # Using the 'Reverse & Pop' mechanism to process data
+    lines.reverse()
+
+    # Fill section with default data
+    section.update({
+        attribute['key']: attribute['default']
+        for attribute in sectionAttributes
+    })
+
+    # Process lines
+    while lines != []:
+        line: str = lines.pop()
+
+        # Skip empty lines
+        if line == '':
+            continue
+
+        # Try to match the line with one of the attrs
+        for attribute in sectionAttributes:
+            parseFn: Callable[[List[str], dict], None] = attribute['parseFn']
+            header: str = attribute['header']
+
+            # Process attr if header matches
+            if line == header:
+                parseFn(lines, section)
+
+
+# PAWS attributes of a section from its detail page
+# Runs in the parse pool, so it only looks at the page, see FloridaTechDataSpider.parsing
+def parseDetailPage(response: scrapy.http.TextResponse, sectionAttributes: List[dict]) -> dict:
+    # Get all lines of texts on the page
+    lines: List[str] = response.xpath('''
+        //table[@class="datadisplaytable" and @summary="This table is used to present the detailed class information."]
+        //td[@class="dddefault"]
+        //text()
+    ''').getall()
+
+    attributes = {}
+    fillSection(lines, sectionAttributes, attributes)
+    return attributes
+
+
+# Summaries of the tables parsed on detail and listing pages, their download stops after them
+DETAIL_TABLE = 'This table is used to present the detailed class information.'
+SEARCH_TABLE = 'This layout table is used to present the sections found'
+
+
+# Sections are identified by term and crn
+SectionKey = Tuple[int, str, int]
+
+
+def sectionKey(section: dict) -> SectionKey:
+    return (section['year'], section['semester'], section['crn'])
+
+
+class PawsSectionSpider(BoundedStartRequests, scrapy.Spider):
     name = 'pawsSection'
     allowed_domains = ['nssb-p.adm.fit.edu']
 
@@ -148,71 +220,264 @@ class PawsSectionSpider(scrapy.Spider):
         }
     ]
 
-    def start_requests(self):
-        # Convertion from semester text to code
-        term = {'spring': '01', 'summer': '05', 'fall': '08'}
+    # Incremental mode
+    # previous: path to the output of the last complete run
+    # resample: fraction of unchanged sections that are fetched anyway to detect drift on PAWS
+    previous: Optional[str] = None
+    resample: float = 0.0
 
-        sections: list = json.load(open('_section.raw.json', 'r'))
-        for section in sections:
-            year: int = section['year']
-            semester: str = section['semester']
-            crn: int = section['crn']
-
-            # Construct URL
-            termIn = f'{year}{term[semester]}'
-            pawsUrl = f'https://nssb-p.adm.fit.edu/prod/bwckschd.p_disp_detail_sched?term_in={termIn}&crn_in={crn}'
-            # print(pawsUrl)
-
-            # Goto each section's PAWS page to collect data
-            yield scrapy.Request(
-                pawsUrl,
-                callback=self.parsePawsSection,
-                cb_kwargs={
-                    'section': section
-                }
-            )
-
-    def parsePawsSection(self, response: scrapy.http.Response, section: dict) -> None:
-        # print(response.url)
+    # Streaming mode: sections are pushed through feedSection instead of read from _section.raw.json
+    # It is used by crawl.py to fetch PAWS while SectionSpider is still running
+    streaming: bool = False
 
-        # Get all lines of texts on the page
-        lines: List[str] = response.xpath('''
-            //table[@class="datadisplaytable" and @summary="This table is used to present the detailed class information."]
-            //td[@class="dddefault"]
-            //text()
-        ''').getall()
-
-        # Strip all lines
-        lines = [
-            line.strip()
-            for line in lines
-        ]
-
-        # Using the 'Reverse & Pop' mechanism to process data
-        lines.reverse()
-
-        # Fill section with default data
-        section.update({
-            attribute['key']: attribute['default']
-            for attribute in self.sectionAttributes
-        })
+    # Reused sections are emitted in batches of this size
+    reuseBatchSize = 500
+
+    # Checkpoint file of scraped sections, a crashed run resumes from it
+    checkpoint: Optional[str] = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spiderIdle, signal=signals.spider_idle)
+        return spider
 
-        # Process lines
-        while lines != []:
-            line: str = lines.pop()
+    # Fields that come from the apps.fit.edu row of the section
+    rowKeys = ['location', 'semester', 'year'] + [
+        attribute['key']
+        for attribute in SectionSpider.sectionAttributes
+    ]
 
-            # Skip empty lines
-            if line == '':
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resample = float(self.resample)
+        self.streaming = self.streaming not in (False, '0', 'false', 'False')
+        self.feedFinished = False
+        self.fedSections = 0
+
+        # Requests only carry section keys, sections are looked up again on response
+        # They come from _section.raw.json, or from memory while streaming
+        self.sections = RecordFile('_section.raw.json', lambda index, section: sectionKey(section))
+        self.streamedSections: Dict[SectionKey, dict] = {}
+        self.previousSections: Optional[RecordFile] = None
+        self.reusedKeys: List[SectionKey] = []
+        self.completed: Optional[Checkpoint] = None
+
+    # Fingerprint of the apps.fit.edu row
+    # Sections are compared after a JSON round trip, so tuples and lists look the same
+    def fingerprint(self, section: dict) -> str:
+        row = {key: section[key] for key in self.rowKeys}
+        return hashlib.sha1(json.dumps(row, sort_keys=True).encode()).hexdigest()
+
+    # Index sections of the last run by term and CRN
+    def loadPreviousSections(self) -> Optional[RecordFile]:
+        if self.previous is None:
+            return None
+
+        try:
+            return RecordFile(self.previous, lambda index, section: sectionKey(section)).index()
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Incremental mode disabled, cannot load {self.previous}: {e}')
+            return None
+
+    def getSection(self, key: SectionKey) -> dict:
+        if key in self.streamedSections:
+            return self.streamedSections.pop(key)
+
+        return self.sections.get(key)
+
+    def getPreviousSection(self, key: SectionKey) -> Optional[dict]:
+        if self.previousSections is None:
+            return None
+
+        return self.previousSections.get(key)
+
+    # Decide whether the PAWS fields of the last run can be reused for the section
+    # Returns whether the section was reused, and whether it is resampled
+    def reuseSection(self, section: dict) -> Tuple[bool, bool]:
+        stats = self.crawler.stats
+
+        # Reuse PAWS fields of the last run if the row did not change
+        previousSection: Optional[dict] = self.getPreviousSection(sectionKey(section))
+        if previousSection is None:
+            stats.inc_value('incremental/new')
+        elif self.fingerprint(previousSection) != self.fingerprint(section):
+            stats.inc_value('incremental/changed')
+        elif random.random() < self.resample:
+            stats.inc_value('incremental/resampled')
+            return False, True
+        else:
+            stats.inc_value('incremental/reused')
+            self.reusedKeys.append(sectionKey(section))
+            return True, False
+
+        return False, False
+
+    def isCompleted(self, key: SectionKey) -> bool:
+        if self.completed is None or key not in self.completed:
+            return False
+
+        self.crawler.stats.inc_value('checkpoint/skipped')
+        return True
+
+    def produceRequests(self):
+        self.previousSections = self.loadPreviousSections()
+
+        # Sections of a crashed run are emitted again from the checkpoint
+        if self.checkpoint is not None:
+            self.completed = Checkpoint(self.crawler, self.checkpoint, sectionKey)
+            if len(self.completed) > 0:
+                yield scrapy.Request(
+                    'data:,',
+                    callback=self.parseCheckpoint,
+                    meta={'dont_cache': True},
+                    dont_filter=True
+                )
+
+        # Sections arrive through feedSection
+        if self.streaming:
+            return
+
+        for key, section in self.recentFirst(self.sections, self.termOf):
+            if not self.inScope(section):
                 continue
 
-            # Try to match the line with one of the attrs
-            for attribute in self.sectionAttributes:
-                parseFn: Callable[[List[str], dict], None] = attribute['parseFn']
-                header: str = attribute['header']
+            if not self.inShard(self.shardKey(section)):
+                continue
+
+            if self.isCompleted(key):
+                continue
+
+            reused, resampled = self.reuseSection(section)
+            if reused:
+                if len(self.reusedKeys) >= self.reuseBatchSize:
+                    yield self.reusedSectionsRequest()
+                continue
+
+            yield self.detailRequest(key, resampled)
+
+        if self.reusedKeys != []:
+            yield self.reusedSectionsRequest()
+
+    # Streaming mode: called with each section as soon as SectionSpider scrapes it
+    def feedSection(self, section: dict) -> None:
+        if not self.inScope(section):
+            return
+
+        self.fedSections += 1
+        key = sectionKey(section)
+        if self.isCompleted(key):
+            return
+
+        self.streamedSections[key] = dict(section)
+
+        reused, resampled = self.reuseSection(section)
+        if not reused:
+            self.crawler.engine.crawl(self.detailRequest(key, resampled))
+        elif len(self.reusedKeys) >= self.reuseBatchSize:
+            self.crawler.engine.crawl(self.reusedSectionsRequest())
+
+    # One item per section, streamed sections are only all known once SectionSpider is done
+    def expectedItems(self) -> Optional[int]:
+        if self.streaming:
+            return self.fedSections if self.feedFinished else None
+
+        return self.countRecords(self.sections.path, self.shardKey)
+
+    # Streaming mode: called when SectionSpider is done
+    def finishFeed(self) -> None:
+        self.feedFinished = True
+        if self.reusedKeys != []:
+            self.crawler.engine.crawl(self.reusedSectionsRequest())
+
+    # Keep the spider open while sections are still coming
+    def spiderIdle(self, spider):
+        if self.streaming and not self.feedFinished:
+            raise DontCloseSpider
+
+    # Emit reused sections without touching the network
+    def reusedSectionsRequest(self) -> scrapy.Request:
+        keys, self.reusedKeys = self.reusedKeys, []
+        return scrapy.Request(
+            'data:,',
+            callback=self.parseReusedSections,
+            cb_kwargs={
+                'keys': keys
+            },
+            meta={'dont_cache': True},
+            dont_filter=True
+        )
+
+    def isInScope(self, section: dict) -> bool:
+        return self.scope.hasSection(section)
+
+    # Sections of a subject in a term stay in the same shard
+    def shardKey(self, section: dict) -> tuple:
+        return (self.termIn(section), section['course'][0])
+
+    def termOf(self, section: dict) -> Term:
+        return (section['year'], SEMESTERS.index(section['semester']))
+
+    def termIn(self, section: dict) -> str:
+        # Convertion from semester text to code
+        term = {'spring': '01', 'summer': '05', 'fall': '08'}
+        return f'{section["year"]}{term[section["semester"]]}'
+
+    def detailRequest(self, key: SectionKey, resampled: bool) -> scrapy.Request:
+        year, semester, crn = key
+
+        # Construct URL
+        termIn = self.termIn({'year': year, 'semester': semester})
+        pawsUrl = f'https://nssb-p.adm.fit.edu/prod/bwckschd.p_disp_detail_sched?term_in={termIn}&crn_in={crn}'
+        # print(pawsUrl)
+
+        # Goto each section's PAWS page to collect data
+        return scrapy.Request(
+            pawsUrl,
+            callback=self.parsePawsSection,
+            cb_kwargs={
+                'key': key,
+                'resampled': resampled
+            },
+            meta={'stop_after_table': DETAIL_TABLE},
+            priority=self.termRecency.priority((year, SEMESTERS.index(semester)))
+        )
+
+    def parseCheckpoint(self, response: scrapy.http.Response):
+        yield from self.completed.replay()
+
+    def parseReusedSections(self, response: scrapy.http.Response, keys: List[SectionKey]):
+        for key in keys:
+            section = self.getSection(key)
+            previousSection = self.getPreviousSection(key)
+            section.update({
+                attribute['key']: previousSection[attribute['key']]
+                for attribute in self.sectionAttributes
+            })
+            yield section
+
+    # A resampled section is expected to match the last run
+    def checkDrift(self, section: dict, previousSection: Optional[dict]) -> None:
+        if previousSection is None:
+            return
+
+        drifted = any(
+            json.dumps(section[attribute['key']]) != json.dumps(previousSection[attribute['key']])
+            for attribute in self.sectionAttributes
+        )
+        if drifted:
+            self.crawler.stats.inc_value('incremental/drifted')
+            self.logger.warning(f'{section["crn"]} changed on PAWS although its row did not')
+
+    async def parsePawsSection(self, response: scrapy.http.Response, key: SectionKey, resampled: bool = False) -> None:
+        # print(response.url)
+
+        attributes = await ParsePool.of(self.crawler).parse(parseDetailPage, response, self.sectionAttributes)
 
-                # Process attr if header matches
-                if line == header:
-                    parseFn(lines, section)
+        section = self.getSection(key)
+        section.update(attributes)
+        if resampled:
+            self.checkDrift(section, self.getPreviousSection(key))
 
         # print(section)
         yield section
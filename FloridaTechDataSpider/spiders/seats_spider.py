@@ -0,0 +1,291 @@
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet import reactor
+from w3lib.url import url_query_parameter
+
+from ..parsing import ParsePool
+from ..producers import iterJsonArray
+from ..scope import Scope
+from ..seats import Sample, SeatStore
+from ..terms import SEMESTER_CODES, SEMESTERS, Term, findTerm
+from .pawsSection_spider import DETAIL_TABLE
+from .section_spider import SectionSpider, parseCap
+
+
+# Page numbers in the pagination, term and (crn, enrolled, cap) of each row
+# Only the CRN and Cap columns are read, see parseSectionPage for the whole table
+# Runs in the parse pool, so it only looks at the page, see FloridaTechDataSpider.parsing
+def parseSeatPage(response: scrapy.http.TextResponse) -> Tuple[List[int], Optional[Term], List[Tuple[int, int, int]]]:
+    pageNumbers = [
+        int(url_query_parameter(response.urljoin(url), 'page'))
+        for url in response.xpath('''
+            //div[@class="thirteen wide column"]
+            /div[@class="ui pagination menu"]
+            /a
+            /@href
+        ''').getall()
+        if url_query_parameter(response.urljoin(url), 'page', '').isdigit()
+    ]
+
+    term = findTerm(response.xpath('''
+        //div[@class="thirteen wide column"]
+        /h2
+        /text()
+    ''').get(default=''))
+
+    headers = response.xpath('''
+        //table[@class="ui small compact celled table"]
+        //th
+        /text()
+    ''').getall()
+
+    if term is None or 'CRN' not in headers or 'Cap' not in headers:
+        return pageNumbers, term, []
+
+    crnColumn = headers.index('CRN')
+    capColumn = headers.index('Cap')
+
+    rows = []
+    for row in response.xpath('//table[@class="ui small compact celled table"]//tr[td]'):
+        tableData = row.xpath('td')
+        enrolled, cap = parseCap(tableData[capColumn])
+        rows.append((int(tableData[crnColumn].xpath('text()').get()), enrolled, cap))
+
+    return pageNumbers, term, rows
+
+
+# (Capacity, actual) of the seats and of the waitlist on a PAWS detail page, None if a row is missing
+def parseAvailability(response: scrapy.http.TextResponse) -> Dict[str, Optional[Tuple[int, int]]]:
+    availability = {'Seats': None, 'Waitlist Seats': None}
+
+    for row in response.xpath('''
+        //table[@class="datadisplaytable" and @summary="This layout table is used to present the seating numbers."]
+        /tr[th[@class="ddlabel"]]
+    '''):
+        label = ''.join(row.xpath('th//text()').getall()).strip()
+        values = [int(value) for value in row.xpath('td[@class="dddefault"]/text()').getall()]
+        if label in availability and len(values) >= 2:
+            availability[label] = (values[0], values[1])
+
+    return availability
+
+
+class SeatSpider(SectionSpider):
+    # Polls seat availability of the active terms into SEATS_DIR, see FloridaTechDataSpider.seats
+    # The first cycle walks the schedule like SectionSpider, the next ones request the pages it found directly
+    # PAWS detail pages are fetched for sections at least SEATS_HOT_FILL full or with a waitlist in every cycle,
+    # and for the others every SEATS_COLD_CYCLES cycles
+    # source: 'schedule' for apps.fit.edu only, 'paws' for PAWS only, or 'both'
+    # cycles: number of poll cycles, 0 polls until stopped
+    name = 'seats'
+    allowed_domains = ['apps.fit.edu', 'nssb-p.adm.fit.edu']
+
+    # Samples are the output, pages are neither cached nor archived
+    custom_settings = {
+        'CRAWL_TERMS': ['current'],
+        'HTTPCACHE_ENABLED': False,
+        'WARC_ARCHIVE_ENABLED': False,
+        'TRACE_ENABLED': False
+    }
+
+    source: str = 'both'
+    cycles: int = 0
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        settings = crawler.settings
+        spider.directory = settings.get('SEATS_DIR')
+        spider.interval = settings.getfloat('SEATS_POLL_INTERVAL')
+        spider.hotFill = settings.getfloat('SEATS_HOT_FILL')
+        spider.coldCycles = settings.getint('SEATS_COLD_CYCLES')
+        spider.heartbeat = settings.getfloat('SEATS_HEARTBEAT')
+        crawler.signals.connect(spider.spiderIdle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.closeStores, signal=signals.spider_closed)
+        return spider
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cycles = int(self.cycles)
+        if self.source not in ('schedule', 'paws', 'both'):
+            raise ValueError(f'Unknown source {self.source}, expected schedule, paws or both')
+
+        # Term code -> store
+        self.stores: Dict[str, SeatStore] = {}
+        # Crn -> term code, and the cycle its PAWS page was last fetched in
+        self.crns: Dict[int, str] = {}
+        self.pawsCycles: Dict[int, int] = {}
+
+        self.cycle = 0
+        self.cycleStart = 0.0
+        self.nextCycle = None
+        # (Semester URL, page number) requested in this cycle
+        self.cyclePages: Set[Tuple[str, int]] = set()
+        self.cycleCounts: Dict[str, int] = {}
+
+    def store(self, termIn: str) -> SeatStore:
+        if termIn not in self.stores:
+            self.stores[termIn] = SeatStore(os.path.join(self.directory, f'{termIn}.seats'), self.heartbeat)
+
+        return self.stores[termIn]
+
+    def record(self, termIn: str, sample: Sample) -> None:
+        self.cycleCounts['samples'] = self.cycleCounts.get('samples', 0) + 1
+        if self.store(termIn).add(sample):
+            self.cycleCounts['written'] = self.cycleCounts.get('written', 0) + 1
+            self.crawler.stats.inc_value('seats/samples_written')
+
+    def start_requests(self):
+        return self.startCycle()
+
+    def startCycle(self) -> List[scrapy.Request]:
+        self.cycle += 1
+        self.cycleStart = time.time()
+        self.nextCycle = None
+        self.cyclePages = set()
+        self.cycleCounts = {}
+        self.crawler.stats.inc_value('seats/cycles')
+
+        requests = []
+        if self.source != 'paws':
+            if self.lastPages == {}:
+                requests += [scrapy.Request(url, dont_filter=True) for url in self.start_urls]
+            else:
+                requests += [
+                    self.pageRequest(semesterUrl, page)
+                    for semesterUrl, lastPage in self.lastPages.items()
+                    for page in range(1, lastPage + 1)
+                ]
+
+        if self.source == 'paws':
+            if self.crns == {}:
+                self.loadCrns()
+            requests += [
+                self.availabilityRequest(crn, termIn)
+                for crn, termIn in self.crns.items()
+                if self.isPawsDue(crn, termIn)
+            ]
+
+        return requests
+
+    # Sections in scope in _section.raw.json, for PAWS only polling
+    def loadCrns(self) -> None:
+        scope = Scope.of(self.crawler)
+        for _, _, section in iterJsonArray('_section.raw.json'):
+            if scope.hasSection(section):
+                self.crns[section['crn']] = f'{section["year"]}{SEMESTER_CODES[SEMESTERS.index(section["semester"])]}'
+
+    # Sections filling up are polled in every cycle
+    def isPawsDue(self, crn: int, termIn: str) -> bool:
+        if crn not in self.pawsCycles:
+            return True
+
+        latest = self.store(termIn).latest.get(crn)
+        fillRate = None if latest is None else latest.fillRate()
+        if fillRate is None or fillRate >= self.hotFill or (latest is not None and latest.waitlisted > 0):
+            return True
+
+        return self.cycle - self.pawsCycles[crn] >= self.coldCycles
+
+    def pageRequest(self, semesterUrl: str, page: int) -> scrapy.Request:
+        self.cyclePages.add((semesterUrl, page))
+        return scrapy.Request(
+            self.pageUrl(semesterUrl, page),
+            callback=self.parseSectionTable,
+            meta={'dont_cache': True},
+            dont_filter=True
+        )
+
+    def availabilityRequest(self, crn: int, termIn: str) -> scrapy.Request:
+        self.pawsCycles[crn] = self.cycle
+        self.cycleCounts['paws'] = self.cycleCounts.get('paws', 0) + 1
+        return scrapy.Request(
+            f'https://nssb-p.adm.fit.edu/prod/bwckschd.p_disp_detail_sched?term_in={termIn}&crn_in={crn}',
+            callback=self.parseAvailability,
+            cb_kwargs={
+                'crn': crn,
+                'termIn': termIn
+            },
+            meta={'stop_after_table': DETAIL_TABLE, 'dont_cache': True},
+            dont_filter=True
+        )
+
+    def parseSemester(self, response: scrapy.http.TextResponse):
+        semesterUrl = response.url.split('?')[0]
+        self.lastPages.setdefault(semesterUrl, 1)
+        yield self.pageRequest(semesterUrl, 1)
+
+    # Every page of the semester is requested at once, pages past the last one known are added as they show up
+    async def parseSectionTable(self, response: scrapy.http.TextResponse):
+        semesterUrl = response.url.split('?')[0]
+        pageNumbers, term, rows = await ParsePool.of(self.crawler).parse(parseSeatPage, response)
+        self.cycleCounts['pages'] = self.cycleCounts.get('pages', 0) + 1
+
+        self.lastPages[semesterUrl] = max(self.lastPages.get(semesterUrl, 1), max(pageNumbers, default=1))
+        for page in range(1, self.lastPages[semesterUrl] + 1):
+            if (semesterUrl, page) not in self.cyclePages:
+                yield self.pageRequest(semesterUrl, page)
+
+        if term is None:
+            return
+
+        termIn = f'{term[0]}{SEMESTER_CODES[term[1]]}'
+        now = int(time.time())
+        for crn, enrolled, cap in rows:
+            self.crns[crn] = termIn
+            self.record(termIn, Sample(crn, now, enrolled, cap))
+
+            if self.source == 'both' and self.isPawsDue(crn, termIn):
+                yield self.availabilityRequest(crn, termIn)
+
+    def parseAvailability(self, response: scrapy.http.TextResponse, crn: int, termIn: str):
+        availability = parseAvailability(response)
+        seats = availability['Seats']
+        waitlist = availability['Waitlist Seats']
+        if seats is None and waitlist is None:
+            self.crawler.stats.inc_value('seats/paws_missing')
+            return
+
+        capacity, actual = seats or (-1, -1)
+        waitlistCap, waitlisted = waitlist or (-1, -1)
+        self.record(termIn, Sample(crn, int(time.time()), actual, capacity, waitlisted, waitlistCap))
+
+    # The cycle is over, wait for the next one
+    def spiderIdle(self, spider):
+        if self.nextCycle is not None:
+            raise DontCloseSpider
+
+        seconds = time.time() - self.cycleStart
+        for store in self.stores.values():
+            store.flush()
+
+        counts = self.cycleCounts
+        self.crawler.stats.set_value('seats/last_cycle_seconds', seconds)
+        self.crawler.stats.max_value('seats/max_cycle_seconds', seconds)
+        self.logger.warning(
+            f'Cycle {self.cycle}: {counts.get("pages", 0)} schedule pages, {counts.get("paws", 0)} PAWS pages, '
+            f'{counts.get("written", 0)} of {counts.get("samples", 0)} samples written in {seconds:.1f}s'
+        )
+
+        if self.cycles != 0 and self.cycle >= self.cycles:
+            return
+
+        delay = max(0.0, self.cycleStart + self.interval - time.time())
+        self.nextCycle = reactor.callLater(delay, self.crawlCycle)
+        raise DontCloseSpider
+
+    def crawlCycle(self) -> None:
+        for request in self.startCycle():
+            self.crawler.engine.crawl(request)
+
+    def closeStores(self, spider):
+        if self.nextCycle is not None and self.nextCycle.active():
+            self.nextCycle.cancel()
+
+        for store in self.stores.values():
+            store.close()
@@ -1,7 +1,14 @@
+import hashlib
+import json
 import re
 from typing import Dict, List, Optional, Tuple, Union
 
 import scrapy
+from w3lib.url import add_or_replace_parameter, url_query_parameter
+
+from ..parsing import ParsePool
+from ..scope import Scope
+from ..terms import SEMESTERS, TermRecency, findTerm
 
 
 def parseCourse(tableData: scrapy.Selector) -> Tuple[str, int]:
@@ -96,11 +103,141 @@ def parseCap(tableData: scrapy.Selector) -> Tuple[int, int]:
     )
 
 
+# Page numbers in the pagination, headers and sections of the table
+# Headers are None if the page is not about a semester
+# Runs in the parse pool, so it only looks at the page, see FloridaTechDataSpider.parsing
+def parseSectionPage(response: scrapy.http.TextResponse, sectionAttributes: List[dict]) -> Tuple[List[int], Optional[List[str]], List[dict]]:
+    pageNumbers = [
+        int(url_query_parameter(response.urljoin(url), 'page'))
+        for url in response.xpath('''
+            //div[@class="thirteen wide column"]
+            /div[@class="ui pagination menu"]
+            /a
+            /@href
+        ''').getall()
+        if url_query_parameter(response.urljoin(url), 'page', '').isdigit()
+    ]
+    # print(pageNumbers)
+
+    h2Text: str = response.xpath('''
+        //div[@class="thirteen wide column"]
+        /h2
+        /text()
+    ''').get()
+
+    # It happends when 'There are currently no available classes for this term.'
+    # For example, 'Fort Lee, VA Class Schedule: Summer' in June 2020
+    try:
+        triplet = re.match(  # AttributeError
+            r'(.+) Class Schedule: (spring|summer|fall) (\d{4})',
+            h2Text
+        ).groups()
+    except AttributeError:  # 'NoneType' object has no attribute 'groups'
+        return pageNumbers, None, []
+
+    location: str = triplet[0]
+    semester: str = triplet[1]
+    year = int(triplet[2])
+    # print(location, semester, year)
+
+    # Semesters and campuses can have different header
+    # Summer have 'session'
+    # Non-main campus have 'syllabus'
+    headers = response.xpath('''
+        //table[@class="ui small compact celled table"]
+        //th
+        /text()
+    ''').getall()
+    # print(headers)
+
+    # Take out every cell in a flattened array
+    sectionData = response.xpath('''
+        //table[@class="ui small compact celled table"]
+        //td
+    ''')
+
+    # A page without table would break the check below
+    if headers == []:
+        return pageNumbers, headers, []
+
+    # Make sure the numbers match, otherwise the operations comes next will break
+    assert len(sectionData) % len(headers) == 0
+
+    # Reverse the list so that it pops each item in correct order
+    sectionData.reverse()
+
+    sections: List[dict] = []
+
+    # It will be empty when all rows has been parsed
+    while sectionData != []:
+        section = {
+            'location': location,
+            'semester': semester,
+            'year': year
+        }
+
+        for attribute in sectionAttributes:
+            header: str = attribute['header']
+            key: str = attribute['key']
+            default = attribute['default']
+            xpath: str = attribute['xpath']
+            parseFn = attribute['parseFn']
+
+            # Skip parsing if table does not have the attribute
+            if header not in headers:
+                section[key] = default
+                continue
+
+            # Take out a cell
+            tableData: scrapy.Selector = sectionData.pop()
+
+            # Do parsing
+            if xpath is not None:
+                value: str = tableData.xpath(xpath).get(default=default)
+                if isinstance(value, str):
+                    value = value.strip()
+                    if value == '':
+                        value = None
+            else:
+                value = parseFn(tableData)
+
+            section[key] = value
+
+        # Postprocessing
+        section['crn'] = int(section['crn'])
+
+        sections.append(section)
+
+    return pageNumbers, headers, sections
+
+
 class SectionSpider(scrapy.Spider):
     name = 'section'
     allowed_domains = ['apps.fit.edu']
     start_urls = ['https://apps.fit.edu/schedule']
 
+    # Rows per page, sent as pageSizeParameter, SECTION_PAGE_SIZE unless given as a spider argument
+    # Fewer pages if the site honors it, harmless if it does not
+    pageSize: Optional[int] = None
+    pageSizeParameter: str = 'per_page'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Semester URL -> highest page number scheduled so far
+        self.lastPages: Dict[str, int] = {}
+        # Semester URL -> hash of the CRNs of a page -> its page number
+        self.pageHashes: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.pageSize is None:
+            spider.pageSize = crawler.settings.getint('SECTION_PAGE_SIZE') or None
+        else:
+            spider.pageSize = int(spider.pageSize)
+        return spider
+
     # If the attr can be parsed with a single xpath, the xpath is provided
     # Otherwise xpath is None and a parse function is provided
     sectionAttributes = [
@@ -185,132 +322,121 @@ class SectionSpider(scrapy.Spider):
         }
     ]
 
-    # Goto each campus
+    # Goto each campus in scope, links are named after the location of their sections
     def parse(self, response: scrapy.http.TextResponse):
-        # campusUrls will contain 'https://policy.fit.edu/Schedule-of-Classes'
+        scope = Scope.of(self.crawler)
+
+        # campusLinks will contain 'https://policy.fit.edu/Schedule-of-Classes'
         # This URL is automatically eliminated by self.allowed_domains
-        campusUrls = response.xpath('''
+        campusLinks = response.xpath('''
             //div[@class="three wide column"]
             /div[@id="sub-nav"]
             /a
-            /@href
-        ''').getall()
-        # print(campusUrls)
+        ''')
+
+        for campusLink in campusLinks:
+            campusUrl: str = campusLink.xpath('@href').get()
+            # print(campusUrl)
+
+            if not scope.hasCampus(' '.join(campusLink.xpath('text()').getall()).strip() or None):
+                self.crawler.stats.inc_value('scope/skipped_campuses')
+                continue
 
-        yield from response.follow_all(campusUrls, callback=self.parseCampus)
+            yield response.follow(campusUrl, callback=self.parseCampus)
 
-    # Goto each semester of this campus
+    # Goto each semester of this campus, the most recent first
+    # Pages of a semester keep the priority of its request
     def parseCampus(self, response: scrapy.http.TextResponse):
-        semesterUrls = response.xpath('''
+        scope = Scope.of(self.crawler)
+        termRecency = TermRecency.of(self.crawler)
+
+        semesterLinks = response.xpath('''
             //div[@class="thirteen wide column"]
             /div[@class="ui"]
             /a
-            /@href
-        ''').getall()
-        # print(semesterUrls)
+        ''')
+
+        for semesterLink in semesterLinks:
+            semesterUrl: str = semesterLink.xpath('@href').get()
+            # print(semesterUrl)
+
+            term = findTerm(' '.join(semesterLink.xpath('text()').getall())) or findTerm(semesterUrl)
+            if not scope.hasTerm(term):
+                self.crawler.stats.inc_value('scope/skipped_semesters')
+                continue
+
+            yield response.follow(semesterUrl, callback=self.parseSemester, priority=termRecency.priority(term))
 
-        yield from response.follow_all(semesterUrls, callback=self.parseSemester)
+    def pageUrl(self, semesterUrl: str, page: int) -> str:
+        url = add_or_replace_parameter(semesterUrl, 'page', str(page))
+        if self.pageSize is not None:
+            url = add_or_replace_parameter(url, self.pageSizeParameter, str(self.pageSize))
+
+        return url
 
     # Goto the first page of the semester
     def parseSemester(self, response: scrapy.http.TextResponse):
-        sectionTableUrls = [f'{response.url}?page=1']
+        sectionTableUrls = [self.pageUrl(response.url, 1)]
         # print(sectionTableUrls)
 
-        yield from response.follow_all(sectionTableUrls, callback=self.parseSectionTable)
+        yield from response.follow_all(sectionTableUrls, callback=self.parseSectionTable, priority=response.request.priority)
 
-    # Goto other pages of the semester. Duplicated visits are automatically eliminated
+    # Schedule every page of the semester at once, using the last page number in the pagination
+    # Pagination may only show pages around the current one, so every page extends the range if it can
+    # Duplicated visits are automatically eliminated
     # Parse sections on the page
-    def parseSectionTable(self, response: scrapy.http.TextResponse):
-        nextPageUrls = response.xpath('''
-            //div[@class="thirteen wide column"]
-            /div[@class="ui pagination menu"]
-            /a
-            /@href
-        ''').getall()
-        # print(nextPageUrls)
+    async def parseSectionTable(self, response: scrapy.http.TextResponse):
+        semesterUrl = response.url.split('?')[0]
+        page = int(url_query_parameter(response.url, 'page', '1'))
+
+        pageNumbers, headers, sections = await ParsePool.of(self.crawler).parse(parseSectionPage, response, self.sectionAttributes)
+
+        # The term of a semester link cannot always be told, its pages say which it is
+        scope = Scope.of(self.crawler)
+        if sections != [] and not (
+            scope.hasTerm((sections[0]['year'], SEMESTERS.index(sections[0]['semester'])))
+            and scope.hasCampus(sections[0]['location'])
+        ):
+            self.crawler.stats.inc_value('scope/skipped_pages')
+            return
 
-        yield from response.follow_all(nextPageUrls, callback=self.parseSectionTable)
+        lastPage = self.lastPages.get(semesterUrl, 1)
+        nextPageUrls = [
+            self.pageUrl(semesterUrl, nextPage)
+            for nextPage in range(lastPage + 1, max(pageNumbers, default=1) + 1)
+        ]
+        self.lastPages[semesterUrl] = max(lastPage, max(pageNumbers, default=1))
 
-        h2Text: str = response.xpath('''
-            //div[@class="thirteen wide column"]
-            /h2
-            /text()
-        ''').get()
-
-        # It happends when 'There are currently no available classes for this term.'
-        # For example, 'Fort Lee, VA Class Schedule: Summer' in June 2020
-        try:
-            triplet = re.match(  # AttributeError
-                r'(.+) Class Schedule: (spring|summer|fall) (\d{4})',
-                h2Text
-            ).groups()
-        except AttributeError:  # 'NoneType' object has no attribute 'groups'
+        for request in response.follow_all(nextPageUrls, callback=self.parseSectionTable, priority=response.request.priority):
+            yield request
+
+        if headers is None:
             return
 
-        location: str = triplet[0]
-        semester: str = triplet[1]
-        year = int(triplet[2])
-        # print(location, semester, year)
-
-        # Semesters and campuses can have different header
-        # Summer have 'session'
-        # Non-main campus have 'syllabus'
-        headers = response.xpath('''
-            //table[@class="ui small compact celled table"]
-            //th
-            /text()
-        ''').getall()
-        # print(headers)
+        # A page without table
+        if headers == []:
+            self.crawler.stats.inc_value('section/empty_pages')
+            self.logger.warning(f'{response.url} has no sections')
+            return
 
-        # Take out every cell in a flattened array
-        sectionData = response.xpath('''
-            //table[@class="ui small compact celled table"]
-            //td
-        ''')
+        if sections == []:
+            self.crawler.stats.inc_value('section/empty_pages')
+            self.logger.warning(f'{response.url} has no sections')
+            return
+
+        # A page repeating another page of the semester usually means the site clamps page numbers past the end
+        # Pages arrive in any order, so whichever comes first yields the sections and the others are dropped
+        pageHash = hashlib.sha1(json.dumps(sorted(section['crn'] for section in sections)).encode()).hexdigest()
+        pageHashes = self.pageHashes.setdefault(semesterUrl, {})
+        if pageHashes.setdefault(pageHash, page) != page:
+            self.crawler.stats.inc_value('section/repeated_pages')
+            self.logger.warning(f'{response.url} repeats page {pageHashes[pageHash]}')
+            return
+
+        # print(sections)
+        for section in sections:
+            if not scope.hasSubject(section['course'][0]):
+                self.crawler.stats.inc_value('scope/skipped_sections')
+                continue
 
-        # Make sure the numbers match, otherwise the operations comes next will break
-        assert len(sectionData) % len(headers) == 0
-
-        # Reverse the list so that it pops each item in correct order
-        sectionData.reverse()
-
-        # It will be empty when all rows has been parsed
-        while sectionData != []:
-            section = {
-                'location': location,
-                'semester': semester,
-                'year': year
-            }
-
-            for attribute in self.sectionAttributes:
-                header: str = attribute['header']
-                key: str = attribute['key']
-                default = attribute['default']
-                xpath: str = attribute['xpath']
-                parseFn = attribute['parseFn']
-
-                # Skip parsing if table does not have the attribute
-                if header not in headers:
-                    section[key] = default
-                    continue
-
-                # Take out a cell
-                tableData: scrapy.Selector = sectionData.pop()
-
-                # Do parsing
-                if xpath is not None:
-                    value: str = tableData.xpath(xpath).get(default=default)
-                    if isinstance(value, str):
-                        value = value.strip()
-                        if value == '':
-                            value = None
-                else:
-                    value = parseFn(tableData)
-
-                section[key] = value
-
-            # Postprocessing
-            section['crn'] = int(section['crn'])
-
-            # print(section)
             yield section
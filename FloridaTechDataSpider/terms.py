@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Terms by recency, so the crawl fetches the term students are in before older ones
+# Requests get a priority from the distance of their term to the current one:
+# the current term first, then the next one, the last one, the one after next and so on
+# CRAWL_TERMS limits the crawl to some terms, see FloridaTechDataSpider.scope
+
+import datetime
+import re
+from typing import Optional, Tuple
+
+SEMESTERS = ['spring', 'summer', 'fall']
+
+# Term codes of PAWS, as in term_in=202608
+SEMESTER_CODES = ['01', '05', '08']
+
+# First month of each semester, for the current term
+SEMESTER_MONTHS = [1, 5, 8]
+
+TERM_RE = re.compile(
+    pattern=r'(spring|summer|fall)\D{0,3}(\d{4})',
+    flags=re.IGNORECASE
+)
+
+# Year and semester id
+Term = Tuple[int, int]
+
+
+def termOfDate(date: datetime.date) -> Term:
+    semesterId = max(i for i, month in enumerate(SEMESTER_MONTHS) if month <= date.month)
+    return (date.year, semesterId)
+
+
+def parseTermIn(termIn: str) -> Term:
+    return (int(termIn[:4]), SEMESTER_CODES.index(termIn[4:]))
+
+
+# Term of CURRENT_TERM, or of today's date when it is not set
+def currentTerm(termIn: Optional[str]) -> Term:
+    return termOfDate(datetime.date.today()) if not termIn else parseTermIn(termIn)
+
+
+# Terms from the current one, negative for past terms
+def termOffset(term: Term, current: Term) -> int:
+    return (term[0] - current[0]) * len(SEMESTERS) + term[1] - current[1]
+
+
+# Term in text like 'Fall 2026' or a URL like '/schedule/main-campus/fall-2026', None if there is none
+def findTerm(text: str) -> Optional[Term]:
+    match = TERM_RE.search(text)
+    if match is None:
+        return None
+
+    return (int(match.group(2)), SEMESTERS.index(match.group(1).lower()))
+
+
+class TermRecency:
+    # One per crawler, the current term comes from CURRENT_TERM or today's date
+
+    def __init__(self, settings):
+        self.current: Term = currentTerm(settings.get('CURRENT_TERM'))
+        self.enabled: bool = settings.getbool('TERM_PRIORITY_ENABLED')
+
+    @classmethod
+    def of(cls, crawler) -> 'TermRecency':
+        if not hasattr(crawler, 'termRecency'):
+            crawler.termRecency = cls(crawler.settings)
+
+        return crawler.termRecency
+
+    def offset(self, term: Term) -> int:
+        return termOffset(term, self.current)
+
+    # 0 for the current term, then 1 for the next, 2 for the last, 3 for the one after next...
+    def rank(self, term: Term) -> int:
+        offset = self.offset(term)
+        return 2 * offset - 1 if offset > 0 else -2 * offset
+
+    # Scheduler priority of requests about the term, higher goes first
+    def priority(self, term: Optional[Term]) -> int:
+        if not self.enabled or term is None:
+            return 0
+
+        return -self.rank(term)
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Runs every spider against mockServer.py and reports its throughput at several data sizes
+# Spiders run one after another in the order of the Makefile, each in its own process
+# and in a scratch directory, so each one reads the raw files of the one before
+# CPU time and peak RSS are those of the spider process alone, the mock server runs in another one
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# (Label, spider, spider arguments)
+RUNS: List[Tuple[str, str, Dict[str, str]]] = [
+    ('section', 'section', {}),
+    ('pawsSection', 'pawsSection', {}),
+    ('pawsCourse', 'pawsCourse', {}),
+    ('pawsBuilding', 'pawsBuilding', {}),
+    ('directory', 'directory', {}),
+]
+
+FEEDS = {
+    'section': '_section.raw.json',
+    'pawsSection': '_pawsSection.raw.json',
+    'pawsCourse': '_pawsCourse.raw.json',
+    'pawsBuilding': '_pawsBuilding.raw.json',
+    'directory': None,
+}
+
+
+# course.json normally comes from course.py at the end of a chain of scripts
+# PAWS course and building spiders only read these fields of it
+def writeCourses() -> None:
+    from FloridaTechDataSpider.producers import iterJsonArray
+
+    courses: Dict[tuple, List[int]] = {}
+    locations = set()
+    for sectionId, (_, _, section) in enumerate(iterJsonArray('_pawsSection.raw.json')):
+        locations.add(section['location'])
+        key = (section['course'][0], section['course'][1], section['location'], ['spring', 'summer', 'fall'].index(section['semester']), section['year'])
+        courses.setdefault(key, []).append(sectionId)
+
+    locations = sorted(locations)
+    json.dump([
+        {
+            'subject': subject,
+            'course': course,
+            'campusId': locations.index(location),
+            'semesterId': semesterId,
+            'year': year,
+            'sectionIds': sectionIds
+        }
+        for (subject, course, location, semesterId, year), sectionIds in sorted(courses.items())
+    ], open('course.json', 'w'))
+
+
+# Runs in the spider process
+def crawl(spiderName: str, spiderArgs: Dict[str, str], overrides: Dict[str, str], mockSource: str, statsPath: str) -> None:
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'FloridaTechDataSpider.settings')
+
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from crawl import makeCrawler
+
+    settings = get_project_settings()
+    settings.setdict({
+        'LOG_LEVEL': 'WARNING',
+        'DOWNLOAD_HANDLERS': {'https': 'FloridaTechDataSpider.mock.MockSourceDownloadHandler'},
+        'MOCK_SOURCE': mockSource,
+        # Every run starts cold
+        'HTTPCACHE_ENABLED': False,
+        'FAILURE_TOLERANCE_ENABLED': True,
+    }, priority='cmdline')
+    settings.setdict(overrides, priority='cmdline')
+
+    process = CrawlerProcess(settings)
+    crawler = makeCrawler(process, process.spider_loader.load(spiderName), FEEDS[spiderName])
+    process.crawl(crawler, **spiderArgs)
+    process.start()
+
+    json.dump(crawler.stats.get_stats(), open(statsPath, 'w'), default=str)
+
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def startMockServer(scale: float, args) -> Tuple[subprocess.Popen, str]:
+    port = freePort()
+    server = subprocess.Popen([
+        sys.executable, os.path.join(REPO, 'mockServer.py'),
+        '--port', str(port),
+        '--scale', str(scale),
+        '--latency', str(args.latency),
+        '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate),
+        *(['--bandwidth', str(args.bandwidth)] if args.bandwidth is not None else []),
+    ], stdout=subprocess.PIPE, text=True)
+
+    # Wait until it listens
+    server.stdout.readline()
+    return server, f'http://127.0.0.1:{port}'
+
+
+def measure(label: str, spiderName: str, spiderArgs: Dict[str, str], overrides: List[str], mockSource: str, scale: float) -> dict:
+    statsPath = f'{label.replace(" ", "_")}.stats.json'
+    command = [sys.executable, os.path.abspath(__file__), '--crawl', spiderName, '--mock-source', mockSource, '--stats', statsPath]
+    for key, value in spiderArgs.items():
+        command += ['-a', f'{key}={value}']
+    for override in overrides:
+        command += ['-s', override]
+
+    start = time.time()
+    child = subprocess.Popen(command, env={**os.environ, 'PYTHONPATH': REPO})
+    # Resource usage of this child alone
+    _, status, usage = os.wait4(child.pid, 0)
+    wallTime = time.time() - start
+    if status != 0:
+        raise RuntimeError(f'{label} failed with status {status}')
+
+    stats = json.load(open(statsPath))
+    seconds = stats.get('elapsed_time_seconds') or wallTime
+    requests = stats.get('downloader/request_count', 0)
+    items = stats.get('item_scraped_count', 0)
+    return {
+        'scale': scale,
+        'spider': label,
+        'requests': requests,
+        'items': items,
+        'seconds': seconds,
+        'requestsPerSecond': requests / seconds,
+        'itemsPerSecond': items / seconds,
+        'cpuSeconds': usage.ru_utime + usage.ru_stime,
+        # Kilobytes on Linux
+        'peakRssMb': usage.ru_maxrss / 1024,
+    }
+
+
+def report(results: List[dict], header: bool = True) -> None:
+    if header:
+        print(f'{"scale":>6} {"spider":<18} {"requests":>9} {"items":>9} {"seconds":>8} {"req/s":>8} {"items/s":>8} {"cpu s":>8} {"RSS MB":>7}')
+    for r in results:
+        print(
+            f'{r["scale"]:>5g}x {r["spider"]:<18} {r["requests"]:>9} {r["items"]:>9} {r["seconds"]:>8.1f} '
+            f'{r["requestsPerSecond"]:>8.1f} {r["itemsPerSecond"]:>8.1f} {r["cpuSeconds"]:>8.1f} {r["peakRssMb"]:>7.1f}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of every spider against a local mock of the sources')
+    parser.add_argument('--scales', default='1,10,100', help='Comma separated data sizes, relative to the real sites')
+    parser.add_argument('--spiders', default=','.join(label for label, _, _ in RUNS), help='Comma separated runs, later ones need the files of earlier ones')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response time of the mock in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Standard deviation of response time in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests the mock answers with 503')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Kilobytes per second of each mock response, unlimited by default')
+    parser.add_argument('--output', help='Write results as JSON to this file too')
+    parser.add_argument('-s', dest='overrides', action='append', default=[], metavar='NAME=VALUE', help='Scrapy setting of the spiders, like scrapy crawl -s')
+    # Spider process
+    parser.add_argument('--crawl', help=argparse.SUPPRESS)
+    parser.add_argument('--mock-source', help=argparse.SUPPRESS)
+    parser.add_argument('--stats', help=argparse.SUPPRESS)
+    parser.add_argument('-a', dest='spiderArgs', action='append', default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crawl is not None:
+        crawl(
+            args.crawl,
+            dict(arg.split('=', 1) for arg in args.spiderArgs),
+            dict(arg.split('=', 1) for arg in args.overrides),
+            args.mock_source,
+            args.stats
+        )
+        return
+
+    sys.path.insert(0, REPO)
+    if args.output is not None:
+        args.output = os.path.abspath(args.output)
+
+    labels = args.spiders.split(',')
+    results = []
+    for scale in [float(scale) for scale in args.scales.split(',')]:
+        server, mockSource = startMockServer(scale, args)
+        try:
+            with tempfile.TemporaryDirectory(prefix=f'benchmark-{scale:g}x-') as directory:
+                os.chdir(directory)
+                for label, spiderName, spiderArgs in RUNS:
+                    if label not in labels:
+                        continue
+
+                    if spiderName in ('pawsCourse', 'pawsBuilding') and not os.path.exists('course.json'):
+                        writeCourses()
+
+                    results.append(measure(label, spiderName, spiderArgs, args.overrides, mockSource, scale))
+                    report(results[-1:], header=False)
+        finally:
+            os.chdir(REPO)
+            server.terminate()
+            server.wait()
+
+    print()
+    report(results)
+    if args.output is not None:
+        json.dump(results, open(args.output, 'w'), indent=4)
+
+
+if __name__ == '__main__':
+    main()
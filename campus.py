@@ -1,10 +1,9 @@
-import json
 from typing import List
 
-from util import listToJson
+from util import listToJson, loadSections
 
 if __name__ == '__main__':
-    sections: List[dict] = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: List[dict] = loadSections()
 
     campuses = set()
     for section in sections:
@@ -3,7 +3,7 @@ import json
 import re
 from dataclasses import asdict, astuple, dataclass, field, fields
 
-from util import dataclassToJson
+from util import dataclassToJson, loadSections
 
 
 @dataclass
@@ -60,7 +60,7 @@ def bisectStartsWith(ls: list, value: str) -> int:
 if __name__ == '__main__':
     campuses: list = json.load(open('campus.json', 'r'))
     descriptions: list = json.load(open('description.json', 'r'))
-    sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: list = loadSections()
     tags: list = json.load(open('tag.json', 'r'))
     titles: list = json.load(open('title.json', 'r'))
 
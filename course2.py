@@ -2,7 +2,7 @@ import bisect
 import json
 from dataclasses import asdict, astuple, dataclass, field, fields
 
-from util import dataclassToJson
+from util import dataclassToJson, loadCourses
 
 
 @dataclass
@@ -62,7 +62,7 @@ if __name__ == '__main__':
     prerequisites: list = json.load(open('prerequisite.json', 'r'))
     courseAttributes: list = json.load(open('courseAttribute.json', 'r'))
 
-    courses: list = json.load(open('_pawsCourse.raw.json', 'r'))
+    courses: list = loadCourses()
 
     for course in courses:
         course['levelId'] = bisectIndex(levels, course['level'])
@@ -1,8 +1,7 @@
-import json
-from util import listToJson
+from util import listToJson, loadCourses
 
 if __name__ == '__main__':
-    courses: list = json.load(open('_pawsCourse.raw.json', 'r'))
+    courses: list = loadCourses()
 
     courseAttributes = set()
     for course in courses:
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+from scrapy import signals
+from scrapy.crawler import Crawler, CrawlerProcess
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer, threads
+
+from FloridaTechDataSpider.spiders.directory_spider import DirectorySpider
+from FloridaTechDataSpider.spiders.pawsBuilding_spider import PawsBuildingSpider
+from FloridaTechDataSpider.spiders.pawsCourse_spider import PawsCourseSpider
+from FloridaTechDataSpider.spiders.pawsSection_spider import PawsSectionSpider
+from FloridaTechDataSpider.spiders.section_spider import SectionSpider
+
+# Runs every spider in one process
+# PAWS section requests are scheduled as soon as SectionSpider scrapes each section,
+# and the directory is crawled alongside. Raw files are the same as with 'scrapy crawl'
+
+crawlers: List[Crawler] = []
+
+
+def makeCrawler(process: CrawlerProcess, spiderClass: type, feed: Optional[str] = None) -> Crawler:
+    settings = process.settings.copy()
+    if feed is not None:
+        settings.set('FEEDS', {feed: {'format': 'json', 'overwrite': True}})
+
+    crawler = Crawler(spiderClass, settings)
+    crawlers.append(crawler)
+    return crawler
+
+
+def make(*targets: str) -> defer.Deferred:
+    # Post-processing runs in a thread so crawls in flight keep going
+    return threads.deferToThread(subprocess.run, ['make', *targets], check=True)
+
+
+@defer.inlineCallbacks
+def crawlAll(process: CrawlerProcess, pawsSectionArgs: dict):
+    directory = process.crawl(makeCrawler(process, DirectorySpider))
+
+    # PAWS sections are fed by SectionSpider, so start PAWS first to have its engine running
+    pawsSectionCrawler = makeCrawler(process, PawsSectionSpider, '_pawsSection.raw.json')
+    pawsSection = process.crawl(pawsSectionCrawler, streaming=True, **pawsSectionArgs)
+
+    sectionCrawler = makeCrawler(process, SectionSpider, '_section.raw.json')
+    sectionCrawler.signals.connect(
+        lambda item, response, spider: pawsSectionCrawler.spider.feedSection(item),
+        signal=signals.item_scraped,
+        weak=False
+    )
+    sectionCrawler.signals.connect(
+        lambda spider, reason: pawsSectionCrawler.spider.finishFeed(),
+        signal=signals.spider_closed,
+        weak=False
+    )
+    section = process.crawl(sectionCrawler)
+
+    yield section
+    yield pawsSection
+
+    # Catalog and building spiders read course.json, which is built from PAWS sections
+    yield make('course.json')
+
+    yield defer.DeferredList([
+        process.crawl(makeCrawler(process, PawsCourseSpider, '_pawsCourse.raw.json'), checkpoint='_pawsCourse.checkpoint.jl'),
+        process.crawl(makeCrawler(process, PawsBuildingSpider, '_pawsBuilding.raw.json'))
+    ], fireOnOneErrback=True)
+
+    yield directory
+
+
+def failedCrawlers() -> List[str]:
+    return [
+        crawler.spidercls.name
+        for crawler in crawlers
+        if crawler.stats.get_value('finish_reason') != 'finished'
+    ]
+
+
+if __name__ == '__main__':
+    settings = get_project_settings()
+    settings.set('LOG_LEVEL', 'WARNING')
+    # Strict unless make runs with TOLERANT=1
+    if os.environ.get('CRAWL_TOLERANT'):
+        settings.set('FAILURE_TOLERANCE_ENABLED', True)
+    else:
+        settings.set('CLOSESPIDER_ERRORCOUNT', 1)
+
+    # Scope of the build as exported by make, the post-processing it runs gets the same one
+    for name in ('CRAWL_SUBJECTS', 'CRAWL_TERMS', 'CRAWL_CAMPUSES'):
+        if os.environ.get(name):
+            settings.set(name, os.environ[name])
+
+    # Spider arguments of PawsSectionSpider, passed as key=value like 'scrapy crawl -a'
+    pawsSectionArgs = dict(
+        arg.split('=', 1)
+        for arg in sys.argv[1:]
+        if arg != '-a'
+    )
+
+    errors = []
+    process = CrawlerProcess(settings)
+    result = crawlAll(process, pawsSectionArgs)
+    result.addErrback(errors.append)
+    # process.stop() only stops the crawlers, the reactor is left running with stop_after_crawl=False
+    # The reactor is imported once CrawlerProcess has installed it
+    from twisted.internet import reactor
+    result.addBoth(lambda _: process.stop())
+    result.addBoth(lambda _: reactor.stop())
+    process.start(stop_after_crawl=False)
+
+    for error in errors:
+        print(error.getTraceback(), file=sys.stderr)
+
+    if errors != [] or failedCrawlers() != []:
+        print(f'Error: crawl failed {failedCrawlers()}', file=sys.stderr)
+        sys.exit(1)
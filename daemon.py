@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from FloridaTechDataSpider.producers import iterJsonArray
+
+# Keeps dist/ fresh without rebuilding everything
+#   Each source is crawled on its own cadence through its Makefile rules
+#   A raw file whose records did not change gets its old modification time back,
+#   and post-processing only re-runs the scripts downstream of raw files that did change
+#   Raw files are never crawled by post-processing: make sees changed ones as new (-W) and the others as old (-o)
+# Last success times and stage durations are kept in STATE_FILE and served on --port as JSON and Prometheus text
+
+# Crawled in this order, a source only needs the raw files of the ones before it
+SOURCES = [
+    {
+        'name': 'directory',
+        'cadence': 7 * 24 * 3600,
+        'raw': ['_department.raw.json', '_employee.raw.json'],
+        'spiders': ['FloridaTechDataSpider/spiders/directory_spider.py']
+    }, {
+        'name': 'schedule',
+        'cadence': 3600,
+        'raw': ['_section.raw.json', '_pawsSection.raw.json'],
+        'spiders': ['FloridaTechDataSpider/spiders/section_spider.py', 'FloridaTechDataSpider/spiders/pawsSection_spider.py']
+    }, {
+        'name': 'catalog',
+        'cadence': 24 * 3600,
+        'raw': ['_pawsCourse.raw.json', '_pawsBuilding.raw.json'],
+        'spiders': ['FloridaTechDataSpider/spiders/pawsCourse_spider.py', 'FloridaTechDataSpider/spiders/pawsBuilding_spider.py']
+    }
+]
+
+RAW_FILES = [raw for source in SOURCES for raw in source['raw']]
+
+STATE_FILE = '_daemon.state.json'
+
+# A failed stage is tried again after this long, whatever its cadence
+RETRY_SECS = 15 * 60
+
+
+# Hash of the records of a raw file, whatever their order
+# Spiders scrape concurrently, so the same data comes out in a different order from run to run
+def recordsHash(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+
+    try:
+        digests = sorted(
+            hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).digest()
+            for _, _, record in iterJsonArray(path)
+        )
+    except ValueError:  # Cut by a failed crawl
+        return None
+
+    return hashlib.sha1(b''.join(digests)).hexdigest()
+
+
+class Daemon:
+
+    def __init__(self, cadences: Dict[str, float], makeArgs: List[str]):
+        self.cadences = cadences
+        self.makeArgs = makeArgs
+        # Held while stages or dirty change, the status server reads them from its own threads
+        self.lock = threading.Lock()
+
+        # Stage -> lastAttempt, lastSuccess, lastDuration, lastError, changed
+        # Stages are the sources and 'publish'
+        self.stages: Dict[str, dict] = {}
+        # Raw files that changed since dist/ was last published
+        self.dirty: List[str] = []
+
+        if os.path.exists(STATE_FILE):
+            with open(STATE_FILE) as f:
+                state = json.load(f)
+            self.stages = state['stages']
+            self.dirty = state['dirty']
+
+    def save(self) -> None:
+        with open(f'{STATE_FILE}.tmp', 'w') as f:
+            json.dump({'stages': self.stages, 'dirty': self.dirty}, f, indent=4)
+        os.replace(f'{STATE_FILE}.tmp', STATE_FILE)
+
+    def isDue(self, source: dict, now: float) -> bool:
+        stage = self.stages.get(source['name'], {})
+        if stage.get('lastError') is not None and now - stage['lastAttempt'] < RETRY_SECS:
+            return False
+
+        return now - stage.get('lastSuccess', 0) >= self.cadences[source['name']]
+
+    # Make without crawling anything but the given raw files
+    def make(self, targets: List[str], crawled: List[str], whatIf: List[str]) -> None:
+        command = ['make', *targets, *self.makeArgs]
+        for path in whatIf:
+            command += ['-W', path]
+        for raw in RAW_FILES:
+            if raw not in crawled and raw not in self.dirty:
+                command += ['-o', raw]
+        for raw in self.dirty:
+            if raw not in crawled:
+                command += ['-W', raw]
+
+        subprocess.run(command, check=True)
+
+    # fn runs without the lock and takes it to change the stage
+    def runStage(self, name: str, fn) -> bool:
+        start = time.time()
+        with self.lock:
+            stage = self.stages.setdefault(name, {})
+            stage['lastAttempt'] = start
+        print(f'{name}: started', file=sys.stderr)
+
+        try:
+            fn(stage)
+        except (subprocess.CalledProcessError, OSError) as e:
+            with self.lock:
+                stage['lastError'] = str(e)
+            print(f'{name}: failed, {e}', file=sys.stderr)
+            return False
+        else:
+            with self.lock:
+                stage['lastError'] = None
+                stage['lastSuccess'] = time.time()
+            return True
+        finally:
+            with self.lock:
+                stage['lastDuration'] = time.time() - start
+                self.save()
+            print(f'{name}: {stage["lastDuration"]:.0f}s', file=sys.stderr)
+
+    # Crawl a source, a failed crawl leaves its raw files as they were
+    def crawl(self, source: dict, stage: dict) -> None:
+        raws: List[str] = source['raw']
+        hashes = {raw: recordsHash(raw) for raw in raws}
+        for raw in raws:
+            if os.path.exists(raw):
+                shutil.copy2(raw, f'{raw}.daemon')
+
+        try:
+            self.make(raws, raws, source['spiders'])
+        except BaseException:
+            for raw in raws:
+                if os.path.exists(f'{raw}.daemon'):
+                    os.replace(f'{raw}.daemon', raw)
+            raise
+
+        # Unchanged records keep the old modification time, so nothing downstream is rebuilt
+        changed = []
+        for raw in raws:
+            if hashes[raw] is not None and recordsHash(raw) == hashes[raw]:
+                backup = os.stat(f'{raw}.daemon')
+                os.utime(raw, (backup.st_atime, backup.st_mtime))
+            else:
+                changed.append(raw)
+
+            if os.path.exists(f'{raw}.daemon'):
+                os.remove(f'{raw}.daemon')
+
+        with self.lock:
+            self.dirty += [raw for raw in changed if raw not in self.dirty]
+            stage['changed'] = changed
+        print(f'{source["name"]}: changed {changed}', file=sys.stderr)
+
+    def publish(self, stage: dict) -> None:
+        self.make(['all'], [], [])
+        with self.lock:
+            stage['changed'] = self.dirty
+            self.dirty = []
+
+    def tick(self) -> None:
+        now = time.time()
+        for source in SOURCES:
+            if self.isDue(source, now):
+                self.runStage(source['name'], lambda stage: self.crawl(source, stage))
+
+        publish = self.stages.get('publish', {})
+        if self.dirty != [] or publish.get('lastSuccess') is None:
+            if publish.get('lastError') is None or now - publish['lastAttempt'] >= RETRY_SECS:
+                self.runStage('publish', self.publish)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return json.loads(json.dumps({'stages': self.stages, 'dirty': self.dirty, 'cadences': self.cadences}))
+
+
+def prometheusText(snapshot: dict) -> str:
+    lines = []
+    for key, name, help in (
+        ('lastSuccess', 'daemon_stage_last_success_timestamp_seconds', 'Time the stage last succeeded'),
+        ('lastAttempt', 'daemon_stage_last_attempt_timestamp_seconds', 'Time the stage last started'),
+        ('lastDuration', 'daemon_stage_duration_seconds', 'Duration of the last run of the stage'),
+    ):
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} gauge')
+        for stageName, stage in snapshot['stages'].items():
+            if stage.get(key) is not None:
+                lines.append(f'{name}{{stage="{stageName}"}} {float(stage[key])}')
+
+    lines.append('# HELP daemon_stage_failed Whether the last run of the stage failed')
+    lines.append('# TYPE daemon_stage_failed gauge')
+    for stageName, stage in snapshot['stages'].items():
+        lines.append(f'daemon_stage_failed{{stage="{stageName}"}} {float(stage.get("lastError") is not None)}')
+
+    lines.append('# HELP daemon_dirty_raw_files Raw files changed since dist/ was last published')
+    lines.append('# TYPE daemon_dirty_raw_files gauge')
+    lines.append(f'daemon_dirty_raw_files {float(len(snapshot["dirty"]))}')
+    return '\n'.join(lines) + '\n'
+
+
+def serve(daemon: Daemon, port: int) -> None:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = prometheusText(daemon.snapshot()).encode('utf-8')
+                contentType = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                body = json.dumps(daemon.snapshot(), indent=4).encode('utf-8')
+                contentType = 'application/json'
+
+            self.send_response(200)
+            self.send_header('Content-Type', contentType)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'Daemon status on http://127.0.0.1:{port}/ and /metrics', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh dist/ with each source on its own cadence')
+    parser.add_argument('--cadence', action='append', default=[], metavar='SOURCE=SECONDS', help=f'Seconds between crawls of a source, one of {", ".join(source["name"] for source in SOURCES)}')
+    parser.add_argument('--once', action='store_true', help='Crawl the sources that are due, publish and exit')
+    parser.add_argument('--interval', type=float, default=60, help='Seconds between checks for due sources')
+    parser.add_argument('--port', type=int, default=None, help='Serve last success times and stage durations on this port')
+    parser.add_argument('makeArgs', nargs='*', metavar='VARIABLE=VALUE', help='Make variables, like SCRAPY_OPTIONS')
+    args = parser.parse_args()
+
+    cadences = {source['name']: source['cadence'] for source in SOURCES}
+    for cadence in args.cadence:
+        name, seconds = cadence.split('=', 1)
+        if name not in cadences:
+            parser.error(f'Unknown source {name}')
+        cadences[name] = float(seconds)
+
+    daemon = Daemon(cadences, args.makeArgs)
+    if args.port is not None:
+        serve(daemon, args.port)
+
+    while True:
+        daemon.tick()
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+    failed = [name for name, stage in daemon.stages.items() if stage.get('lastError') is not None]
+    if failed != []:
+        print(f'Error: failed stages {failed}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
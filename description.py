@@ -1,10 +1,10 @@
 import json
 import re
 
-from util import listToJson
+from util import listToJson, loadSections
 
 if __name__ == '__main__':
-    sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: list = loadSections()
     requirements: list = json.load(open('requirement.json', 'r'))
     tags: list = json.load(open('tag.json', 'r'))
 
@@ -3,7 +3,7 @@ import json
 import re
 from dataclasses import asdict, astuple, dataclass, fields
 
-from util import dataclassToJson
+from util import dataclassToJson, loadSections
 
 
 @dataclass
@@ -36,7 +36,7 @@ if __name__ == '__main__':
     buildings = [b['code'] for b in json.load(open('building.json', 'r'))]
     departments = [d['code'] for d in json.load(open('department.json', 'r'))]
     titles: list = json.load(open('title.json', 'r'))
-    sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: list = loadSections()
 
     employees: list = json.load(open('_employee.raw.json', 'r'))
 
@@ -0,0 +1,717 @@
+import argparse
+import html
+import random
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from twisted.internet import reactor
+from twisted.web import resource, server
+
+from subject import presetSubjects
+
+# Local stand-in for apps.fit.edu, PAWS and the directory
+# Pages are synthetic but shaped like the real ones, so every spider parses them
+# Data is generated from --seed on every request, and --scale multiplies the number of sections and departments
+# Requests come from FloridaTechDataSpider.mock.MockSourceDownloadHandler, with the source host as first path segment
+
+# (Path, location, share of sections)
+CAMPUSES = [
+    ('main', 'Melbourne', 1.0),
+    ('online', 'Online', 0.2),
+    ('aeronautics', 'Aeronautics', 0.05),
+    ('fort-lee', 'Fort Lee, VA', 0.03),
+]
+
+# (Semester, year, term code, share of sections)
+TERMS = [
+    ('spring', 2026, '01', 1.0),
+    ('summer', 2026, '05', 0.3),
+    ('fall', 2026, '08', 1.0),
+]
+
+# Sections of the main campus in a full term at scale 1
+SECTIONS_PER_TERM = 1000
+
+# Departments at scale 1
+DEPARTMENTS = 60
+
+# Bytes written at a time when the bandwidth is limited
+CHUNK_SIZE = 1460
+
+# Every subject subject.py knows has courses, as it expects, and a few it does not know come after them
+# Subjects take turns, so a scale below 0.07 leaves the last ones without sections
+SUBJECTS = [code for code, _ in presetSubjects] + ['ECM', 'ECN', 'EGN', 'FIN', 'MAE', 'SCI']
+
+# (Code, name), codes are three digits and three letters like the real ones, which building.py matches
+BUILDINGS = [
+    ('505OEC', 'Olin Engineering Complex'),
+    ('511OPS', 'Olin Physical Sciences'),
+    ('512OLS', 'Olin Life Sciences'),
+    ('302CRF', 'Crawford Building'),
+    ('210EVL', 'Evans Library'),
+    ('410SKU', 'Skurla Hall'),
+    ('101HAR', 'Harris Center'),
+    ('115GPA', 'Gleason Performing Arts Center'),
+    ('503FWO', 'F.W. Olin Engineering'),
+    ('305LNK', 'Link Building'),
+    ('120SAC', 'Student Affairs Center'),
+    ('620CCB', 'Commercial Center'),
+]
+
+FIRST_NAMES = ['Alex', 'Blake', 'Casey', 'Dana', 'Emery', 'Finley', 'Gray', 'Harper', 'Jordan', 'Kai', 'Logan', 'Morgan', 'Quinn', 'Riley', 'Sage', 'Taylor']
+LAST_NAMES = ['Anders', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito', 'Johnson', 'Kim', 'Lopez', 'Nguyen', 'Patel', 'Silva', 'Walker']
+
+WORDS = (
+    'analysis design systems theory applications principles methods laboratory introduction advanced '
+    'topics research engineering science management flight environment structures data computation '
+    'students project problems modeling communication practice development processes seminar'
+).split()
+
+RESTRICTIONS = [
+    ['Must be enrolled in one of the following Levels:', 'Undergraduate'],
+    ['Must be enrolled in one of the following Levels:', 'Graduate'],
+    ['May not be enrolled as the following Classifications:', 'Freshman'],
+    ['Must be enrolled in one of the following Campuses:', 'Main Campus', 'Online'],
+]
+
+SCHEDULE_TYPES = ['Lecture', 'Laboratory', 'Lecture/Lab', 'Independent Study', 'Seminar']
+
+COURSE_ATTRIBUTES = ['Computer Literacy', 'Humanities Elective', 'Liberal Arts Elective', 'Social Science Elective', 'Q Course']
+
+
+class Dataset:
+    # Synthetic data, generated again on every request from the seed and the identity of the record
+    # A section is identified by term, campus and index, subjects take turns so a subject lists every nth section
+
+    def __init__(self, scale: float, seed: int):
+        self.scale = scale
+        self.seed = seed
+
+    def rng(self, *key) -> random.Random:
+        return random.Random(':'.join(str(part) for part in (self.seed,) + key))
+
+    def sectionCount(self, termIndex: int, campusIndex: int) -> int:
+        return max(1, round(SECTIONS_PER_TERM * self.scale * TERMS[termIndex][3] * CAMPUSES[campusIndex][2]))
+
+    def crn(self, campusIndex: int, index: int) -> int:
+        return 10000 + index * len(CAMPUSES) + campusIndex
+
+    def sectionOf(self, crn: int) -> Tuple[int, int]:
+        return (crn - 10000) % len(CAMPUSES), (crn - 10000) // len(CAMPUSES)
+
+    def termIndex(self, termIn: str) -> Optional[int]:
+        for termIndex, (_, year, code, _) in enumerate(TERMS):
+            if termIn == f'{year}{code}':
+                return termIndex
+
+        return None
+
+    def words(self, rng: random.Random, count: int) -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    def section(self, termIndex: int, campusIndex: int, index: int) -> dict:
+        rng = self.rng('section', termIndex, campusIndex, index)
+        subject = SUBJECTS[index % len(SUBJECTS)]
+        # About three sections per course
+        course = 1001 + (index // len(SUBJECTS) // 3) % 4999
+        semester, year, _, _ = TERMS[termIndex]
+
+        meetings = rng.choice([1, 1, 1, 2])
+        places = []
+        for _ in range(meetings):
+            code, name = rng.choice(BUILDINGS)
+            places.append((code, name, 'TBA' if rng.random() < 0.05 else str(rng.randint(100, 399))))
+
+        instructor = None
+        if rng.random() > 0.1:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            instructor = (f'{first} {last}', f'{first[0].lower()}{last.lower()}@fit.edu')
+
+        cap = rng.choice([20, 25, 30, 40, 60, 120])
+        return {
+            'crn': self.crn(campusIndex, index),
+            'subject': subject,
+            'course': course,
+            'section': f'{index // len(SUBJECTS) % 3 + 1:02}',
+            'creditHours': rng.choice(['3', '3', '3', '4', '1', '1-6']),
+            'title': self.words(self.rng('title', subject, course), 3).title(),
+            'description': self.words(self.rng('description', subject, course), 40).capitalize() + '.',
+            'notes': ['Restricted to majors'] if rng.random() < 0.1 else [],
+            'session': rng.choice(['A', 'B']) if semester == 'summer' else None,
+            'days': [rng.choice(['MWF', 'TR', 'M', 'W', 'F']) for _ in range(meetings)],
+            'times': [(hour * 100, hour * 100 + 50) for hour in (rng.randint(8, 19) for _ in range(meetings))],
+            'places': places,
+            'instructor': instructor,
+            'cap': (rng.randint(0, cap), cap),
+            'syllabus': f'https://apps.fit.edu/syllabus/{semester}{year}/{subject}{course}.pdf' if campusIndex != 0 else None,
+            'level': 'Graduate' if course >= 5000 else 'Undergraduate',
+            'waitListSeats': (rng.choice([0, 0, 5, 10]), 0),
+            'crossListCourses': [(rng.choice(SUBJECTS), course)] if rng.random() < 0.05 else [],
+            'restrictions': rng.choice(RESTRICTIONS) if rng.random() < 0.3 else [],
+            'prerequisite': f'Undergraduate level {rng.choice(SUBJECTS)} {rng.randint(1000, course)} Minimum Grade of D' if rng.random() < 0.4 else None,
+            'corequisites': [(subject, course + 1)] if rng.random() < 0.05 else [],
+        }
+
+    def catalog(self, subject: str, course: int) -> dict:
+        rng = self.rng('catalog', subject, course)
+        lab = rng.random() < 0.2
+        return {
+            'description': self.words(self.rng('description', subject, course), 40).capitalize() + '.',
+            'lectureHours': 3.0,
+            'labHours': 3.0 if lab else 0.0,
+            'level': 'Graduate' if course >= 5000 else 'Undergraduate',
+            'scheduleTypes': ['Lecture', 'Laboratory'] if lab else [rng.choice(SCHEDULE_TYPES)],
+            'restrictions': rng.choice(RESTRICTIONS) if rng.random() < 0.3 else [],
+            'prerequisite': f'Undergraduate level {rng.choice(SUBJECTS)} {rng.randint(1000, course)} Minimum Grade of D' if rng.random() < 0.4 else None,
+            'courseAttributes': rng.sample(COURSE_ATTRIBUTES, rng.randint(0, 2)),
+        }
+
+    def departmentCount(self) -> int:
+        return max(1, round(DEPARTMENTS * self.scale))
+
+    def department(self, index: int) -> dict:
+        rng = self.rng('department', index)
+        code, name = rng.choice(BUILDINGS)
+        employees = []
+        for _ in range(rng.randint(2, 12)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            employees.append({
+                'name': f'{first} {last}',
+                'title': rng.choice(['Professor', 'Associate Professor', 'Assistant Professor', 'Coordinator', 'Director']),
+                'email': f'{first[0].lower()}{last.lower()}@fit.edu',
+                'phone': f'321-674-{rng.randint(7000, 8999)}',
+                'building': f'{name} ({code})',
+                'room': f'Room: {rng.randint(100, 399)}',
+            })
+
+        return {
+            'code': f'D{index:04}',
+            'name': f'Department of {self.words(rng, 2).title()}',
+            'phone': f'321-674-{rng.randint(7000, 8999)}',
+            'fax': f'321-674-{rng.randint(7000, 8999)}' if rng.random() < 0.5 else None,
+            'email': f'd{index:04}@fit.edu',
+            'website': f'https://www.fit.edu/d{index:04}',
+            'primaryLocation': f'{name} ({code})',
+            'employees': employees,
+        }
+
+
+def e(text) -> str:
+    return html.escape(str(text))
+
+
+# 1350 -> '1:50 pm'
+def clock(time: int) -> str:
+    hour, minute = divmod(time, 100)
+    return f'{(hour - 1) % 12 + 1}:{minute:02} {"am" if hour < 12 else "pm"}'
+
+
+def page(title: str, body: str) -> str:
+    return f'<!DOCTYPE html>\n<html>\n<head><title>{e(title)}</title></head>\n<body>\n{body}\n</body>\n</html>\n'
+
+
+# Banner wraps every page in a header and a footer of navigation, help text and scripts
+# several times the size of the table the spiders read
+BANNER_MENU = [
+    ('Personal Information', 'bmenu.P_GenMnu'), ('Student', 'bmenu.P_StuMainMnu'), ('Financial Aid', 'bmenu.P_FinAidMainMnu'),
+    ('Employee', 'bmenu.P_HRMainMnu'), ('Faculty Services', 'bmenu.P_FacMainMnu'), ('Alumni and Friends', 'bmenu.P_AlumniMnu'),
+    ('Class Schedule', 'bwckschd.p_disp_dyn_sched'), ('Course Catalog', 'bwckctlg.p_disp_dyn_ctlg'), ('Campus Directory', 'bwgkoprf.P_ShowFndMe'),
+]
+
+
+def bannerPage(title: str, body: str) -> str:
+    menu = '\n'.join(
+        f'<td class="taboff" height="22"><a href="/prod/twbkwbis.{procedure}" title="{e(label)}" onmouseout="window.status=&quot;&quot;; return true" onblur="window.status=&quot;&quot;; return true">{e(label)}</a></td>\n<td class="bgtabon" width="10" nowrap="nowrap"><img src="/wtlgifs/web_tab_corner_right.gif" alt="Tab Corner Right" class="headerImg" title="Tab Corner Right" name="web_tab_corner_right" hspace="0" vspace="0" border="0" height="20" width="8"></td>'
+        for label, procedure in BANNER_MENU
+    )
+    links = '\n'.join(
+        f'<a href="/prod/twbkwbis.{procedure}" class="submenulinktext2">{e(label)}</a>\n<span class="linkseparator">|</span>'
+        for label, procedure in BANNER_MENU
+    )
+    script = '\n'.join(
+        f'function {name}(){{ var w = window.open("/prod/twbkwbis.P_Help?{name}", "{name}", "toolbar=no,location=no,directories=no,status=yes,menubar=no,scrollbars=yes,resizable=yes,width=600,height=500"); if (w) {{ w.focus(); }} return false; }}'
+        for name in ('helpWindow', 'siteMap', 'exitWindow', 'printWindow', 'directoryWindow', 'mainMenuWindow', 'courseWindow', 'termWindow')
+    )
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+<link rel="stylesheet" href="/css/web_defaultapp.css" type="text/css">
+<link rel="stylesheet" href="/css/web_defaultprint.css" type="text/css" media="print">
+<title>{e(title)}</title>
+<script type="text/javascript">
+{script}
+</script>
+</head>
+<body>
+<div class="headerwrapperdiv">
+<div class="pageheaderdiv1"><a href="#main_content" class="skiplinks">Go to Main Content</a><h1>Florida Institute of Technology</h1></div>
+<div class="headerlinksdiv">
+<table class="plaintable" summary="This table displays Menu Items and Banner Search textbox." width="100%"><tr>
+{menu}
+</tr></table>
+</div>
+</div>
+<div class="pagetitlediv"><h2>{e(title)}</h2></div>
+<div class="pagebodydiv">
+<a name="main_content"></a>
+{body}
+<br>
+<table class="plaintable" summary="This table is for formatting the return links." width="100%"><tr><td class="pldefault">{links}</td></tr></table>
+</div>
+<div class="footerbeforediv">
+{links}
+</div>
+<div class="footerafterdiv">
+<table class="plaintable" summary="This table is for formatting the page footer." width="100%">
+<tr><td class="pldefault"><a href="/prod/twbkwbis.P_Help" onclick="return helpWindow()">Help</a> | <a href="/prod/twbkwbis.P_SiteMap" onclick="return siteMap()">Site Map</a> | <a href="/prod/twbkwbis.P_Logout">Exit</a></td></tr>
+<tr><td class="pldefault"><span class="releasetext">Release: 8.7.1</span></td></tr>
+<tr><td class="pldefault"><img src="/wtlgifs/web_footer_logo.gif" alt="Ellucian" title="Ellucian" name="web_footer_logo" hspace="0" vspace="0" border="0" height="50" width="100"><p>&copy; 2026 Ellucian Company L.P. and its affiliates.</p></td></tr>
+</table>
+</div>
+</body>
+</html>
+'''
+
+
+class Schedule:
+    # apps.fit.edu/schedule, paginated tables of sections per campus and term
+
+    def __init__(self, dataset: Dataset, pageSize: int):
+        self.dataset = dataset
+        self.pageSize = pageSize
+
+    def render(self, path: List[str], args: Dict[str, List[str]]) -> Optional[str]:
+        if path == ['schedule']:
+            return self.campusList()
+
+        campusIndex = next((i for i, campus in enumerate(CAMPUSES) if path[1:2] == [campus[0]]), None)
+        if campusIndex is None:
+            return None
+        if len(path) == 2:
+            return self.termList(campusIndex)
+
+        termIndex = next((i for i, term in enumerate(TERMS) if path[2:3] == [f'{term[0]}-{term[1]}']), None)
+        if termIndex is None or len(path) != 3:
+            return None
+
+        try:
+            pageNumber = int(args.get('page', ['1'])[0])
+            pageSize = min(int(args.get('per_page', [self.pageSize])[0]), 500)
+        except ValueError:
+            return None
+
+        return self.sectionTable(campusIndex, termIndex, pageNumber, pageSize)
+
+    def campusList(self) -> str:
+        links = '\n'.join(
+            f'<a class="item" href="/schedule/{path}">{e(location)}</a>'
+            for path, location, _ in CAMPUSES
+        )
+        return page('Class Schedule', f'''<div class="ui grid">
+<div class="three wide column">
+<div id="sub-nav">
+{links}
+<a class="item" href="https://policy.fit.edu/Schedule-of-Classes">Policy</a>
+</div>
+</div>
+</div>''')
+
+    def termList(self, campusIndex: int) -> str:
+        path, location, _ = CAMPUSES[campusIndex]
+        links = '\n'.join(
+            f'<a class="ui button" href="/schedule/{path}/{semester}-{year}">{semester.title()} {year}</a>'
+            for semester, year, _, _ in TERMS
+        )
+        return page(f'{location} Class Schedule', f'''<div class="ui grid">
+<div class="thirteen wide column">
+<h2>{e(location)} Class Schedule</h2>
+<div class="ui">
+{links}
+</div>
+</div>
+</div>''')
+
+    def cells(self, section: dict, headers: List[str]) -> str:
+        cells = {
+            'CRN': e(section['crn']),
+            'Course': f'{section["subject"]} {section["course"]}',
+            'Section': section['section'],
+            'Cr': section['creditHours'],
+            'Title': f'<span data-content="{e(section["description"])}">{e(section["title"])}</span>',
+            'Notes': '<br>'.join(e(note) for note in section['notes']),
+            'Session': e(section['session'] or ''),
+            'Days': '<br>'.join(section['days']),
+            'Times': '<br>'.join(f'{start:04}-{end:04}' for start, end in section['times']),
+            'Place': '<br>'.join(f'{code} {room}' for code, _, room in section['places']),
+            'Instructor': f'<a href="mailto:{section["instructor"][1]}">{e(section["instructor"][0])}</a>' if section['instructor'] else 'TBA',
+            'Cap': f'<strong>{section["cap"][0]}</strong>/{section["cap"][1]}',
+            'Syllabus': f'<a href="{section["syllabus"]}">Syllabus</a>' if section['syllabus'] else '',
+        }
+        return '<tr>' + ''.join(f'<td>{cells[header]}</td>' for header in headers) + '</tr>'
+
+    def sectionTable(self, campusIndex: int, termIndex: int, pageNumber: int, pageSize: int) -> str:
+        _, location, _ = CAMPUSES[campusIndex]
+        semester, year, _, _ = TERMS[termIndex]
+        count = self.dataset.sectionCount(termIndex, campusIndex)
+        lastPage = max(1, -(-count // pageSize))
+        # Past the end the site shows the last page again
+        pageNumber = min(max(pageNumber, 1), lastPage)
+
+        # Summer has sessions, other campuses have syllabi
+        headers = ['CRN', 'Course', 'Section', 'Cr', 'Title', 'Notes']
+        if semester == 'summer':
+            headers.append('Session')
+        headers += ['Days', 'Times', 'Place', 'Instructor', 'Cap']
+        if campusIndex != 0:
+            headers.append('Syllabus')
+
+        rows = '\n'.join(
+            self.cells(self.dataset.section(termIndex, campusIndex, index), headers)
+            for index in range((pageNumber - 1) * pageSize, min(pageNumber * pageSize, count))
+        )
+
+        # Only pages around the current one are linked, like the real pagination
+        pagination = '\n'.join(
+            f'<a class="item" href="?page={number}">{number}</a>'
+            for number in sorted({1, lastPage} | set(range(max(1, pageNumber - 3), min(lastPage, pageNumber + 3) + 1)))
+        )
+
+        headerRow = ''.join(f'<th>{header}</th>' for header in headers)
+        return page(f'{location} Class Schedule', f'''<div class="ui grid">
+<div class="thirteen wide column">
+<h2>{e(location)} Class Schedule: {semester} {year}</h2>
+<table class="ui small compact celled table">
+<thead><tr>{headerRow}</tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+<div class="ui pagination menu">
+{pagination}
+</div>
+</div>
+</div>''')
+
+
+class Paws:
+    # nssb-p.adm.fit.edu, Banner pages for sections, listings and the course catalog
+    # Text is laid out node by node the way Banner does, since the spiders parse the text lines of a cell
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+
+    def render(self, path: List[str], args: Dict[str, List[str]]) -> Optional[str]:
+        procedure = path[1] if len(path) == 2 and path[0] == 'prod' else None
+        arg = lambda name: args.get(name, [''])[-1]
+
+        if procedure == 'bwckschd.p_disp_detail_sched':
+            return self.detail(arg('term_in'), arg('crn_in'))
+        if procedure == 'bwckctlg.p_disp_listcrse':
+            return self.listing(arg('term_in'), arg('subj_in'))
+        if procedure == 'bwckctlg.p_disp_course_detail':
+            return self.catalog(arg('cat_term_in'), arg('subj_code_in'), arg('crse_numb_in'))
+
+        return None
+
+    # Lines of a detail cell, each one its own text node
+    def sectionLines(self, section: dict) -> str:
+        parts = [
+            '<span class="fieldlabeltext">Registration Dates: </span>Mar 30, 2026 to Aug 28, 2026\n<br>',
+            f'<span class="fieldlabeltext">Levels: </span>{section["level"]}\n<br>',
+            f'{section["creditHours"]} Credits\n<br>',
+            '<table class="datadisplaytable" summary="This layout table is used to present the seating numbers." width="50%">\n'
+            '<caption class="captiontext">Registration Availability</caption>\n'
+            '<tr>\n<td class="dddead">&nbsp;</td>\n<th class="ddheader" scope="col"><span class="fieldlabeltext">Capacity</span></th>\n'
+            '<th class="ddheader" scope="col"><span class="fieldlabeltext">Actual</span></th>\n'
+            '<th class="ddheader" scope="col"><span class="fieldlabeltext">Remaining</span></th>\n</tr>\n'
+            f'<tr>\n<th class="ddlabel" scope="row"><span class="fieldlabeltext">Seats</span></th>\n'
+            f'<td class="dddefault">{section["cap"][1]}</td>\n<td class="dddefault">{section["cap"][0]}</td>\n'
+            f'<td class="dddefault">{section["cap"][1] - section["cap"][0]}</td>\n</tr>\n'
+            f'<tr>\n<th class="ddlabel" scope="row"><span class="fieldlabeltext">Waitlist Seats</span></th>\n'
+            f'<td class="dddefault">{section["waitListSeats"][0]}</td>\n<td class="dddefault">{section["waitListSeats"][1]}</td>\n'
+            f'<td class="dddefault">{section["waitListSeats"][0] - section["waitListSeats"][1]}</td>\n</tr>\n'
+            '</table>\n<br>',
+        ]
+
+        if section['crossListCourses'] != []:
+            parts.append('<span class="fieldlabeltext">Cross List Courses:</span>\n<br>\n' + ''.join(
+                f'<a href="/prod/bwckctlg.p_disp_course_detail?subj_code_in={subject}&amp;crse_numb_in={course}">{subject} {course}</a>\n<br>\n'
+                for subject, course in section['crossListCourses']
+            ) + '<br>')
+        if section['restrictions'] != []:
+            parts.append(self.indentedLines('Restrictions:', section['restrictions']))
+        if section['prerequisite'] is not None:
+            parts.append(self.indentedLines('Prerequisites:', [section['prerequisite']]))
+        if section['corequisites'] != []:
+            parts.append('<span class="fieldlabeltext">Corequisites:</span>\n<br>\n' + ''.join(
+                f'<a href="/prod/bwckctlg.p_disp_course_detail?subj_code_in={subject}&amp;crse_numb_in={course}">{subject} {course}</a>\n<br>\n'
+                for subject, course in section['corequisites']
+            ) + '<br>')
+
+        return '\n'.join(parts) + '\n'
+
+    def indentedLines(self, header: str, lines: List[str]) -> str:
+        return f'<span class="fieldlabeltext">{header}</span>\n<br>' + ''.join(
+            f'{e(line)}\n<br>' if line.startswith(('Must be', 'May not be')) else f'\xa0 \xa0 \xa0 {e(line)}\n<br>'
+            for line in lines
+        ) + '<br>\n'
+
+    def meetingTable(self, section: dict) -> str:
+        rows = '\n'.join(
+            f'<tr>\n<td class="dddefault">Class</td>\n<td class="dddefault">{clock(start)} - {clock(end)}</td>\n'
+            f'<td class="dddefault">{days}</td>\n<td class="dddefault">{e(name)} {room}</td>\n<td class="dddefault">Jan 12, 2026 - May 01, 2026</td>\n</tr>'
+            for days, (start, end), (_, name, room) in zip(section['days'], section['times'], section['places'])
+        )
+        return (
+            '<table class="datadisplaytable" summary="This table lists the scheduled meeting times and assigned instructors for this class..">\n'
+            '<caption class="captiontext">Scheduled Meeting Times</caption>\n'
+            '<tr>\n<th class="ddheader" scope="col">Type</th>\n<th class="ddheader" scope="col">Time</th>\n'
+            '<th class="ddheader" scope="col">Days</th>\n<th class="ddheader" scope="col">Where</th>\n'
+            '<th class="ddheader" scope="col">Date Range</th>\n</tr>\n'
+            f'{rows}\n</table>\n'
+        )
+
+    def title(self, section: dict) -> str:
+        return f'{e(section["title"])} - {section["crn"]} - {section["subject"]} {section["course"]} - {section["section"]}'
+
+    def detail(self, termIn: str, crn: str) -> str:
+        termIndex = self.dataset.termIndex(termIn)
+        section = None
+        if termIndex is not None and crn.isdigit() and int(crn) >= 10000:
+            campusIndex, index = self.dataset.sectionOf(int(crn))
+            if index < self.dataset.sectionCount(termIndex, campusIndex):
+                section = self.dataset.section(termIndex, campusIndex, index)
+
+        if section is None:
+            return bannerPage('Detailed Class Information', '<span class="warningtext">No detailed class information found</span>')
+
+        return bannerPage('Detailed Class Information', f'''<table class="datadisplaytable" summary="This table is used to present the detailed class information.">
+<tr>
+<th class="ddlabel" scope="row">{self.title(section)}<br><br></th>
+</tr>
+<tr>
+<td class="dddefault">
+{self.sectionLines(section)}</td>
+</tr>
+</table>''')
+
+    def listing(self, termIn: str, subject: str) -> str:
+        termIndex = self.dataset.termIndex(termIn)
+        if termIndex is None or subject not in SUBJECTS:
+            return bannerPage('Class Schedule Listing', '<span class="warningtext">No classes were found that meet your search criteria</span>')
+
+        rows = []
+        subjectIndex = SUBJECTS.index(subject)
+        for campusIndex in range(len(CAMPUSES)):
+            for index in range(subjectIndex, self.dataset.sectionCount(termIndex, campusIndex), len(SUBJECTS)):
+                section = self.dataset.section(termIndex, campusIndex, index)
+                rows.append(f'''<tr>
+<th class="ddtitle" scope="colgroup"><a href="/prod/bwckschd.p_disp_detail_sched?term_in={termIn}&amp;crn_in={section["crn"]}">{self.title(section)}</a></th>
+</tr>
+<tr>
+<td class="dddefault">
+{self.sectionLines(section)}{self.meetingTable(section)}<br>
+</td>
+</tr>''')
+
+        return bannerPage('Class Schedule Listing', '<table class="datadisplaytable" summary="This layout table is used to present the sections found" width="100%">\n' + '\n'.join(rows) + '\n</table>')
+
+    def catalog(self, catTermIn: str, subject: str, course: str) -> str:
+        if self.dataset.termIndex(catTermIn) is None or subject not in SUBJECTS or not course.isdigit():
+            return bannerPage('Catalog Entries', '<span class="warningtext">No course information found</span>')
+
+        catalog = self.dataset.catalog(subject, int(course))
+        scheduleTypes = ', '.join(
+            f'<a href="/prod/bwckctlg.p_disp_listcrse?term_in={catTermIn}&amp;subj_in={subject}&amp;crse_in={course}&amp;schd_in={quote(scheduleType)}">{scheduleType}</a>'
+            for scheduleType in catalog['scheduleTypes']
+        )
+        parts = [
+            f'{e(catalog["description"])}\n<br>',
+            f'{catalog["lectureHours"] + catalog["labHours"]:.3f} Credit hours\n<br>',
+            f'{catalog["lectureHours"]:.3f} Lecture hours\n<br>',
+            f'{catalog["labHours"]:.3f} Lab hours\n<br>',
+            f'<span class="fieldlabeltext">Levels: </span>{catalog["level"]}\n<br>',
+            f'<span class="fieldlabeltext">Schedule Types: </span>{scheduleTypes}\n<br>\n<br>',
+        ]
+        if catalog['restrictions'] != []:
+            parts.append(self.indentedLines('Restrictions:', catalog['restrictions']))
+        if catalog['prerequisite'] is not None:
+            parts.append(self.indentedLines('Prerequisites:', [catalog['prerequisite']]))
+        if catalog['courseAttributes'] != []:
+            parts.append('<span class="fieldlabeltext">Course Attributes: </span><br>' + ''.join(
+                f'{e(attribute)}\n<br>'
+                for attribute in catalog['courseAttributes']
+            ) + '\n<br>')
+
+        return bannerPage('Catalog Entries', f'''<table class="datadisplaytable" summary="This table lists the course detail for the selected term." width="100%">
+<tr>
+<td class="nttitle" scope="colgroup">{subject} {course} - Title</td>
+</tr>
+<tr>
+<td class="ntdefault">
+{chr(10).join(parts)}
+</td>
+</tr>
+</table>''')
+
+
+class Directory:
+    # directory.fit.edu, a list of departments with a page each
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+
+    def render(self, path: List[str], args: Dict[str, List[str]]) -> Optional[str]:
+        if path == ['department']:
+            return self.departmentList()
+
+        if len(path) == 2 and path[0] == 'department' and path[1][1:].isdigit():
+            index = int(path[1][1:])
+            if index < self.dataset.departmentCount():
+                return self.departmentPage(index)
+
+        return None
+
+    def departmentList(self) -> str:
+        links = '\n'.join(
+            f'<a class="item" href="/department/D{index:04}">Department {index}</a>'
+            for index in range(self.dataset.departmentCount())
+        )
+        return page('Departments', f'''<div class="ui grid">
+<div class="twelve wide column">
+<h2>Departments</h2>
+<div class="ui list">
+{links}
+</div>
+</div>
+</div>''')
+
+    def departmentPage(self, index: int) -> str:
+        department = self.dataset.department(index)
+        fields = [
+            ('Phone', f'<a href="tel:{department["phone"]}">{department["phone"]}</a>'),
+            ('Fax', department['fax']),
+            ('Email', f'<a href="mailto:{department["email"]}">{department["email"]}</a>'),
+            ('Website', f'<a href="{department["website"]}">{department["website"]}</a>'),
+            ('Primary Location', e(department['primaryLocation'])),
+        ]
+        departmentRows = '\n'.join(
+            f'<tr><th>{header}</th><td>{value}</td></tr>'
+            for header, value in fields
+            if value is not None
+        )
+        employeeRows = '\n'.join(
+            f'<tr><td><div class="name"><b>{e(employee["name"])}</b></div><div class="title">{e(employee["title"])}</div></td>'
+            f'<td><div class="email"><a href="mailto:{employee["email"]}">{employee["email"]}</a></div>'
+            f'<div class="phone"><a href="tel:{employee["phone"]}">{employee["phone"]}</a></div></td>'
+            f'<td><div class="building">{e(employee["building"])}</div><div class="room">{employee["room"]}</div></td></tr>'
+            for employee in department['employees']
+        )
+        return page(department['name'], f'''<div class="ui grid">
+<div class="twelve wide column">
+<h2>{e(department["name"])}</h2>
+<table class="ui celled table">
+{departmentRows}
+</table>
+<table class="ui celled table">
+{employeeRows}
+</table>
+</div>
+</div>''')
+
+
+class MockSource(resource.Resource):
+    # Routes requests by source host, with injected latency and errors
+    isLeaf = True
+
+    def __init__(self, dataset: Dataset, pageSize: int, latency: float, jitter: float, errorRate: float, retryAfter: Optional[int],
+                 bandwidth: Optional[float] = None):
+        super().__init__()
+        self.sources = {
+            'apps.fit.edu': Schedule(dataset, pageSize),
+            'nssb-p.adm.fit.edu': Paws(dataset),
+            'directory.fit.edu': Directory(dataset),
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.retryAfter = retryAfter
+        # Bytes per second of each response, unlimited if None
+        self.bandwidth = bandwidth
+        self.rng = random.Random(dataset.seed)
+
+    def render(self, request):
+        host, *path = [part.decode() for part in request.path.split(b'/')[1:]]
+        path = [part for part in path if part != '']
+        # Query and form arguments together, like Banner
+        args = {
+            name.decode(): [value.decode() for value in values]
+            for name, values in request.args.items()
+        }
+
+        status, body = 200, None
+        if self.rng.random() < self.errorRate:
+            status = 503
+            if self.retryAfter is not None:
+                request.setHeader(b'Retry-After', str(self.retryAfter).encode())
+        elif host in self.sources:
+            body = self.sources[host].render(path, args)
+            if body is None:
+                status = 404
+        else:
+            status = 404
+
+        delay = max(0.0, self.rng.gauss(self.latency, self.jitter))
+        call = reactor.callLater(delay, self.finish, request, status, body)
+        request.notifyFinish().addErrback(lambda _: call.active() and call.cancel())
+        return server.NOT_DONE_YET
+
+    def finish(self, request, status: int, body: Optional[str]):
+        data = (body or f'<html><body>{status}</body></html>').encode('utf-8')
+        request.setResponseCode(status)
+        request.setHeader(b'Content-Type', b'text/html; charset=utf-8')
+        request.setHeader(b'Content-Length', str(len(data)).encode())
+        self.send(request, data)
+
+    # Body in chunks at the bandwidth, the client may hang up halfway
+    def send(self, request, data: bytes):
+        if request.finished or request.channel is None:
+            return
+        if self.bandwidth is None:
+            request.write(data)
+            request.finish()
+            return
+
+        chunk, data = data[:CHUNK_SIZE], data[CHUNK_SIZE:]
+        request.write(chunk)
+        if data:
+            reactor.callLater(len(chunk) / self.bandwidth, self.send, request, data)
+        else:
+            request.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for apps.fit.edu, PAWS and the directory')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--scale', type=float, default=1, help='Multiplier of sections and departments')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--page-size', type=int, default=50, help='Rows per schedule page unless per_page is given')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response time in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Standard deviation of response time in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--retry-after', type=int, default=None, help='Retry-After of 503 responses in seconds')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Kilobytes per second of each response, unlimited by default')
+    args = parser.parse_args()
+
+    dataset = Dataset(args.scale, args.seed)
+    site = server.Site(MockSource(dataset, args.page_size, args.latency, args.jitter, args.error_rate, args.retry_after,
+                                     args.bandwidth and args.bandwidth * 1024))
+    site.displayTracebacks = False
+    reactor.listenTCP(args.port, site, interface='127.0.0.1')
+    print(f'Serving scale {args.scale} on http://127.0.0.1:{args.port}', flush=True)
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
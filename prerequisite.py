@@ -1,9 +1,8 @@
-import json
-from util import listToJson
+from util import listToJson, loadCourses, loadSections
 
 if __name__ == '__main__':
-    courses: list = json.load(open('_pawsCourse.raw.json', 'r'))
-    sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    courses: list = loadCourses()
+    sections: list = loadSections()
 
     prerequisites = set()
 
@@ -1,11 +1,10 @@
-import json
 import re
 from typing import List
 
-from util import listToJson
+from util import listToJson, loadSections
 
 if __name__ == '__main__':
-    sections: List[dict] = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: List[dict] = loadSections()
 
     requirements = set()
     for section in sections:
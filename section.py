@@ -3,7 +3,7 @@ import json
 import re
 from dataclasses import asdict, astuple, dataclass, field, fields
 from typing import Optional
-from util import dataclassToJson
+from util import dataclassToJson, loadSections
 
 
 @dataclass
@@ -85,7 +85,7 @@ if __name__ == '__main__':
     restrictions: list = json.load(open('restriction.json', 'r'))
     prerequisites: list = json.load(open('prerequisite.json', 'r'))
 
-    sections: list = json.load(open('_pawsSection.raw.json', 'r'))
+    sections: list = loadSections()
 
     for section in sections:
         location: str = section['location']
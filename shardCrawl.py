@@ -0,0 +1,169 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from scrapy.exporters import JsonItemExporter
+from scrapy.utils.project import get_project_settings
+
+from FloridaTechDataSpider.producers import RecordFile, iterJsonArray
+from FloridaTechDataSpider.shards import ShardQueue
+from FloridaTechDataSpider.spiders.pawsCourse_spider import courseKey
+from FloridaTechDataSpider.spiders.pawsSection_spider import sectionKey
+
+# Sharded PAWS crawl, for when one Scrapy process runs out of CPU before PAWS runs out of politeness
+#   init:  split the records of the input file into shards in a SQLite queue
+#   work:  claim shards one at a time and crawl each in its own 'scrapy crawl' process
+#          any number of workers, on any host that shares this directory
+#   merge: join shard outputs in the order of the input file
+#   run:   all of the above with local workers
+# The merged raw file is the same whatever the number of shards or workers
+
+# Spider -> (input file, output file, key of input records and items)
+SHARDED: Dict[str, Tuple[str, str, Callable[[dict], tuple]]] = {
+    'pawsSection': ('_section.raw.json', '_pawsSection.raw.json', sectionKey),
+    'pawsCourse': ('course.json', '_pawsCourse.raw.json', courseKey),
+}
+
+# A claimed shard is handed to another worker after this long without finishing
+LEASE_SECS = 3600
+MAX_ATTEMPTS = 3
+
+
+def queuePath(spider: str) -> str:
+    return f'_{spider}.shards.sqlite'
+
+
+def shardOutput(spider: str, shard: int, worker: str) -> str:
+    return f'_{spider}.shard{shard}.{worker.replace(":", "-")}.json'
+
+
+def init(spider: str, shardCount: int, spiderArgs: Dict[str, str], settings: List[str]) -> None:
+    queue = ShardQueue(queuePath(spider))
+    queue.create(spider, shardCount, spiderArgs, settings)
+    queue.close()
+
+
+def work(spider: str, concurrency: int) -> int:
+    queue = ShardQueue(queuePath(spider))
+    _, shardCount, spiderArgs, settings = queue.meta()
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    crawled = 0
+
+    while True:
+        shard = queue.claim(worker, LEASE_SECS)
+        if shard is None:
+            break
+
+        output = shardOutput(spider, shard, worker)
+        command = ['scrapy', 'crawl', spider, '-O', f'{output}:json', '-a', f'shard={shard}', '-a', f'shardCount={shardCount}']
+        for key, value in spiderArgs.items():
+            # A shard that is crawled again resumes from its own checkpoint
+            if key == 'checkpoint':
+                base, extension = os.path.splitext(value)
+                value = f'{base}.shard{shard}{extension}'
+            command += ['-a', f'{key}={value}']
+        for setting in settings:
+            command += ['-s', setting]
+
+        # The politeness budget is shared by all workers
+        if concurrency is not None:
+            command += ['-s', f'CONCURRENT_REQUESTS_PER_DOMAIN={concurrency}', '-s', f'ADAPTIVE_CONCURRENCY_MAX={concurrency}']
+
+        print(f'{worker}: shard {shard + 1}/{shardCount}', file=sys.stderr)
+        if subprocess.run(command).returncode == 0 and queue.complete(shard, worker, output):
+            crawled += 1
+        else:
+            print(f'{worker}: shard {shard + 1}/{shardCount} failed', file=sys.stderr)
+            queue.release(shard, worker, MAX_ATTEMPTS)
+
+    queue.close()
+    return crawled
+
+
+def merge(spider: str) -> None:
+    inputPath, outputPath, keyFn = SHARDED[spider]
+    queue = ShardQueue(queuePath(spider))
+    counts = queue.counts()
+    outputs = queue.outputs()
+    queue.close()
+
+    if set(counts) != {'done'}:
+        raise RuntimeError(f'Shards are not all done: {counts}')
+
+    # Items are looked up from disk by key, in the order of the input file
+    shardItems = [RecordFile(output, lambda index, item: keyFn(item)).index() for output in outputs]
+
+    settings = get_project_settings()
+    missing = 0
+    with open(outputPath, 'wb') as f:
+        exporter = JsonItemExporter(
+            f,
+            encoding=settings.get('FEED_EXPORT_ENCODING'),
+            indent=settings.getint('FEED_EXPORT_INDENT')
+        )
+        exporter.start_exporting()
+
+        for _, _, record in iterJsonArray(inputPath):
+            key = keyFn(record)
+            items = next((items for items in shardItems if key in items), None)
+            if items is None:
+                missing += 1
+                continue
+            exporter.export_item(items.get(key))
+
+        exporter.finish_exporting()
+
+    for output in outputs:
+        os.remove(output)
+
+    if missing > 0:
+        print(f'Warning: {missing} records of {inputPath} have no item', file=sys.stderr)
+
+
+def run(spider: str, shardCount: int, workers: int, concurrency: int, spiderArgs: Dict[str, str], settings: List[str]) -> None:
+    init(spider, shardCount, spiderArgs, settings)
+
+    start = time.time()
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'work', spider, '--concurrency', str(max(1, concurrency // workers))])
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.wait()
+
+    merge(spider)
+    os.remove(queuePath(spider))
+    print(f'{spider}: {shardCount} shards by {workers} workers in {time.time() - start:.1f}s', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded PAWS crawl')
+    parser.add_argument('command', choices=['init', 'work', 'merge', 'run'])
+    parser.add_argument('spider', choices=list(SHARDED))
+    parser.add_argument('--shards', type=int, default=None, help='Number of shards, 4 per worker by default')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Local workers of run')
+    parser.add_argument('--concurrency', type=int, default=None, help='Requests per domain of a worker, or of all workers together for run, SHARDED_CONCURRENT_REQUESTS_PER_DOMAIN by default')
+    parser.add_argument('-a', dest='spiderArgs', action='append', default=[], metavar='NAME=VALUE', help='Spider argument')
+    parser.add_argument('-s', dest='settings', action='append', default=[], metavar='NAME=VALUE', help='Scrapy setting')
+    args = parser.parse_args()
+
+    spiderArgs = dict(arg.split('=', 1) for arg in args.spiderArgs)
+    shardCount = args.shards or 4 * args.workers
+
+    if args.command == 'init':
+        init(args.spider, shardCount, spiderArgs, args.settings)
+    elif args.command == 'work':
+        work(args.spider, args.concurrency)
+    elif args.command == 'merge':
+        merge(args.spider)
+    else:
+        concurrency = args.concurrency or get_project_settings().getint('SHARDED_CONCURRENT_REQUESTS_PER_DOMAIN')
+        run(args.spider, shardCount, args.workers, concurrency, spiderArgs, args.settings)
+
+
+if __name__ == '__main__':
+    main()
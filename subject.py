@@ -2,6 +2,7 @@ import json
 from dataclasses import asdict, astuple, dataclass, fields
 from typing import List
 
+from FloridaTechDataSpider.scope import Scope
 from util import dataclassToJson
 
 presetSubjects = [
@@ -76,6 +77,7 @@ class Subject:
 
 if __name__ == '__main__':
     courses: List[dict] = json.load(open('course2.json', 'r'))
+    scope = Scope.fromEnvironment()
 
     subjects = dict()
     for presetSubject in presetSubjects:
@@ -105,6 +107,10 @@ if __name__ == '__main__':
         courseIds: List[int] = subject['courseIds']
         courseIds.sort()
 
+        # A scoped build only has courses of some subjects
+        if courseIds == [] and not scope.isEmpty():
+            continue
+
         # Coruse IDs are expected to be consecutive, so we can extract the range of it
         expectedCourseIds: List[int] = list(range(courseIds[0], courseIds[-1] + 1))
 
@@ -2,6 +2,8 @@ import json
 from dataclasses import asdict, astuple, dataclass, fields
 from typing import Any, List
 
+from FloridaTechDataSpider.scope import Scope
+
 
 # Dump list of dataclasses to full version and minimized version of JSON files
 def dataclassToJson(objectClass: dataclass, objects: List[dataclass], filePrefix: str, sort = True) -> None:
@@ -42,3 +44,17 @@ def listToJson(objects: List[Any], filePrefix: str) -> None:
         open(f'{filePrefix}.min.json', 'w'),
         separators=(',', ':')
     )
+
+
+# Raw sections in the scope of the build, see FloridaTechDataSpider/scope.py
+# Section ids are indices into this list, so every script must load sections through it
+def loadSections(path: str = '_pawsSection.raw.json') -> List[dict]:
+    scope = Scope.fromEnvironment()
+    return [section for section in json.load(open(path, 'r')) if scope.hasSection(section)]
+
+
+# Raw courses in the scope of the build, by subject and term
+# Their campus ids already come from sections in scope
+def loadCourses(path: str = '_pawsCourse.raw.json') -> List[dict]:
+    scope = Scope.fromEnvironment()
+    return [course for course in json.load(open(path, 'r')) if scope.hasCourse(course)]